@@ -5,4 +5,5 @@ class ComplianceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'compliance'
 
-
+    def ready(self):
+        import compliance.signals  # Register signals
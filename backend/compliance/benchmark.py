@@ -0,0 +1,137 @@
+"""
+Benchmark harness for the rules and trust engines
+Times and query-counts each engine entry point against a set of
+organizations (normally a synthetic dataset), and compares a run with a
+saved JSON baseline so N+1 regressions show up before production does.
+Entry points that write run in a rolled-back transaction, so every
+repetition does the same work on the same data.
+"""
+import statistics
+import time
+from django.db import connection, transaction
+from organization.models import AccessRequest, Org
+from organization.trust_engine import TrustScoreEngine
+from .cache import bump_data_version
+from .models import ComplianceChange, ComplianceDataVersion
+from .rules_engine import NDPRRulesEngine
+
+
+def _per_org(function):
+    def run(sample, organizations):
+        for organization in sample:
+            function(organization)
+    return run
+
+
+# name -> callable(sample, organizations); sample is a few orgs, organizations the whole dataset
+ENTRY_POINTS = {
+    'rules.run_all_checks': _per_org(NDPRRulesEngine.run_all_checks),
+    'rules.iter_violations': _per_org(lambda org: sum(1 for _ in NDPRRulesEngine.iter_violations(org))),
+    'rules.run_incremental_checks': _per_org(NDPRRulesEngine.run_incremental_checks),
+    'rules.scan_and_persist': _per_org(NDPRRulesEngine.scan_and_persist),
+    'rules.run_batch_checks': lambda sample, organizations: NDPRRulesEngine.run_batch_checks(
+        Org.objects.filter(pk__in=[org.id for org in organizations]), persist=False
+    ),
+    'trust.calculate_trust_score': _per_org(TrustScoreEngine.calculate_trust_score),
+    'trust.bulk_calculate_trust_scores': lambda sample, organizations: TrustScoreEngine.bulk_calculate_trust_scores(
+        Org.objects.filter(pk__in=[org.id for org in organizations])
+    ),
+    'trust.get_organization_ranking': lambda sample, organizations: TrustScoreEngine.get_organization_ranking(),
+}
+
+
+def _seed_incremental(sample, organizations):
+    """Give each sampled organization a scan baseline and one changed request, so the rescan path is measured"""
+    changes = []
+    for organization in sample:
+        NDPRRulesEngine.run_incremental_checks(organization)
+        request_id = AccessRequest.objects.filter(
+            organization=organization
+        ).order_by('-requested_at', '-id').values_list('id', flat=True).first()
+        if request_id is not None:
+            changes.append(ComplianceChange(organization=organization, access_request_id=request_id))
+    ComplianceChange.objects.bulk_create(changes)
+
+
+# Entry points that write, with an untimed setup run first in the same rolled-back transaction
+WRITING_ENTRY_POINTS = {
+    'rules.run_incremental_checks': _seed_incremental,
+    'rules.scan_and_persist': None,
+}
+
+
+def measure(function, *args) -> dict:
+    """Wall time and query count of one call"""
+    queries = [0]
+
+    def count_query(execute, sql, params, many, context):
+        queries[0] += 1
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    with connection.execute_wrapper(count_query):
+        function(*args)
+    return {'wall_ms': (time.perf_counter() - started) * 1000, 'queries': queries[0]}
+
+
+def measure_rolled_back(function, sample, organizations, setup=None) -> dict:
+    """
+    Measure a writing entry point inside a transaction that is rolled back
+    afterwards. The sample's data versions are then moved past any used
+    inside, so results cached by the rolled-back run are never served.
+    """
+    with transaction.atomic():
+        if setup is not None:
+            setup(sample, organizations)
+        run = measure(function, sample, organizations)
+        reached = dict(ComplianceDataVersion.objects.filter(
+            organization_id__in=[organization.id for organization in sample]
+        ).values_list('organization_id', 'version'))
+        transaction.set_rollback(True)
+    for org_id, version in reached.items():
+        ComplianceDataVersion.objects.filter(organization_id=org_id).update(version=version + 1)
+    return run
+
+
+def run_benchmarks(organizations: list, sample_size: int = 20, repeat: int = 3, names=None) -> dict:
+    """
+    Median wall time and query count per entry point. Cached scan results
+    are invalidated before every repetition so each run does the full work,
+    and writes are rolled back so each run starts from the same data.
+    """
+    sample = organizations[:sample_size]
+    results = {}
+    for name, function in ENTRY_POINTS.items():
+        if names and name not in names:
+            continue
+        runs = []
+        for _ in range(repeat):
+            for organization in organizations:
+                bump_data_version(organization.id)
+            if name in WRITING_ENTRY_POINTS:
+                runs.append(measure_rolled_back(function, sample, organizations, WRITING_ENTRY_POINTS[name]))
+            else:
+                runs.append(measure(function, sample, organizations))
+        results[name] = {
+            'wall_ms': round(statistics.median(run['wall_ms'] for run in runs), 3),
+            'queries': max(run['queries'] for run in runs),
+        }
+    return results
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.25) -> list:
+    """
+    Rows of (name, baseline, current, regressed) for entry points in both runs.
+    A run regresses when it issues more queries or is slower by more than `tolerance`.
+    """
+    rows = []
+    for name, now in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        regressed = (
+            now['queries'] > before['queries']
+            or now['wall_ms'] > before['wall_ms'] * (1 + tolerance)
+        )
+        rows.append((name, before, now, regressed))
+    return rows
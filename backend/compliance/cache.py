@@ -0,0 +1,52 @@
+"""
+Versioned cache for compliance scan results and dashboards
+Every organization has a data version, bumped on any AccessRequest,
+UserConsent, ComplianceAudit or ViolationReport write that touches it.
+Entries are stored under (organization, version), so a write makes all
+older entries unreachable without having to find and delete them.
+The version lives in the database (ComplianceDataVersion): with a
+per-process cache (no REDIS_URL) a bump in the web process still
+invalidates entries cached by the queue worker and trust refresher.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from .models import ComplianceDataVersion
+
+SCAN = 'scan'  # Persisted scans: the stored audits match the result
+SCAN_PREVIEW = 'scan-preview'  # Read-only scans, never treated as persisted
+DASHBOARD = 'dashboard'
+
+
+def _entry_key(kind: str, org_id, version: int) -> str:
+    return f'compliance:{kind}:{org_id}:{version}'
+
+
+def data_version(org_id) -> int:
+    """Current data version, starting an organization at 0 on first use"""
+    version = ComplianceDataVersion.objects.filter(organization_id=org_id).values_list('version', flat=True).first()
+    if version is None:
+        version = ComplianceDataVersion.objects.get_or_create(organization_id=org_id)[0].version
+    return version
+
+
+def bump_data_version(org_id):
+    """
+    Invalidate every cached entry for an organization and return the new
+    version. Organizations without a version row have nothing cached, so
+    there is nothing to bump (and no row is created mid-delete).
+    """
+    with transaction.atomic():
+        if not ComplianceDataVersion.objects.filter(organization_id=org_id).update(version=F('version') + 1):
+            return None
+        # The UPDATE holds the row until commit, so this reads our own increment
+        return ComplianceDataVersion.objects.filter(organization_id=org_id).values_list('version', flat=True).first()
+
+
+def get_cached(kind: str, org_id, version: int):
+    return cache.get(_entry_key(kind, org_id, version))
+
+
+def set_cached(kind: str, org_id, version: int, value):
+    cache.set(_entry_key(kind, org_id, version), value, timeout=settings.COMPLIANCE_SCAN_CACHE_TTL)
@@ -0,0 +1,99 @@
+"""
+Per-rule scan instrumentation
+Measures wall time, database queries, rows examined and violations for
+each rule, checks them against configured budgets and keeps process-wide
+totals for the metrics endpoint
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_metrics_lock = threading.Lock()
+_metrics = {}
+
+
+class ScanInstrumentation:
+    """Collects stats for one scan; use NO_INSTRUMENTATION when disabled"""
+
+    def __init__(self):
+        self.stats = {}
+
+    @contextmanager
+    def measure(self, name: str):
+        """Time a stage and count its queries; the caller fills rows_examined and violations"""
+        entry = {'wall_ms': 0.0, 'queries': 0, 'rows_examined': 0, 'violations': 0}
+
+        def count_query(execute, sql, params, many, context):
+            entry['queries'] += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            yield entry
+        entry['wall_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        self.stats[name] = entry
+
+    def finish(self) -> dict:
+        """Flag budget overruns, add the stats to process totals and return them"""
+        budgets = getattr(settings, 'COMPLIANCE_RULE_BUDGETS', {})
+        for name, entry in self.stats.items():
+            budget = budgets.get(name, {})
+            over = sorted(metric for metric, limit in budget.items() if entry.get(metric, 0) > limit)
+            if over:
+                entry['over_budget'] = over
+                logger.warning('Compliance rule %s exceeded budget on %s: %s', name, ', '.join(over), entry)
+        record_rule_stats(self.stats)
+        return self.stats
+
+
+class _NoInstrumentation:
+    """Disabled instrumentation: measure() is a bare nullcontext"""
+
+    def measure(self, name: str):
+        return nullcontext({})
+
+    def finish(self) -> dict:
+        return {}
+
+
+NO_INSTRUMENTATION = _NoInstrumentation()
+
+
+def record_rule_stats(stats: dict):
+    """Accumulate one scan's per-rule stats into the process-wide totals"""
+    with _metrics_lock:
+        for name, entry in stats.items():
+            totals = _metrics.setdefault(name, {
+                'scans': 0, 'wall_ms': 0.0, 'max_wall_ms': 0.0,
+                'queries': 0, 'rows_examined': 0, 'violations': 0, 'over_budget': 0,
+            })
+            totals['scans'] += 1
+            totals['wall_ms'] += entry['wall_ms']
+            totals['max_wall_ms'] = max(totals['max_wall_ms'], entry['wall_ms'])
+            totals['queries'] += entry['queries']
+            totals['rows_examined'] += entry['rows_examined']
+            totals['violations'] += entry['violations']
+            totals['over_budget'] += 1 if entry.get('over_budget') else 0
+
+
+def rule_metrics() -> dict:
+    """Totals and per-scan averages for every instrumented rule in this process"""
+    with _metrics_lock:
+        return {
+            name: dict(
+                totals,
+                avg_wall_ms=round(totals['wall_ms'] / totals['scans'], 3),
+                avg_queries=round(totals['queries'] / totals['scans'], 2),
+            )
+            for name, totals in _metrics.items()
+        }
+
+
+def reset_rule_metrics():
+    with _metrics_lock:
+        _metrics.clear()
@@ -0,0 +1,181 @@
+"""
+Database-backed queue for compliance scans
+The API enqueues a ComplianceScanJob and returns immediately; a worker
+process (`manage.py run_compliance_worker`) claims jobs with a conditional
+UPDATE, so several workers can share the table without an external broker.
+A running job's worker touches heartbeat_at while the scan runs; only jobs
+whose heartbeat stopped are requeued, and a worker can only finish a job
+it still owns.
+"""
+import os
+import socket
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from organization.models import Org
+from .models import ComplianceScanJob, ViolationReport
+from .rules_engine import NDPRRulesEngine
+from .serializers import ComplianceAuditSerializer, ViolationReportSerializer, ComplianceScanResultSerializer
+
+# A RUNNING job whose heartbeat is older than this is assumed lost with its worker
+STALE_JOB_TIMEOUT = timedelta(minutes=15)
+HEARTBEAT_INTERVAL = timedelta(minutes=1)
+MAX_ATTEMPTS = 3
+# Finished jobs are kept this long (COMPLIANCE_SCAN_JOB_RETENTION overrides); None keeps them
+DEFAULT_JOB_RETENTION = timedelta(days=7)
+
+
+def worker_name() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue_scan(organization: Org, instrument: bool = False) -> ComplianceScanJob:
+    """Queue a scan, or return the organization's scan that is already queued or running"""
+    active = ComplianceScanJob.objects.filter(organization=organization, status__in=ComplianceScanJob.ACTIVE_STATUSES)
+    while True:
+        job = active.first()
+        if job is not None:
+            return job
+        try:
+            with transaction.atomic():
+                return ComplianceScanJob.objects.create(organization=organization, instrument=instrument)
+        except IntegrityError:
+            # Another request queued one between our check and insert; it may
+            # already have finished, so look again rather than assume it exists
+            continue
+
+
+def claim_job(job_id: int, worker: str = None):
+    """Move a queued job to RUNNING unless another worker got it first; returns the job or None"""
+    now = timezone.now()
+    claimed = ComplianceScanJob.objects.filter(pk=job_id, status='QUEUED').update(
+        status='RUNNING',
+        worker=worker or worker_name(),
+        started_at=now,
+        heartbeat_at=now,
+        attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return None
+    return ComplianceScanJob.objects.select_related('organization').get(pk=job_id)
+
+
+def claim_next_job(worker: str = None):
+    """Claim the oldest queued job; None when the queue is empty"""
+    while True:
+        job_id = ComplianceScanJob.objects.filter(status='QUEUED').order_by('id').values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        job = claim_job(job_id, worker)
+        if job is not None:
+            return job
+        # Lost the race to another worker; try the next job
+
+
+def scan_payload(scan_result: dict, audit_records: list) -> dict:
+    """Serialized scan response: totals, stored audits and their violation reports"""
+    violation_records = list(ViolationReport.objects.filter(
+        related_audit__in=[audit.pk for audit in audit_records]
+    ).select_related('organization', 'related_audit'))
+
+    result_data = {
+        'risk_score': scan_result.get('risk_score', 0),
+        'total_violations': scan_result.get('total_violations', len(violation_records)),
+        'critical_count': scan_result.get('critical_count', 0),
+        'high_count': scan_result.get('high_count', 0),
+        'medium_count': scan_result.get('medium_count', 0),
+        'audits': ComplianceAuditSerializer(audit_records, many=True).data,
+        'violations': ViolationReportSerializer(violation_records, many=True).data,
+    }
+    if 'rule_stats' in scan_result:
+        result_data['rule_stats'] = scan_result['rule_stats']
+    return ComplianceScanResultSerializer(result_data).data
+
+
+def owned(job: ComplianceScanJob):
+    """The job's row while it is still RUNNING on the worker that claimed it"""
+    return ComplianceScanJob.objects.filter(pk=job.pk, status='RUNNING', worker=job.worker)
+
+
+def heartbeat(job: ComplianceScanJob) -> bool:
+    """Mark a running job alive; False once it was requeued or taken over"""
+    return bool(owned(job).update(heartbeat_at=timezone.now()))
+
+
+class Heartbeat:
+    """Touch a job's heartbeat from a background thread while the block runs"""
+
+    def __init__(self, job: ComplianceScanJob, interval: timedelta = HEARTBEAT_INTERVAL):
+        self.job = job
+        self.interval = interval.total_seconds()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._beat, name=f'scan-job-{job.pk}-heartbeat', daemon=True)
+
+    def _beat(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                if not heartbeat(self.job):
+                    return
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+        return False
+
+
+def run_job(job: ComplianceScanJob) -> ComplianceScanJob:
+    """
+    Run a claimed job and record its result or error. If the job was
+    requeued or claimed by another worker meanwhile, nothing is written and
+    the job is returned as currently stored.
+    """
+    with Heartbeat(job):
+        try:
+            scan_result, audit_records = NDPRRulesEngine.scan_and_persist(job.organization, instrument=job.instrument)
+            job.result = scan_payload(scan_result, audit_records)
+            job.status = 'SUCCEEDED'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'FAILED'
+    job.finished_at = timezone.now()
+    finished = owned(job).update(result=job.result, error=job.error, status=job.status, finished_at=job.finished_at)
+    if not finished:
+        job.refresh_from_db()
+    return job
+
+
+def requeue_stale_jobs(timeout: timedelta = STALE_JOB_TIMEOUT) -> int:
+    """Return jobs whose worker stopped beating to the queue, failing those out of attempts"""
+    cutoff = timezone.now() - timeout
+    stale = ComplianceScanJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status='RUNNING',
+    )
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status='FAILED', error='Worker stopped before the scan finished', finished_at=timezone.now()
+    )
+    return stale.update(status='QUEUED', worker='') + failed
+
+
+def job_retention():
+    return getattr(settings, 'COMPLIANCE_SCAN_JOB_RETENTION', DEFAULT_JOB_RETENTION)
+
+
+def prune_finished_jobs(now=None) -> int:
+    """Delete succeeded and failed jobs finished longer ago than the retention; returns how many"""
+    keep = job_retention()
+    if keep is None:
+        return 0
+    deleted, _ = ComplianceScanJob.objects.filter(
+        status__in=['SUCCEEDED', 'FAILED'], finished_at__lt=(now or timezone.now()) - keep,
+    ).delete()
+    return deleted
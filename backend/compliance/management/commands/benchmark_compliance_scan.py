@@ -0,0 +1,56 @@
+"""
+Benchmark serial vs multi-process compliance scanning on synthetic data
+Run: python manage.py benchmark_compliance_scan --orgs 500 --requests-per-org 200 --workers 4
+"""
+import os
+import time
+from django.core.management.base import BaseCommand
+from organization.models import Org
+from compliance.rules_engine import NDPRRulesEngine
+from compliance.synthetic import generate_dataset, remove_dataset
+from .generate_synthetic_data import add_dataset_arguments, dataset_options
+
+
+class Command(BaseCommand):
+    help = 'Measure batch scan speedup from multiple worker processes on a synthetic dataset'
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic dataset afterwards')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        remove_dataset(prefix)
+
+        started = time.monotonic()
+        org_ids = generate_dataset(**dataset_options(options))
+        self.stdout.write(f'Generated {len(org_ids)} organizations in {time.monotonic() - started:.2f}s')
+
+        try:
+            organizations = Org.objects.filter(pk__in=org_ids)
+            timings = {}
+            results = {}
+            for workers in sorted({1, options['workers']}):
+                started = time.monotonic()
+                results[workers] = NDPRRulesEngine.run_batch_checks(
+                    organizations,
+                    batch_size=options['batch_size'],
+                    persist=False,
+                    workers=workers,
+                )
+                timings[workers] = time.monotonic() - started
+                self.stdout.write(
+                    f'workers={workers}: {timings[workers]:.2f}s '
+                    f'({len(org_ids) / timings[workers]:.1f} orgs/s)'
+                )
+
+            if results[1] != results[options['workers']]:
+                self.stderr.write(self.style.ERROR('Parallel results differ from the serial scan'))
+            self.stdout.write(self.style.SUCCESS(
+                f"Speedup with {options['workers']} workers: {timings[1] / timings[options['workers']]:.2f}x"
+            ))
+        finally:
+            if not options['keep']:
+                remove_dataset(prefix)
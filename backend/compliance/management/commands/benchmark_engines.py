@@ -0,0 +1,78 @@
+"""
+Benchmark the rules and trust engine entry points on synthetic data
+Run: python manage.py benchmark_engines --orgs 200 --skew 1.1 --save benchmarks/baseline.json
+     python manage.py benchmark_engines --orgs 200 --skew 1.1 --compare benchmarks/baseline.json
+"""
+import json
+import time
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from organization.models import Org
+from compliance.benchmark import ENTRY_POINTS, compare, run_benchmarks
+from compliance.synthetic import generate_dataset, remove_dataset
+from .generate_synthetic_data import add_dataset_arguments, dataset_options
+
+
+class Command(BaseCommand):
+    help = 'Time and query-count each engine entry point, saving or comparing against a baseline'
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument('--sample', type=int, default=20, help='Organizations used by per-organization entry points')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per entry point (median is reported)')
+        parser.add_argument('--only', action='append', choices=sorted(ENTRY_POINTS), help='Limit to these entry points')
+        parser.add_argument('--save', help='Write results to this JSON baseline file')
+        parser.add_argument('--compare', help='Compare against this JSON baseline file')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown before a run counts as a regression')
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic dataset afterwards')
+
+    def handle(self, *args, **options):
+        dataset = dataset_options(options)
+        remove_dataset(options['prefix'])
+        started = time.monotonic()
+        org_ids = generate_dataset(**dataset)
+        self.stdout.write(f'Generated {len(org_ids)} organizations in {time.monotonic() - started:.2f}s')
+
+        try:
+            # With skew, the lowest ids are the largest organizations, so the sample covers the heavy tail
+            organizations = list(Org.objects.filter(pk__in=org_ids).order_by('id'))
+            results = run_benchmarks(organizations, options['sample'], options['repeat'], options['only'])
+        finally:
+            if not options['keep']:
+                remove_dataset(options['prefix'])
+
+        for name, result in results.items():
+            self.stdout.write(f"{name:34} {result['wall_ms']:10.1f} ms {result['queries']:8} queries")
+
+        run = {
+            'dataset': dataset,
+            'sample': options['sample'],
+            'repeat': options['repeat'],
+            'database': connection.vendor,
+            'results': results,
+        }
+        if options['save']:
+            path = Path(options['save'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(run, indent=2))
+            self.stdout.write(self.style.SUCCESS(f'Baseline saved to {path}'))
+
+        if options['compare']:
+            baseline = json.loads(Path(options['compare']).read_text())
+            if baseline.get('dataset') != dataset:
+                self.stderr.write(self.style.WARNING('Baseline was recorded with a different dataset shape'))
+            regressions = []
+            for name, before, now, regressed in compare(baseline['results'], results, options['tolerance']):
+                line = (
+                    f"{name:34} {before['wall_ms']:10.1f} -> {now['wall_ms']:10.1f} ms "
+                    f"{before['queries']:8} -> {now['queries']:8} queries"
+                )
+                if regressed:
+                    regressions.append(name)
+                    self.stdout.write(self.style.ERROR(line + '  REGRESSED'))
+                else:
+                    self.stdout.write(line)
+            if regressions:
+                raise CommandError(f"Regressions against baseline: {', '.join(regressions)}")
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
@@ -0,0 +1,55 @@
+"""
+Generate (or remove) a synthetic dataset for benchmarking
+Run: python manage.py generate_synthetic_data --orgs 1000 --citizens 20000 --requests-per-org 500 --skew 1.1 --history-days 730 --consent-history
+     python manage.py generate_synthetic_data --remove
+"""
+import time
+from django.core.management.base import BaseCommand
+from compliance.synthetic import generate_dataset, remove_dataset
+
+
+def add_dataset_arguments(parser):
+    """Dataset shape options shared with benchmark commands"""
+    parser.add_argument('--orgs', type=int, default=200)
+    parser.add_argument('--citizens', type=int, default=1000)
+    parser.add_argument('--consent-types', type=int, default=6)
+    parser.add_argument('--requests-per-org', type=int, default=100, help='Mean access requests per organization')
+    parser.add_argument('--skew', type=float, default=0.0, help='Zipf exponent for org size and citizen popularity (0 = uniform)')
+    parser.add_argument('--history-days', type=int, default=0, help='Spread request and consent timestamps over this many days')
+    parser.add_argument('--consent-history', action='store_true', help='Generate grant/revoke ConsentHistory rows')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--prefix', default='bench', help='Marker prefix for synthetic rows')
+
+
+def dataset_options(options) -> dict:
+    return {
+        'orgs': options['orgs'],
+        'citizens': options['citizens'],
+        'consent_types': options['consent_types'],
+        'requests_per_org': options['requests_per_org'],
+        'skew': options['skew'],
+        'history_days': options['history_days'],
+        'consent_history': options['consent_history'],
+        'seed': options['seed'],
+        'prefix': options['prefix'],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Create a synthetic platform (organizations, citizens, consents, access requests) for benchmarks'
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument('--remove', action='store_true', help='Only delete the dataset with this prefix')
+
+    def handle(self, *args, **options):
+        remove_dataset(options['prefix'])
+        if options['remove']:
+            self.stdout.write(self.style.SUCCESS(f"Removed synthetic dataset '{options['prefix']}'"))
+            return
+
+        started = time.monotonic()
+        org_ids = generate_dataset(**dataset_options(options))
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(org_ids)} organizations in {time.monotonic() - started:.2f}s'
+        ))
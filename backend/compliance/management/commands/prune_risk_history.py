@@ -0,0 +1,15 @@
+"""
+Drop risk history past its retention
+Run daily: python manage.py prune_risk_history
+"""
+from django.core.management.base import BaseCommand
+from compliance.risk_history import prune
+
+
+class Command(BaseCommand):
+    help = 'Delete raw, hourly and daily risk score points older than their retention'
+
+    def handle(self, *args, **options):
+        deleted = prune()
+        summary = ', '.join(f'{count} {resolution}' for resolution, count in deleted.items())
+        self.stdout.write(self.style.SUCCESS(f'Pruned risk history: {summary}'))
@@ -0,0 +1,53 @@
+"""
+Background worker for queued compliance scans
+Also prunes finished jobs past COMPLIANCE_SCAN_JOB_RETENTION once an hour.
+Run: python manage.py run_compliance_worker [--poll-interval 2] [--once]
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from compliance.jobs import claim_next_job, prune_finished_jobs, requeue_stale_jobs, run_job, worker_name
+from compliance.models import ComplianceScanJob
+
+PRUNE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = 'Run compliance scans queued through the API (database-backed queue, no broker needed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit instead of polling')
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        self.stdout.write(f'Compliance worker {worker} started')
+        pruned_at = None
+
+        while True:
+            close_old_connections()
+            requeued = requeue_stale_jobs()
+            if requeued:
+                self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+            if pruned_at is None or time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                pruned = prune_finished_jobs()
+                pruned_at = time.monotonic()
+                if pruned:
+                    self.stdout.write(f'Pruned {pruned} finished jobs')
+
+            job = claim_next_job(worker)
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            started = time.monotonic()
+            job = run_job(job)
+            elapsed = time.monotonic() - started
+            if job.worker != worker or job.status in ComplianceScanJob.ACTIVE_STATUSES:
+                self.stderr.write(f'Job #{job.pk} for {job.organization.name} was requeued while running; result discarded')
+            elif job.status == 'SUCCEEDED':
+                self.stdout.write(self.style.SUCCESS(f'Job #{job.pk} for {job.organization.name} done in {elapsed:.2f}s'))
+            else:
+                self.stderr.write(f'Job #{job.pk} for {job.organization.name} failed: {job.error}')
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compliance', '0002_rename_compliance_organiz_0_idx_compliance__organiz_61397a_idx_and_more'),
+        ('organization', '0007_alter_org_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplianceScanState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('result', models.JSONField(blank=True, default=dict)),
+                ('last_change_id', models.BigIntegerField(default=0)),
+                ('scanned_at', models.DateTimeField(auto_now=True)),
+                ('organization', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='compliance_scan_state', to='organization.org')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ComplianceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('access_request_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compliance_changes', to='organization.org')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['organization', 'id'], name='compliance__organiz_051564_idx')],
+            },
+        ),
+    ]
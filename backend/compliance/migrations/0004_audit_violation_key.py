@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:48
+
+from django.db import migrations, models
+
+
+# Rule names as stored in rule_name, mapped to their rule codes
+RULE_CODES = {
+    'Consent Validity Check': 'CONSENT_VALIDITY',
+    'Purpose Limitation': 'PURPOSE_LIMITATION',
+    'Data Minimization': 'DATA_MINIMIZATION',
+    'Data Retention Policy': 'RETENTION_POLICY',
+    'Access Control': 'ACCESS_CONTROL',
+    'Audit Trail Completeness': 'AUDIT_TRAIL',
+    'Consent Revocation Handling': 'REVOCATION_HANDLING',
+    'Excessive Data Requests': 'EXCESSIVE_REQUESTS',
+}
+
+
+def populate_violation_keys(apps, schema_editor):
+    """Key existing audits by rule code; duplicates and unknown rules get a per-row legacy key"""
+    ComplianceAudit = apps.get_model('compliance', 'ComplianceAudit')
+    seen = set()
+    for audit in ComplianceAudit.objects.order_by('id').only('id', 'organization_id', 'rule_name'):
+        code = RULE_CODES.get(audit.rule_name)
+        if code is None or (audit.organization_id, code) in seen:
+            code = f'legacy:{audit.id}'
+        seen.add((audit.organization_id, code))
+        ComplianceAudit.objects.filter(pk=audit.pk).update(violation_key=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compliance', '0003_compliance_scan_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='complianceaudit',
+            name='violation_key',
+            field=models.CharField(default='', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_violation_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='complianceaudit',
+            constraint=models.UniqueConstraint(fields=('organization', 'violation_key'), name='unique_audit_violation_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='violationreport',
+            constraint=models.UniqueConstraint(fields=('related_audit', 'violation_type'), name='unique_violation_per_audit'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compliance', '0005_compliance_scan_job'),
+        ('organization', '0008_accessrequest_purpose_quality'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='complianceaudit',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='complianceaudit',
+            index=models.Index(fields=['fingerprint'], name='compliance__fingerp_f67f23_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compliance', '0006_audit_fingerprint'),
+        ('organization', '0008_accessrequest_purpose_quality'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplianceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_audits', models.PositiveIntegerField(default=0)),
+                ('pending_audits', models.PositiveIntegerField(default=0)),
+                ('resolved_audits', models.PositiveIntegerField(default=0)),
+                ('pending_critical', models.PositiveIntegerField(default=0)),
+                ('pending_high', models.PositiveIntegerField(default=0)),
+                ('pending_medium', models.PositiveIntegerField(default=0)),
+                ('pending_low', models.PositiveIntegerField(default=0)),
+                ('unresolved_violations', models.PositiveIntegerField(default=0)),
+                ('risk_score', models.PositiveSmallIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('organization', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='compliance_summary', to='organization.org')),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compliance', '0007_compliance_summary'),
+        ('organization', '0008_accessrequest_purpose_quality'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiskScorePoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('RAW', 'Raw'), ('HOUR', 'Hourly'), ('DAY', 'Daily'), ('MONTH', 'Monthly')], max_length=5)),
+                ('bucket_start', models.DateTimeField()),
+                ('samples', models.PositiveIntegerField(default=1)),
+                ('risk_sum', models.PositiveIntegerField(default=0)),
+                ('risk_min', models.PositiveSmallIntegerField(default=0)),
+                ('risk_max', models.PositiveSmallIntegerField(default=0)),
+                ('risk_last', models.PositiveSmallIntegerField(default=0)),
+                ('total_violations', models.PositiveIntegerField(default=0)),
+                ('critical_count', models.PositiveIntegerField(default=0)),
+                ('high_count', models.PositiveIntegerField(default=0)),
+                ('medium_count', models.PositiveIntegerField(default=0)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='risk_score_points', to='organization.org')),
+            ],
+            options={
+                'ordering': ['organization', 'resolution', 'bucket_start'],
+                'indexes': [models.Index(fields=['resolution', 'bucket_start'], name='compliance__resolut_bad1d4_idx')],
+                'constraints': [models.UniqueConstraint(fields=('organization', 'resolution', 'bucket_start'), name='unique_risk_point_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_versions(apps, schema_editor):
+    Org = apps.get_model('organization', 'Org')
+    ComplianceDataVersion = apps.get_model('compliance', 'ComplianceDataVersion')
+    ComplianceDataVersion.objects.bulk_create(
+        [ComplianceDataVersion(organization_id=org_id) for org_id in Org.objects.values_list('id', flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compliance', '0008_risk_score_points'),
+        ('organization', '0012_trust_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplianceDataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('organization', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='compliance_data_version', to='organization.org')),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
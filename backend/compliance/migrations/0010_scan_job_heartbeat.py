@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compliance', '0009_compliance_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compliancescanjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
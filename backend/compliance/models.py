@@ -22,6 +22,7 @@ class ComplianceAudit(models.Model):
     ]
     
     organization = models.ForeignKey(Org, on_delete=models.CASCADE, related_name='compliance_audits')
+    violation_key = models.CharField(max_length=100)  # Rule code, plus access request id for per-request rules
     rule_name = models.CharField(max_length=200)
     rule_description = models.TextField()
     severity = models.CharField(max_length=10, choices=SEVERITY_CHOICES, default='MEDIUM')
@@ -30,12 +31,17 @@ class ComplianceAudit(models.Model):
     resolved_at = models.DateTimeField(null=True, blank=True)
     details = models.JSONField(default=dict, blank=True)  # Store rule-specific details
     recommendation = models.TextField(blank=True)
+    fingerprint = models.CharField(max_length=64, blank=True)  # SHA-256 of rule, details and recommendation
     
     class Meta:
         ordering = ['-detected_at']
         indexes = [
             models.Index(fields=['organization', '-detected_at']),
             models.Index(fields=['status', 'severity']),
+            models.Index(fields=['fingerprint']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'violation_key'], name='unique_audit_violation_key'),
         ]
     
     def __str__(self):
@@ -69,7 +75,146 @@ class ViolationReport(models.Model):
             models.Index(fields=['organization', '-detected_at']),
             models.Index(fields=['violation_type', 'resolved']),
         ]
+        constraints = [
+            models.UniqueConstraint(fields=['related_audit', 'violation_type'], name='unique_violation_per_audit'),
+        ]
     
     def __str__(self):
         return f"{self.organization.name} - {self.get_violation_type_display()} ({self.detected_at.date()})"
 
+
+
+class ComplianceScanState(models.Model):
+    """Last scan result per organization, the baseline for incremental rescans"""
+    organization = models.OneToOneField(Org, on_delete=models.CASCADE, related_name='compliance_scan_state')
+    result = models.JSONField(default=dict, blank=True)
+    last_change_id = models.BigIntegerField(default=0)  # Highest ComplianceChange id folded into result
+    scanned_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.organization.name} - scanned {self.scanned_at}"
+
+
+class ComplianceDataVersion(models.Model):
+    """
+    Per-organization data version behind the compliance result cache. Kept in
+    the database so every process (web, queue worker, trust refresher) sees
+    the same version even when each has its own cache.
+    """
+    organization = models.OneToOneField(Org, on_delete=models.CASCADE, related_name='compliance_data_version')
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.organization_id} - data version {self.version}"
+
+
+class ComplianceChange(models.Model):
+    """Access request touched since the organization's last compliance scan"""
+    organization = models.ForeignKey(Org, on_delete=models.CASCADE, related_name='compliance_changes')
+    access_request_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['organization', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.organization_id} - access request #{self.access_request_id}"
+
+
+class ComplianceScanJob(models.Model):
+    """Queued compliance scan, picked up by `manage.py run_compliance_worker`"""
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+    ]
+    ACTIVE_STATUSES = ['QUEUED', 'RUNNING']
+
+    organization = models.ForeignKey(Org, on_delete=models.CASCADE, related_name='compliance_scan_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    instrument = models.BooleanField(default=False)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)  # host:pid of the worker running the job
+    result = models.JSONField(null=True, blank=True)  # Same payload the synchronous scan used to return
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Touched by the worker while the scan runs
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+        constraints = [
+            # At most one queued or running scan per organization
+            models.UniqueConstraint(
+                fields=['organization'],
+                condition=models.Q(status__in=['QUEUED', 'RUNNING']),
+                name='unique_active_scan_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.organization.name} - scan job #{self.pk} ({self.status})"
+
+
+class ComplianceSummary(models.Model):
+    """Dashboard counts per organization, refreshed whenever its audits or violation reports change"""
+    organization = models.OneToOneField(Org, on_delete=models.CASCADE, related_name='compliance_summary')
+    total_audits = models.PositiveIntegerField(default=0)
+    pending_audits = models.PositiveIntegerField(default=0)
+    resolved_audits = models.PositiveIntegerField(default=0)
+    pending_critical = models.PositiveIntegerField(default=0)
+    pending_high = models.PositiveIntegerField(default=0)
+    pending_medium = models.PositiveIntegerField(default=0)
+    pending_low = models.PositiveIntegerField(default=0)
+    unresolved_violations = models.PositiveIntegerField(default=0)
+    risk_score = models.PositiveSmallIntegerField(default=0)  # From pending audit severities, capped at 100
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.organization.name} - risk {self.risk_score}"
+
+
+class RiskScorePoint(models.Model):
+    """
+    Risk score history. RAW rows hold single scans; HOUR, DAY and MONTH rows
+    are rollups updated on every scan, so charts never replay audits.
+    """
+    RESOLUTION_CHOICES = [
+        ('RAW', 'Raw'),
+        ('HOUR', 'Hourly'),
+        ('DAY', 'Daily'),
+        ('MONTH', 'Monthly'),
+    ]
+
+    organization = models.ForeignKey(Org, on_delete=models.CASCADE, related_name='risk_score_points')
+    resolution = models.CharField(max_length=5, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+    samples = models.PositiveIntegerField(default=1)
+    risk_sum = models.PositiveIntegerField(default=0)  # Average is risk_sum / samples
+    risk_min = models.PositiveSmallIntegerField(default=0)
+    risk_max = models.PositiveSmallIntegerField(default=0)
+    risk_last = models.PositiveSmallIntegerField(default=0)
+    total_violations = models.PositiveIntegerField(default=0)  # Severity counts are from the bucket's last scan
+    critical_count = models.PositiveIntegerField(default=0)
+    high_count = models.PositiveIntegerField(default=0)
+    medium_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['organization', 'resolution', 'bucket_start']
+        constraints = [
+            # Also the index for range queries: (organization, resolution, bucket_start)
+            models.UniqueConstraint(fields=['organization', 'resolution', 'bucket_start'], name='unique_risk_point_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket_start']),  # Retention pruning
+        ]
+
+    def __str__(self):
+        return f"{self.organization_id} {self.resolution} {self.bucket_start:%Y-%m-%d %H:%M} risk {self.risk_last}"
@@ -0,0 +1,170 @@
+"""
+Risk score time series
+Each persisted scan appends a RAW point and folds into its HOUR, DAY and
+MONTH buckets, so a chart over any range reads at most a few hundred
+pre-aggregated rows from the (organization, resolution, bucket_start)
+index. Older fine-grained rows are dropped by `prune_risk_history`.
+"""
+from datetime import timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import RiskScorePoint
+
+ROLLUPS = ('HOUR', 'DAY', 'MONTH')
+
+# How long each resolution is kept; None keeps it forever
+DEFAULT_RETENTION = {
+    'RAW': timedelta(days=7),
+    'HOUR': timedelta(days=90),
+    'DAY': timedelta(days=3 * 365),
+    'MONTH': None,
+}
+
+# Approximate bucket widths, used to pick a resolution for a range
+BUCKET_WIDTH = {
+    'HOUR': timedelta(hours=1),
+    'DAY': timedelta(days=1),
+    'MONTH': timedelta(days=30),
+}
+MAX_POINTS = 500
+RAW_MAX_RANGE = timedelta(days=1)
+
+TOTAL_FIELDS = ('total_violations', 'critical_count', 'high_count', 'medium_count')
+
+
+def retention() -> dict:
+    return {**DEFAULT_RETENTION, **getattr(settings, 'COMPLIANCE_RISK_HISTORY_RETENTION', {})}
+
+
+def bucket_start(at, resolution: str):
+    """Start of the UTC bucket containing `at`"""
+    at = at.astimezone(dt_timezone.utc)
+    if resolution == 'HOUR':
+        return at.replace(minute=0, second=0, microsecond=0)
+    if resolution == 'DAY':
+        return at.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == 'MONTH':
+        return at.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return at
+
+
+def record_scans(results: dict, at=None):
+    """
+    Append scan results ({organization id: result}) to the series: one
+    RAW insert, then in one transaction an insert of missing rollup
+    buckets, a locking read of them and one bulk update.
+    """
+    if not results:
+        return
+    at = at or timezone.now()
+    buckets = {resolution: bucket_start(at, resolution) for resolution in ROLLUPS}
+
+    RiskScorePoint.objects.bulk_create([
+        RiskScorePoint(
+            organization_id=org_id,
+            resolution='RAW',
+            bucket_start=at,
+            risk_sum=result['risk_score'],
+            risk_min=result['risk_score'],
+            risk_max=result['risk_score'],
+            risk_last=result['risk_score'],
+            **{field: result[field] for field in TOTAL_FIELDS},
+        )
+        for org_id, result in results.items()
+    ], ignore_conflicts=True)
+
+    in_buckets = Q()
+    for resolution, start in buckets.items():
+        in_buckets |= Q(resolution=resolution, bucket_start=start)
+
+    with transaction.atomic():
+        # Make sure every bucket row exists, then lock them: concurrent scans of
+        # the same organization fold in one after the other instead of
+        # overwriting each other's samples
+        RiskScorePoint.objects.bulk_create([
+            RiskScorePoint(
+                organization_id=org_id, resolution=resolution, bucket_start=start,
+                samples=0, risk_min=result['risk_score'], risk_max=result['risk_score'],
+            )
+            for org_id, result in results.items()
+            for resolution, start in buckets.items()
+        ], batch_size=1000, ignore_conflicts=True)
+        existing = {
+            (point.organization_id, point.resolution): point
+            for point in RiskScorePoint.objects.select_for_update().filter(
+                in_buckets, organization_id__in=list(results)
+            ).order_by('pk')
+        }
+
+        for org_id, result in results.items():
+            risk = result['risk_score']
+            for resolution in buckets:
+                point = existing[(org_id, resolution)]
+                point.samples += 1
+                point.risk_sum += risk
+                point.risk_min = min(point.risk_min, risk)
+                point.risk_max = max(point.risk_max, risk)
+                point.risk_last = risk
+                for field in TOTAL_FIELDS:
+                    setattr(point, field, result[field])
+
+        RiskScorePoint.objects.bulk_update(
+            list(existing.values()),
+            ['samples', 'risk_sum', 'risk_min', 'risk_max', 'risk_last', *TOTAL_FIELDS],
+            batch_size=1000,
+        )
+
+
+def pick_resolution(start, end, now=None) -> str:
+    """Finest resolution still retained at `start` that covers the range in at most MAX_POINTS buckets"""
+    now = now or timezone.now()
+    keep = retention()
+    for resolution in ('RAW',) + ROLLUPS:
+        if keep[resolution] is not None and start < now - keep[resolution]:
+            continue
+        if resolution == 'RAW':
+            if end - start <= RAW_MAX_RANGE:
+                return resolution
+        elif (end - start) / BUCKET_WIDTH[resolution] <= MAX_POINTS:
+            return resolution
+    return 'MONTH'
+
+
+def series(organization_id: int, start, end, resolution: str = None) -> tuple:
+    """(resolution, points) for a chart over [start, end)"""
+    resolution = resolution or pick_resolution(start, end)
+    points = RiskScorePoint.objects.filter(
+        organization_id=organization_id,
+        resolution=resolution,
+        bucket_start__gte=bucket_start(start, resolution),
+        bucket_start__lt=end,
+    ).order_by('bucket_start').values_list(
+        'bucket_start', 'samples', 'risk_sum', 'risk_min', 'risk_max', 'risk_last', *TOTAL_FIELDS
+    )
+    return resolution, [
+        {
+            'timestamp': at,
+            'samples': samples,
+            'risk_avg': round(risk_sum / samples, 2) if samples else 0,
+            'risk_min': risk_min,
+            'risk_max': risk_max,
+            'risk_last': risk_last,
+            **dict(zip(TOTAL_FIELDS, totals)),
+        }
+        for at, samples, risk_sum, risk_min, risk_max, risk_last, *totals in points
+    ]
+
+
+def prune(now=None) -> dict:
+    """Delete points older than their resolution's retention; returns rows deleted per resolution"""
+    now = now or timezone.now()
+    deleted = {}
+    for resolution, keep in retention().items():
+        if keep is None:
+            continue
+        deleted[resolution], _ = RiskScorePoint.objects.filter(
+            resolution=resolution, bucket_start__lt=now - keep
+        ).delete()
+    return deleted
@@ -0,0 +1,213 @@
+"""
+Declarative compliance rules compiled to database aggregates
+Rules are plain dicts (settings.COMPLIANCE_DECLARATIVE_RULES), so new
+checks can be added without writing Python that iterates rows:
+
+    {
+        'code': 'STALE_PENDING_REQUESTS',
+        'name': 'Stale Pending Requests',
+        'description': 'Access requests left pending for more than 90 days',
+        'severity': 'LOW',
+        'filter': {'status': 'PENDING', 'requested_at__lt': {'days_ago': 90}},
+        'exclude': {},                      # optional
+        'metric': {'count': 'pk'},          # or {'count_distinct': 'user'}
+        'group_by': 'consent__name',        # optional, one violation per group
+        'threshold': {'gt': 25},
+        'recommendation': 'Resolve the {value} stale requests for {group}',
+    }
+
+All ungrouped rules are evaluated together in one aggregate query;
+each grouped rule costs one GROUP BY ... HAVING query.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count, Q
+
+# Only these AccessRequest fields and lookups may appear in rule specs
+ALLOWED_FIELDS = {'pk', 'status', 'purpose', 'requested_at', 'user', 'consent', 'consent__name'}
+ALLOWED_LOOKUPS = {
+    'exact', 'iexact', 'in', 'lt', 'lte', 'gt', 'gte', 'isnull',
+    'contains', 'icontains', 'startswith', 'istartswith',
+}
+THRESHOLD_OPS = {
+    'gt': lambda value, limit: value > limit,
+    'gte': lambda value, limit: value >= limit,
+    'lt': lambda value, limit: value < limit,
+    'lte': lambda value, limit: value <= limit,
+    'eq': lambda value, limit: value == limit,
+}
+THRESHOLD_LOOKUPS = {'gt': 'gt', 'gte': 'gte', 'lt': 'lt', 'lte': 'lte', 'eq': 'exact'}
+SEVERITIES = {'LOW', 'MEDIUM', 'HIGH', 'CRITICAL'}
+
+
+class DeclarativeRule:
+    """One compiled rule spec"""
+
+    def __init__(self, spec: dict):
+        missing = {'code', 'name', 'severity', 'metric', 'threshold'} - set(spec)
+        if missing:
+            raise ImproperlyConfigured(f"Compliance rule spec is missing {sorted(missing)}: {spec!r}")
+
+        self.code = spec['code']
+        self.name = spec['name']
+        self.description = spec.get('description', '')
+        self.severity = spec['severity']
+        self.filters = spec.get('filter', {})
+        self.excludes = spec.get('exclude', {})
+        self.group_by = spec.get('group_by')
+        self.recommendation = spec.get('recommendation', '')
+        if self.severity not in SEVERITIES:
+            raise ImproperlyConfigured(f"Rule {self.code}: unknown severity {self.severity!r}")
+
+        for lookup in list(self.filters) + list(self.excludes):
+            self._check_lookup(lookup)
+        if self.group_by is not None and self.group_by not in ALLOWED_FIELDS:
+            raise ImproperlyConfigured(f"Rule {self.code}: cannot group by {self.group_by!r}")
+
+        if len(spec['metric']) != 1:
+            raise ImproperlyConfigured(f"Rule {self.code}: metric needs exactly one of count, count_distinct")
+        (kind, field), = spec['metric'].items()
+        if kind not in ('count', 'count_distinct') or field not in ALLOWED_FIELDS:
+            raise ImproperlyConfigured(f"Rule {self.code}: unsupported metric {spec['metric']!r}")
+        self.metric_field = field
+        self.distinct = kind == 'count_distinct'
+
+        if len(spec['threshold']) != 1:
+            raise ImproperlyConfigured(f"Rule {self.code}: threshold needs exactly one of {sorted(THRESHOLD_OPS)}")
+        (self.threshold_op, self.threshold), = spec['threshold'].items()
+        if self.threshold_op not in THRESHOLD_OPS:
+            raise ImproperlyConfigured(f"Rule {self.code}: unknown threshold operator {self.threshold_op!r}")
+
+        try:
+            self.recommendation.format(value=0, group='', threshold=self.threshold)
+        except (KeyError, IndexError, ValueError, AttributeError, TypeError) as e:
+            raise ImproperlyConfigured(f"Rule {self.code}: bad recommendation template {self.recommendation!r} ({e!r})")
+
+    def _check_lookup(self, lookup: str):
+        field, _, operator = lookup.rpartition('__')
+        if operator not in ALLOWED_LOOKUPS:
+            field, operator = lookup, 'exact'
+        if field not in ALLOWED_FIELDS:
+            raise ImproperlyConfigured(f"Rule {self.code}: field {field!r} is not allowed in rule filters")
+
+    @staticmethod
+    def _resolve(value, now):
+        """Turn {'days_ago': n} into an absolute timestamp"""
+        if isinstance(value, dict) and set(value) == {'days_ago'}:
+            return now - timedelta(days=value['days_ago'])
+        return value
+
+    def condition(self, now) -> Q:
+        condition = Q(**{k: self._resolve(v, now) for k, v in self.filters.items()})
+        if self.excludes:
+            condition &= ~Q(**{k: self._resolve(v, now) for k, v in self.excludes.items()})
+        return condition
+
+    def aggregate(self, now):
+        return Count(self.metric_field, distinct=self.distinct, filter=self.condition(now))
+
+    def breached(self, value) -> bool:
+        return value is not None and THRESHOLD_OPS[self.threshold_op](value, self.threshold)
+
+    def violation(self, value, group=None) -> dict:
+        details = {
+            'value': value,
+            'threshold': {self.threshold_op: self.threshold},
+            'issue': self.description,
+        }
+        if self.group_by is not None:
+            details['group'] = str(group)
+        return {
+            'rule': self.code,
+            'details': details,
+            'recommendation': self.recommendation.format(value=value, group=group, threshold=self.threshold),
+        }
+
+
+class RuleSet:
+    """Compiled declarative rules, evaluated with as few queries as possible"""
+
+    def __init__(self, specs):
+        self.rules = [DeclarativeRule(spec) for spec in specs]
+        self._check_codes()
+        self.ungrouped = [rule for rule in self.rules if rule.group_by is None]
+        self.grouped = [rule for rule in self.rules if rule.group_by is not None]
+        self.info = {
+            rule.code: {'name': rule.name, 'description': rule.description, 'severity': rule.severity}
+            for rule in self.rules
+        }
+
+    def _check_codes(self):
+        """Codes must be unique and must not shadow a built-in rule (rule_info would prefer the built-in)"""
+        if not self.rules:
+            return
+        from .rules_engine import NDPRRulesEngine
+
+        reserved = set(NDPRRulesEngine.RULES) | {rule for rule, _ in NDPRRulesEngine.RULE_CHECKS} | {'DECLARATIVE'}
+        codes = set()
+        for rule in self.rules:
+            if rule.code in reserved:
+                raise ImproperlyConfigured(f"Rule {rule.code}: code is taken by a built-in rule")
+            if rule.code in codes:
+                raise ImproperlyConfigured(f"Rule {rule.code}: code is used by more than one rule")
+            codes.add(rule.code)
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def evaluate(self, queryset, now) -> dict:
+        """Breaching (group, value) pairs per rule code for one organization's access requests"""
+        return self.evaluate_batch(queryset, now).get(None, {})
+
+    def evaluate_batch(self, queryset, now, group_field=None, keys=()) -> dict:
+        """
+        Breaching (group, value) pairs per rule code, keyed by `group_field`
+        (e.g. organization_id) or by None when evaluating one organization.
+        `keys` lists every expected group_field value: those without rows
+        aggregate to 0, as they would when evaluated on their own.
+        """
+        results = {}
+        if self.ungrouped:
+            aggregates = {f'rule_{i}': rule.aggregate(now) for i, rule in enumerate(self.ungrouped)}
+            if group_field is None:
+                rows = [queryset.aggregate(**aggregates)]
+            else:
+                rows = list(queryset.order_by().values(group_field).annotate(**aggregates))
+                seen = {row[group_field] for row in rows}
+                rows += [{group_field: key, **dict.fromkeys(aggregates, 0)} for key in keys if key not in seen]
+            for row in rows:
+                key = row.get(group_field) if group_field else None
+                for i, rule in enumerate(self.ungrouped):
+                    if rule.breached(row[f'rule_{i}']):
+                        results.setdefault(key, {})[rule.code] = [(None, row[f'rule_{i}'])]
+
+        for rule in self.grouped:
+            fields = [group_field, rule.group_by] if group_field else [rule.group_by]
+            rows = queryset.filter(rule.condition(now)).order_by().values(*fields).annotate(
+                value=Count(rule.metric_field, distinct=rule.distinct)
+            ).filter(**{f'value__{THRESHOLD_LOOKUPS[rule.threshold_op]}': rule.threshold})
+            for row in rows.order_by(*fields):
+                key = row[group_field] if group_field else None
+                results.setdefault(key, {}).setdefault(rule.code, []).append((row[rule.group_by], row['value']))
+        return results
+
+    def violations(self, values: dict) -> list:
+        """Violation dicts, in rule order, for the output of evaluate()"""
+        violations = []
+        for rule in self.rules:
+            for group, value in values.get(rule.code, []):
+                violations.append(rule.violation(value, group))
+        return violations
+
+
+_compiled = ((), RuleSet(()))
+
+
+def get_declarative_rules() -> RuleSet:
+    """Rules from settings.COMPLIANCE_DECLARATIVE_RULES, compiled once per settings value"""
+    global _compiled
+    specs = getattr(settings, 'COMPLIANCE_DECLARATIVE_RULES', ())
+    if _compiled[0] is not specs:
+        _compiled = (specs, RuleSet(specs))
+    return _compiled[1]
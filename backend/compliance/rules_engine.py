@@ -3,11 +3,21 @@ NDPR Compliance Rules Engine
 Implements automated checks based on Nigeria Data Protection Regulation
 Optimized for efficiency and idempotency
 """
-from datetime import timedelta
+import hashlib
+import json
+from itertools import groupby, islice
+from operator import itemgetter
+from django.conf import settings
+from django.db.models import Max, Q
 from django.utils import timezone
-from organization.models import AccessRequest, Org
-from consents.models import UserConsent
-from .models import ComplianceAudit, ViolationReport
+from organization.models import AccessRequest, Org, TrustComponentCounters
+from organization.purpose_quality import VAGUE
+from .models import ComplianceAudit, ViolationReport, ComplianceScanState, ComplianceChange
+from .cache import SCAN, SCAN_PREVIEW, bump_data_version, data_version, get_cached, set_cached
+from .instrumentation import NO_INSTRUMENTATION, ScanInstrumentation
+from .risk_history import record_scans
+from .rule_dsl import get_declarative_rules
+from .scan_context import ScanContext, active_consent_exists, empty_facts, organization_fact_aggregates
 
 
 class NDPRRulesEngine:
@@ -67,64 +77,63 @@ class NDPRRulesEngine:
             status='APPROVED'
         ).select_related('user', 'consent')
 
+    @classmethod
+    def fetch_unconsented_requests(cls, organization: Org):
+        """Fetch approved access requests with no active user consent (single anti-join)"""
+        return cls.fetch_approved_requests(organization).filter(~active_consent_exists())
+
     @staticmethod
-    def fetch_user_consents(user):
-        """Fetch all user consents once"""
-        return {uc.consent_id: uc for uc in UserConsent.objects.filter(user=user)}
+    def build_context(organization: Org, context: ScanContext = None) -> ScanContext:
+        """Reuse the scan's shared snapshot, or load one for a standalone rule call"""
+        return context if context is not None else ScanContext(organization)
 
     # -------------------- Rule Checks --------------------
 
     @classmethod
-    def check_consent_validity(cls, organization: Org) -> list:
+    def check_consent_validity(cls, organization: Org, context: ScanContext = None) -> list:
         """Check that all approved access requests have valid user consent"""
+        ctx = cls.build_context(organization, context)
         violations = []
-        approved_requests = cls.fetch_approved_requests(organization)
-
-        for req in approved_requests:
-            user_consents = cls.fetch_user_consents(req.user)
-            uc = user_consents.get(req.consent_id)
-            if not uc or not uc.access:
-                violations.append({
-                    'rule': 'CONSENT_VALIDITY',
-                    'details': {
-                        'access_request_id': req.id,
-                        'user_id': req.user.id,
-                        'consent_type': req.consent.name,
-                        'issue': 'Access approved but user consent revoked',
-                    },
-                    'recommendation': f'Revoke access request #{req.id} as user has revoked consent for {req.consent.name}',
-                })
+        for i in ctx.approved:
+            if ctx.has_consent[i]:
+                continue
+            violations.append({
+                'rule': 'CONSENT_VALIDITY',
+                'details': {
+                    'access_request_id': ctx.ids[i],
+                    'user_id': str(ctx.user_ids[i]),
+                    'consent_type': ctx.consent_names[i],
+                    'issue': 'Access approved but user consent revoked',
+                },
+                'recommendation': f'Revoke access request #{ctx.ids[i]} as user has revoked consent for {ctx.consent_names[i]}',
+            })
         return violations
 
-    @staticmethod
-    def check_purpose_limitation(organization: Org) -> list:
+    @classmethod
+    def check_purpose_limitation(cls, organization: Org, context: ScanContext = None) -> list:
         """Check that access purposes are clear and specific"""
+        ctx = cls.build_context(organization, context)
         violations = []
-        requests = AccessRequest.objects.filter(organization=organization)
-        vague_purposes = ['general', 'testing', 'research', 'other', '']
-        for req in requests:
-            if req.purpose.lower() in vague_purposes or len(req.purpose.strip()) < 10:
+        for i, quality in enumerate(ctx.purpose_qualities):
+            if quality == VAGUE:
                 violations.append({
                     'rule': 'PURPOSE_LIMITATION',
                     'details': {
-                        'access_request_id': req.id,
-                        'purpose': req.purpose,
+                        'access_request_id': ctx.ids[i],
+                        'purpose': ctx.purposes[i],
                         'issue': 'Purpose is too vague or insufficient',
                     },
                     'recommendation': 'Specify clear, specific purpose for data access (minimum 10 characters)',
                 })
         return violations
 
-    @staticmethod
-    def check_data_minimization(organization: Org) -> list:
+    @classmethod
+    def check_data_minimization(cls, organization: Org, context: ScanContext = None) -> list:
         """Check if organization requests excessive data types"""
+        ctx = cls.build_context(organization, context)
         violations = []
-        approved_requests = AccessRequest.objects.filter(
-            organization=organization,
-            status='APPROVED'
-        )
-        unique_users = approved_requests.values('user').distinct().count()
-        consent_types = approved_requests.values('consent').distinct().count()
+        unique_users = ctx.facts['approved_users']
+        consent_types = ctx.facts['approved_consent_types']
         avg_consents_per_user = consent_types / unique_users if unique_users else 0
 
         if avg_consents_per_user >= 3.5:
@@ -140,55 +149,47 @@ class NDPRRulesEngine:
             })
         return violations
 
-    @staticmethod
-    def check_retention_policy(organization: Org) -> list:
+    @classmethod
+    def check_retention_policy(cls, organization: Org, context: ScanContext = None) -> list:
         """Check for old approved requests violating retention"""
+        ctx = cls.build_context(organization, context)
         violations = []
-        one_year_ago = timezone.now() - timedelta(days=365)
-        old_approved = AccessRequest.objects.filter(
-            organization=organization,
-            status='APPROVED',
-            requested_at__lt=one_year_ago
-        )
-        if old_approved.exists():
+        old_count = ctx.facts['retention_count']
+        if old_count:
             violations.append({
                 'rule': 'RETENTION_POLICY',
                 'details': {
-                    'old_requests_count': old_approved.count(),
-                    'oldest_request_date': old_approved.order_by('requested_at').first().requested_at.date().isoformat(),
-                    'issue': f'{old_approved.count()} approved access requests older than 1 year',
+                    'old_requests_count': old_count,
+                    'oldest_request_date': ctx.facts['oldest_retained_at'].date().isoformat(),
+                    'issue': f'{old_count} approved access requests older than 1 year',
                 },
                 'recommendation': 'Review and archive data access older than retention period (1 year)',
             })
         return violations
 
-    @staticmethod
-    def check_access_control(organization: Org) -> list:
+    @classmethod
+    def check_access_control(cls, organization: Org, context: ScanContext = None) -> list:
         """Check for patterns indicating unauthorized access"""
+        ctx = cls.build_context(organization, context)
         violations = []
-        revoked_after_approval = AccessRequest.objects.filter(
-            organization=organization,
-            status='REVOKED'
-        )
-        if revoked_after_approval.count() > 10:
+        revoked_count = ctx.facts['revoked_count']
+        if revoked_count > 10:
             violations.append({
                 'rule': 'ACCESS_CONTROL',
                 'details': {
-                    'revoked_count': revoked_after_approval.count(),
+                    'revoked_count': revoked_count,
                     'issue': 'High number of revoked access requests may indicate access control issues',
                 },
                 'recommendation': 'Review access control policies and ensure revoked access is immediately enforced',
             })
         return violations
 
-    @staticmethod
-    def check_audit_trail(organization: Org) -> list:
+    @classmethod
+    def check_audit_trail(cls, organization: Org, context: ScanContext = None) -> list:
         """Ensure all access requests are properly logged"""
+        ctx = cls.build_context(organization, context)
         violations = []
-        missing_purpose = AccessRequest.objects.filter(
-            organization=organization,
-            purpose__isnull=True
-        ).count()
+        missing_purpose = ctx.facts['missing_purpose_count']
         if missing_purpose > 0:
             violations.append({
                 'rule': 'AUDIT_TRAIL',
@@ -201,40 +202,36 @@ class NDPRRulesEngine:
         return violations
 
     @classmethod
-    def check_revocation_handling(cls, organization: Org) -> list:
+    def check_revocation_handling(cls, organization: Org, context: ScanContext = None) -> list:
         """Ensure revoked consents are enforced"""
+        ctx = cls.build_context(organization, context)
         violations = []
-        approved_requests = cls.fetch_approved_requests(organization)
-        for req in approved_requests:
-            user_consents = cls.fetch_user_consents(req.user)
-            uc = user_consents.get(req.consent_id)
-            if not uc or not uc.access:
-                violations.append({
-                    'rule': 'REVOCATION_HANDLING',
-                    'details': {
-                        'access_request_id': req.id,
-                        'user_id': req.user.id,
-                        'consent_type': req.consent.name,
-                        'issue': 'Access approved but consent is missing or revoked',
-                    },
-                    'recommendation': f'IMMEDIATELY revoke access request #{req.id}',
-                })
+        for i in ctx.approved:
+            if ctx.has_consent[i]:
+                continue
+            violations.append({
+                'rule': 'REVOCATION_HANDLING',
+                'details': {
+                    'access_request_id': ctx.ids[i],
+                    'user_id': str(ctx.user_ids[i]),
+                    'consent_type': ctx.consent_names[i],
+                    'issue': 'Access approved but consent is missing or revoked',
+                },
+                'recommendation': f'IMMEDIATELY revoke access request #{ctx.ids[i]}',
+            })
         return violations
 
-    @staticmethod
-    def check_excessive_requests(organization: Org) -> list:
+    @classmethod
+    def check_excessive_requests(cls, organization: Org, context: ScanContext = None) -> list:
         """Detect unusual access patterns"""
+        ctx = cls.build_context(organization, context)
         violations = []
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        recent_requests = AccessRequest.objects.filter(
-            organization=organization,
-            requested_at__gte=thirty_days_ago
-        )
-        if recent_requests.count() > 100:
+        recent_count = ctx.facts['recent_count']
+        if recent_count > 100:
             violations.append({
                 'rule': 'EXCESSIVE_REQUESTS',
                 'details': {
-                    'requests_count': recent_requests.count(),
+                    'requests_count': recent_count,
                     'period_days': 30,
                     'issue': 'Unusually high number of data access requests',
                 },
@@ -242,74 +239,510 @@ class NDPRRulesEngine:
             })
         return violations
 
+    @classmethod
+    def check_declarative_rules(cls, organization: Org, context: ScanContext = None) -> list:
+        """Evaluate rules configured in settings.COMPLIANCE_DECLARATIVE_RULES"""
+        ctx = cls.build_context(organization, context)
+        return get_declarative_rules().violations(ctx.declarative_values)
+
     # -------------------- Main Execution --------------------
 
+    # Rule codes and their check methods, in evaluation order
+    RULE_CHECKS = (
+        ('CONSENT_VALIDITY', 'check_consent_validity'),
+        ('PURPOSE_LIMITATION', 'check_purpose_limitation'),
+        ('DATA_MINIMIZATION', 'check_data_minimization'),
+        ('RETENTION_POLICY', 'check_retention_policy'),
+        ('ACCESS_CONTROL', 'check_access_control'),
+        ('AUDIT_TRAIL', 'check_audit_trail'),
+        ('REVOCATION_HANDLING', 'check_revocation_handling'),
+        ('EXCESSIVE_REQUESTS', 'check_excessive_requests'),
+    )
+
+    # Rules that flag individual access requests; the rest are org-wide patterns
+    ROW_RULES = ('CONSENT_VALIDITY', 'PURPOSE_LIMITATION', 'REVOCATION_HANDLING')
+
     @classmethod
-    def run_all_checks(cls, organization: Org) -> dict:
-        """Run all rules and calculate overall risk"""
-        all_violations = []
-        all_violations.extend(cls.check_consent_validity(organization))
-        all_violations.extend(cls.check_purpose_limitation(organization))
-        all_violations.extend(cls.check_data_minimization(organization))
-        all_violations.extend(cls.check_retention_policy(organization))
-        all_violations.extend(cls.check_access_control(organization))
-        all_violations.extend(cls.check_audit_trail(organization))
-        all_violations.extend(cls.check_revocation_handling(organization))
-        all_violations.extend(cls.check_excessive_requests(organization))
+    def evaluate(cls, organization: Org, context: ScanContext, instrumentation=NO_INSTRUMENTATION) -> list:
+        """Run every rule against a prepared context, measuring each when instrumented"""
+        violations = []
+        for rule, method in cls.RULE_CHECKS + (('DECLARATIVE', 'check_declarative_rules'),):
+            with instrumentation.measure(rule) as stats:
+                found = getattr(cls, method)(organization, context)
+            stats['rows_examined'] = len(context)
+            stats['violations'] = len(found)
+            violations.extend(found)
+        return violations
 
-        return {
-            'violations': all_violations,
-            'risk_score': cls.calculate_risk_score(all_violations),
-            'total_violations': len(all_violations),
-            'critical_count': len([v for v in all_violations if cls.RULES.get(v['rule'], {}).get('severity') == 'CRITICAL']),
-            'high_count': len([v for v in all_violations if cls.RULES.get(v['rule'], {}).get('severity') == 'HIGH']),
-            'medium_count': len([v for v in all_violations if cls.RULES.get(v['rule'], {}).get('severity') == 'MEDIUM']),
-        }
+    # Candidate rows each row rule can flag, so streaming reads only those
+    STREAM_ROW_FILTERS = {
+        'CONSENT_VALIDITY': Q(status='APPROVED', has_consent=False),
+        'PURPOSE_LIMITATION': Q(purpose_quality=VAGUE),
+        'REVOCATION_HANDLING': Q(status='APPROVED', has_consent=False),
+    }
+    STREAM_CHUNK_SIZE = 2000
+
+    @classmethod
+    def stream_contexts(cls, organization: Org, candidates: Q, facts: dict, now, chunk_size: int):
+        """Contexts over consecutive chunks of candidate rows, read through a server-side cursor"""
+        rows = AccessRequest.objects.filter(
+            organization=organization
+        ).annotate(
+            has_consent=active_consent_exists(),
+        ).filter(candidates).order_by('-requested_at', '-id').values_list(*ScanContext.FIELDS).iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield ScanContext.from_rows(organization, chunk, facts, now, declarative_values={})
+
+    @classmethod
+    def iter_violations(cls, organization: Org, chunk_size: int = None):
+        """
+        Yield violations in run_all_checks() order while holding at most one
+        chunk of rows in memory. Pattern and declarative rules come from
+        aggregate queries; each row rule streams its own candidate rows.
+        """
+        chunk_size = chunk_size or cls.STREAM_CHUNK_SIZE
+        context = ScanContext(organization, request_ids=())
+        for rule, method in cls.RULE_CHECKS + (('DECLARATIVE', 'check_declarative_rules'),):
+            check = getattr(cls, method)
+            if rule not in cls.STREAM_ROW_FILTERS:
+                yield from check(organization, context)
+                continue
+            for chunk in cls.stream_contexts(organization, cls.STREAM_ROW_FILTERS[rule], context.facts, context.now, chunk_size):
+                yield from check(organization, chunk)
+
+    @staticmethod
+    def load_context(organization: Org, instrumentation=NO_INSTRUMENTATION, **kwargs) -> ScanContext:
+        """Load the scan snapshot, measured as the SNAPSHOT stage when instrumented"""
+        with instrumentation.measure('SNAPSHOT') as stats:
+            context = ScanContext(organization, **kwargs)
+        stats['rows_examined'] = len(context)
+        return context
+
+    @classmethod
+    def rule_info(cls, rule: str) -> dict:
+        """Metadata for a built-in or declarative rule"""
+        return cls.RULES.get(rule) or get_declarative_rules().info.get(rule, {})
+
+    @classmethod
+    def summarize(cls, violations: list) -> dict:
+        """Build the scan result (risk score and severity counts) for a list of violations"""
+        summary = ScanSummary()
+        for violation in violations:
+            summary.add(violation)
+        return {'violations': violations, **summary.result()}
+
+    @classmethod
+    def run_all_checks(cls, organization: Org, instrument: bool = False) -> dict:
+        """
+        Run all rules against one shared data snapshot and calculate overall risk.
+
+        With instrument, the result includes 'rule_stats': wall time, query
+        count, rows examined and violations for the snapshot and each rule.
+        """
+        instrumentation = ScanInstrumentation() if instrument else NO_INSTRUMENTATION
+        context = cls.load_context(organization, instrumentation)
+        result = cls.summarize(cls.evaluate(organization, context, instrumentation))
+        if instrument:
+            result['rule_stats'] = instrumentation.finish()
+        return result
+
+    @classmethod
+    def run_incremental_checks(cls, organization: Org, instrument: bool = False) -> dict:
+        """
+        Rescan only what changed since the last scan and merge into its result.
+
+        Row rules are re-evaluated for access requests recorded in
+        ComplianceChange plus those the previous result flagged, loaded in
+        full-scan order; pattern rules are recomputed from one aggregate
+        query. Without a previous scan this falls back to a full scan.
+        Only the change rows read here are deleted, so a change committed
+        during the scan is picked up by the next one.
+        """
+        # Create the state row before reading changes: signals only record
+        # changes for organizations that have one, so a request saved during
+        # the fallback full scan would otherwise be lost
+        state, _ = ComplianceScanState.objects.get_or_create(organization=organization)
+        changes = list(ComplianceChange.objects.filter(
+            organization=organization
+        ).values_list('id', 'access_request_id'))
+        change_ids = [change_id for change_id, _ in changes]
+
+        if 'violations' not in state.result:
+            result = cls.run_all_checks(organization, instrument=instrument)
+            last_change_id = max(change_ids, default=0)
+        else:
+            dirty = {request_id for _, request_id in changes}
+            flagged = {
+                v['details'].get('access_request_id') for v in state.result.get('violations', [])
+                if v['rule'] in cls.ROW_RULES
+            }
+            instrumentation = ScanInstrumentation() if instrument else NO_INSTRUMENTATION
+            context = cls.load_context(organization, instrumentation, request_ids=dirty | flagged)
+            result = cls.summarize(cls.evaluate(organization, context, instrumentation))
+            if instrument:
+                result['rule_stats'] = instrumentation.finish()
+            last_change_id = max(change_ids, default=state.last_change_id)
+
+        ComplianceScanState.objects.update_or_create(
+            organization=organization,
+            defaults={
+                'result': {key: value for key, value in result.items() if key != 'rule_stats'},
+                'last_change_id': last_change_id,
+            },
+        )
+        if change_ids:
+            ComplianceChange.objects.filter(id__in=change_ids).delete()
+        return result
+
+    @classmethod
+    def run_streaming_checks(cls, organization: Org, persist: bool = True, chunk_size: int = None) -> dict:
+        """
+        Scan with bounded memory for organizations too large to snapshot.
+
+        Violations are consumed as they are produced: counted into the summary
+        and, with persist, written in WRITE_BATCH_SIZE chunks. The result has
+        the usual totals and risk score but no 'violations' list.
+        """
+        summary = ScanSummary()
+        stream = cls.iter_violations(organization, chunk_size)
+        while True:
+            batch = list(islice(stream, cls.WRITE_BATCH_SIZE))
+            if not batch:
+                break
+            for violation in batch:
+                summary.add(violation)
+            if persist:
+                cls.persist_violations((organization, violation) for violation in batch)
+        if persist:
+            bump_data_version(organization.id)
+            record_scans({organization.id: summary.result()})
+        return summary.result()
+
+    @classmethod
+    def should_stream(cls, organization: Org) -> bool:
+        """Whether the organization has at least COMPLIANCE_STREAM_THRESHOLD access requests"""
+        threshold = getattr(settings, 'COMPLIANCE_STREAM_THRESHOLD', None)
+        if threshold is None:
+            return False
+        total = TrustComponentCounters.objects.filter(
+            organization_id=organization.id
+        ).values_list('total_requests', flat=True).first()
+        if total is None:
+            total = AccessRequest.objects.filter(organization=organization).count()
+        return total >= threshold
+
+    @classmethod
+    def get_scan_result(cls, organization: Org) -> dict:
+        """
+        Read-only scan result, computed at most once per organization data
+        version. Organizations over the streaming threshold get the streamed
+        result (totals and risk score, no 'violations' list).
+        """
+        version = data_version(organization.id)
+        result = get_cached(SCAN, organization.id, version) or get_cached(SCAN_PREVIEW, organization.id, version)
+        if result is None:
+            if cls.should_stream(organization):
+                result = cls.run_streaming_checks(organization, persist=False)
+            else:
+                result = cls.run_all_checks(organization)
+            # Kept apart from persisted scans so scan_and_persist never mistakes it for stored audits
+            set_cached(SCAN_PREVIEW, organization.id, version, result)
+        return result
+
+    @classmethod
+    def scan_and_persist(cls, organization: Org, instrument: bool = False) -> tuple:
+        """
+        Scan and record audits, reusing the cached result while data is unchanged.
+
+        Returns (scan_result, audit_records). A fresh scan bumps the data
+        version once for the audits it wrote and is cached under the new
+        version, unless another write landed while it was running.
+        Organizations over the streaming threshold are streamed instead:
+        audits are written as they are found and none are returned, and the
+        incremental baseline is dropped so the next small scan starts fresh.
+        """
+        version = data_version(organization.id)
+        cached = None if instrument else get_cached(SCAN, organization.id, version)
+        if cached is not None:
+            return cached, cls.fetch_audit_records(organization, cached)
+
+        if cls.should_stream(organization):
+            ComplianceScanState.objects.filter(organization=organization).delete()
+            ComplianceChange.objects.filter(organization=organization).delete()
+            return cls.run_streaming_checks(organization), []
+
+        result = cls.run_incremental_checks(organization, instrument=instrument)
+        audit_records = cls.create_audit_records(organization, result)
+        new_version = bump_data_version(organization.id)
+        record_scans({organization.id: result})
+        if new_version == version + 1:
+            set_cached(SCAN, organization.id, new_version, {k: v for k, v in result.items() if k != 'rule_stats'})
+        return result, audit_records
+
+    @classmethod
+    def batch_candidate_rows(cls, org_ids: list):
+        """
+        Rows that can trigger a row rule, for many organizations in one query:
+        approved requests without active consent and vague or short purposes.
+        """
+        return AccessRequest.objects.filter(
+            organization_id__in=org_ids
+        ).annotate(
+            has_consent=active_consent_exists(),
+        ).filter(
+            Q(status='APPROVED', has_consent=False) | Q(purpose_quality=VAGUE)
+        ).order_by('organization_id', '-requested_at', '-id').values_list('organization_id', *ScanContext.FIELDS)
+
+    @classmethod
+    def run_batch_checks(cls, organizations=None, batch_size: int = 500, persist: bool = True, progress=None,
+                         workers: int = 1) -> dict:
+        """
+        Scan many organizations with grouped queries instead of one scan per org.
+
+        Each batch of organizations costs one grouped aggregate for pattern
+        rules and one query for row-rule candidates, regardless of batch size.
+        With persist, scan baselines are upserted in bulk and audit records
+        are written. `progress(done, total)` is called after every batch.
+        With workers > 1, batches are sharded across a process pool.
+        Returns scan results keyed by organization id.
+        """
+        if organizations is None:
+            organizations = Org.objects.all()
+        if workers > 1:
+            from .parallel import run_parallel_scan
+            org_ids = list(organizations.values_list('id', flat=True))
+            return run_parallel_scan(org_ids, workers, batch_size=batch_size, persist=persist, progress=progress)
+        orgs = list(organizations.only('id', 'name').order_by('id'))
+        watermark = ComplianceChange.objects.aggregate(last=Max('id'))['last'] or 0
+        now = timezone.now()
+        results = {}
+
+        for start in range(0, len(orgs), batch_size):
+            batch = orgs[start:start + batch_size]
+            org_ids = [org.id for org in batch]
+            if persist:
+                # Signals only record changes for organizations with a state row
+                ComplianceScanState.objects.bulk_create(
+                    [ComplianceScanState(organization=org) for org in batch], ignore_conflicts=True
+                )
+            # Read before scanning; only these are deleted, so late-committing changes survive
+            change_ids = list(ComplianceChange.objects.filter(
+                organization_id__in=org_ids
+            ).values_list('id', flat=True)) if persist else []
+
+            facts = {
+                row.pop('organization_id'): row
+                for row in AccessRequest.objects.filter(
+                    organization_id__in=org_ids
+                ).order_by().values('organization_id').annotate(**organization_fact_aggregates(now))
+            }
+            declarative = {}
+            if get_declarative_rules():
+                declarative = get_declarative_rules().evaluate_batch(
+                    AccessRequest.objects.filter(organization_id__in=org_ids), now,
+                    group_field='organization_id', keys=org_ids,
+                )
+            rows_by_org = {
+                org_id: [row[1:] for row in rows]
+                for org_id, rows in groupby(cls.batch_candidate_rows(org_ids).iterator(), key=itemgetter(0))
+            }
+
+            for org in batch:
+                context = ScanContext.from_rows(
+                    org, rows_by_org.get(org.id, []), facts.get(org.id, empty_facts()), now, declarative.get(org.id, {})
+                )
+                results[org.id] = cls.summarize(cls.evaluate(org, context))
+
+            if persist:
+                ComplianceScanState.objects.bulk_create(
+                    [ComplianceScanState(organization=org, result=results[org.id], last_change_id=watermark) for org in batch],
+                    update_conflicts=True,
+                    unique_fields=['organization'],
+                    update_fields=['result', 'last_change_id', 'scanned_at'],
+                )
+                if change_ids:
+                    ComplianceChange.objects.filter(id__in=change_ids).delete()
+                cls.persist_violations(
+                    (org, violation) for org in batch for violation in results[org.id]['violations']
+                )
+                for org_id in org_ids:
+                    bump_data_version(org_id)
+                record_scans({org_id: results[org_id] for org_id in org_ids}, at=now)
+
+            if progress:
+                progress(min(start + batch_size, len(orgs)), len(orgs))
+
+        return results
+
+    # Risk points per violation by severity; unknown severities score as LOW
+    SEVERITY_POINTS = {'CRITICAL': 20, 'HIGH': 15, 'MEDIUM': 10, 'LOW': 5}
 
     @staticmethod
     def calculate_risk_score(violations: list) -> int:
         """Calculate NDPR risk score (0-100)"""
         score = 0
         for v in violations:
-            severity = NDPRRulesEngine.RULES.get(v['rule'], {}).get('severity', 'MEDIUM')
-            if severity == 'CRITICAL':
-                score += 20
-            elif severity == 'HIGH':
-                score += 15
-            elif severity == 'MEDIUM':
-                score += 10
-            else:
-                score += 5
+            severity = NDPRRulesEngine.rule_info(v['rule']).get('severity', 'MEDIUM')
+            score += NDPRRulesEngine.SEVERITY_POINTS.get(severity, NDPRRulesEngine.SEVERITY_POINTS['LOW'])
         return min(score, 100)
 
+    # Rows per INSERT/SELECT statement when persisting scan results
+    WRITE_BATCH_SIZE = 1000
+
+    @staticmethod
+    def violation_key(violation: dict) -> str:
+        """
+        Stable identity of a violation: its rule, plus the access request for
+        row rules or the group for grouped declarative rules
+        """
+        details = violation.get('details', {})
+        request_id = details.get('access_request_id')
+        if request_id is not None:
+            return f"{violation['rule']}:{request_id}"
+        if 'group' in details:
+            key = f"{violation['rule']}:group:{details['group']}"
+            if len(key) > 100:  # ComplianceAudit.violation_key max_length
+                key = f"{violation['rule']}:group:{hashlib.sha256(details['group'].encode()).hexdigest()[:32]}"
+            return key
+        return violation['rule']
+
+    @staticmethod
+    def violation_fingerprint(violation: dict) -> str:
+        """SHA-256 of a violation's content; changes whenever its details or recommendation do"""
+        content = json.dumps(
+            [violation['rule'], violation.get('details', {}), violation.get('recommendation', '')],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(content.encode()).hexdigest()
+
     @classmethod
-    def create_audit_records(cls, organization: Org, scan_result: dict) -> list:
-        """Create audits and violation reports idempotently"""
-        audit_records = []
-        for violation in scan_result.get('violations', []):
-            rule_info = cls.RULES.get(violation['rule'], {})
-            audit, _ = ComplianceAudit.objects.get_or_create(
-                organization=organization,
+    def stored_fingerprints(cls, keys: list) -> dict:
+        """(pk, fingerprint) of existing audits by (organization id, violation_key)"""
+        stored = {}
+        for start in range(0, len(keys), cls.WRITE_BATCH_SIZE):
+            chunk = keys[start:start + cls.WRITE_BATCH_SIZE]
+            rows = ComplianceAudit.objects.filter(
+                organization_id__in={org_id for org_id, _ in chunk},
+                violation_key__in={key for _, key in chunk},
+            ).values_list('organization_id', 'violation_key', 'pk', 'fingerprint')
+            stored.update(((org_id, key), (pk, fingerprint)) for org_id, key, pk, fingerprint in rows)
+        return stored
+
+    @classmethod
+    def persist_violations(cls, items) -> list:
+        """
+        Upsert audits and violation reports for (organization, violation) pairs.
+
+        Audits are keyed on (organization, violation_key) and carry a content
+        fingerprint: only new violations and those whose content changed are
+        written, so re-persisting the same scan costs one lookup query. A
+        changed violation is reopened as PENDING, even if it was resolved.
+        Returns the ids of the audits, in input order.
+        """
+        pending = {}
+        for organization, violation in items:
+            rule_info = cls.rule_info(violation['rule'])
+            key = cls.violation_key(violation)
+            audit = ComplianceAudit(
+                organization_id=organization.id,
+                violation_key=key,
                 rule_name=rule_info.get('name', violation['rule']),
-                defaults={
-                    'rule_description': rule_info.get('description', ''),
-                    'severity': rule_info.get('severity', 'MEDIUM'),
-                    'details': violation.get('details', {}),
-                    'recommendation': violation.get('recommendation', ''),
-                    'status': 'PENDING',
-                }
+                rule_description=rule_info.get('description', ''),
+                severity=rule_info.get('severity', 'MEDIUM'),
+                details=violation.get('details', {}),
+                recommendation=violation.get('recommendation', ''),
+                fingerprint=cls.violation_fingerprint(violation),
+                status='PENDING',
+                resolved_at=None,
             )
-            audit_records.append(audit)
-
-            if rule_info.get('severity') in ['CRITICAL', 'HIGH']:
-                ViolationReport.objects.get_or_create(
-                    organization=organization,
-                    violation_type=violation.get('rule', 'PRIVACY_BREACH'),
-                    related_audit=audit,
-                    defaults={
-                        'description': violation.get('recommendation', rule_info.get('description', '')),
-                        'affected_users_count': 1 if 'user_id' in violation.get('details', {}) else 0,
-                        'reported_to_dpo': rule_info.get('severity') == 'CRITICAL',
-                    }
-                )
-        return audit_records
+            pending[(organization.id, key)] = (audit, violation, rule_info)
+        if not pending:
+            return []
+
+        stored = cls.stored_fingerprints(list(pending))
+        changed = {}
+        for identity, (audit, violation, rule_info) in pending.items():
+            pk, fingerprint = stored.get(identity, (None, None))
+            if fingerprint == audit.fingerprint:
+                audit.pk = pk
+            else:
+                changed[identity] = (audit, violation, rule_info)
+
+        # Postgres and SQLite return the id of inserted or updated rows for upserts
+        ComplianceAudit.objects.bulk_create(
+            [audit for audit, _, _ in changed.values()],
+            batch_size=cls.WRITE_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['organization', 'violation_key'],
+            update_fields=[
+                'rule_name', 'rule_description', 'severity', 'details', 'recommendation', 'fingerprint',
+                'status', 'resolved_at',
+            ],
+        )
+
+        ViolationReport.objects.bulk_create([
+            ViolationReport(
+                organization_id=audit.organization_id,
+                violation_type=violation.get('rule', 'PRIVACY_BREACH'),
+                related_audit=audit,
+                description=violation.get('recommendation', rule_info.get('description', '')),
+                affected_users_count=1 if 'user_id' in violation.get('details', {}) else 0,
+                reported_to_dpo=rule_info.get('severity') == 'CRITICAL',
+            )
+            for audit, violation, rule_info in changed.values()
+            if rule_info.get('severity') in ['CRITICAL', 'HIGH']
+        ], batch_size=cls.WRITE_BATCH_SIZE, ignore_conflicts=True)
+
+        if changed:
+            from .summary import refresh_summaries
+            refresh_summaries({org_id for org_id, _ in changed})
+        return [audit.pk for audit, _, _ in pending.values()]
+
+    @classmethod
+    def create_audit_records(cls, organization: Org, scan_result: dict) -> list:
+        """Create audits and violation reports idempotently, in bulk"""
+        cls.persist_violations(
+            (organization, violation) for violation in scan_result.get('violations', [])
+        )
+        return cls.fetch_audit_records(organization, scan_result)
+
+    @classmethod
+    def fetch_audit_records(cls, organization: Org, scan_result: dict) -> list:
+        """Stored audits for a scan result's violations, in violation order"""
+        keys = list(dict.fromkeys(cls.violation_key(v) for v in scan_result.get('violations', [])))
+        audits = {}
+        for start in range(0, len(keys), cls.WRITE_BATCH_SIZE):
+            chunk = keys[start:start + cls.WRITE_BATCH_SIZE]
+            audits.update((audit.violation_key, audit) for audit in ComplianceAudit.objects.select_related(
+                'organization'
+            ).filter(organization=organization, violation_key__in=chunk))
+        return [audits[key] for key in keys if key in audits]
+
+
+class ScanSummary:
+    """Running risk score and severity counts for a stream of violations"""
+
+    def __init__(self):
+        self.points = 0
+        self.total = 0
+        self.counts = {'CRITICAL': 0, 'HIGH': 0, 'MEDIUM': 0}
+
+    def add(self, violation: dict):
+        severity = NDPRRulesEngine.rule_info(violation['rule']).get('severity', 'MEDIUM')
+        self.points += NDPRRulesEngine.SEVERITY_POINTS.get(severity, NDPRRulesEngine.SEVERITY_POINTS['LOW'])
+        self.total += 1
+        if severity in self.counts:
+            self.counts[severity] += 1
+
+    def result(self) -> dict:
+        return {
+            'risk_score': min(self.points, 100),
+            'total_violations': self.total,
+            'critical_count': self.counts['CRITICAL'],
+            'high_count': self.counts['HIGH'],
+            'medium_count': self.counts['MEDIUM'],
+        }
@@ -0,0 +1,146 @@
+"""
+Per-scan data snapshot for the NDPR rules engine
+Loads an organization's access-request facts in one query so every rule
+evaluates in memory instead of re-reading the same rows
+"""
+from datetime import timedelta
+from django.db.models import Count, Exists, Min, OuterRef, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+from organization.models import AccessRequest, Org
+from consents.models import UserConsent
+from .rule_dsl import get_declarative_rules
+
+RETENTION_DAYS = 365
+RECENT_ACTIVITY_DAYS = 30
+
+
+def active_consent_exists():
+    """Correlated subquery: the request's user currently grants the requested consent"""
+    return Exists(UserConsent.objects.filter(
+        user=OuterRef('user'),
+        consent=OuterRef('consent'),
+        access=True,
+    ))
+
+
+def organization_fact_aggregates(now) -> dict:
+    """Aggregate expressions for the org-wide facts used by pattern rules"""
+    retention_cutoff = now - timedelta(days=RETENTION_DAYS)
+    recent_cutoff = now - timedelta(days=RECENT_ACTIVITY_DAYS)
+    approved = Q(status='APPROVED')
+    retained = approved & Q(requested_at__lt=retention_cutoff)
+    return {
+        'approved_users': Count('user', distinct=True, filter=approved),
+        'approved_consent_types': Count('consent', distinct=True, filter=approved),
+        'retention_count': Count('pk', filter=retained),
+        'oldest_retained_at': Min('requested_at', filter=retained),
+        'revoked_count': Count('pk', filter=Q(status='REVOKED')),
+        'missing_purpose_count': Count('pk', filter=Q(purpose__isnull=True)),
+        'recent_count': Count('pk', filter=Q(requested_at__gte=recent_cutoff)),
+    }
+
+
+def empty_facts() -> dict:
+    """Facts for an organization without access requests"""
+    return {
+        'approved_users': 0,
+        'approved_consent_types': 0,
+        'retention_count': 0,
+        'oldest_retained_at': None,
+        'revoked_count': 0,
+        'missing_purpose_count': 0,
+        'recent_count': 0,
+    }
+
+
+class ScanContext:
+    """
+    Columnar snapshot of an organization's access requests for a single scan.
+
+    With `request_ids` only those rows are loaded (incremental rescans) and the
+    org-wide facts come from one aggregate query instead of the columns.
+    """
+
+    FIELDS = (
+        'id', 'status', 'requested_at', 'purpose', 'purpose_quality',
+        'user_id', 'consent_id', 'consent__name', 'has_consent',
+    )
+
+    def __init__(self, organization: Org, now=None, request_ids=None):
+        self.organization = organization
+        self.now = now or timezone.now()
+        self.partial = request_ids is not None
+
+        queryset = AccessRequest.objects.filter(organization=organization)
+        if self.partial:
+            queryset = queryset.filter(pk__in=request_ids)
+        rows = queryset.annotate(
+            has_consent=active_consent_exists()
+        ).order_by('-requested_at', '-id').values_list(*self.FIELDS)
+        self._load(list(rows))
+
+    @classmethod
+    def from_rows(cls, organization: Org, rows: list, facts: dict, now, declarative_values: dict = None) -> 'ScanContext':
+        """Build a context from rows and facts already fetched for many organizations at once"""
+        context = cls.__new__(cls)
+        context.organization = organization
+        context.now = now
+        context.partial = True
+        context._load(rows)
+        context.facts = facts
+        if declarative_values is not None:
+            context.declarative_values = declarative_values
+        return context
+
+    def _load(self, rows: list):
+        """Transpose row tuples into one tuple per column"""
+        columns = list(zip(*rows)) if rows else [()] * len(self.FIELDS)
+        (
+            self.ids,
+            self.statuses,
+            self.requested_at,
+            self.purposes,
+            self.purpose_qualities,
+            self.user_ids,
+            self.consent_ids,
+            self.consent_names,
+            self.has_consent,
+        ) = columns
+        self.approved = tuple(i for i, s in enumerate(self.statuses) if s == 'APPROVED')
+
+    def __len__(self):
+        return len(self.ids)
+
+    # -------------------- Org-wide Facts --------------------
+
+    @cached_property
+    def facts(self) -> dict:
+        """Org-wide counts for pattern rules, keyed like organization_fact_aggregates()"""
+        if self.partial:
+            return AccessRequest.objects.filter(
+                organization=self.organization
+            ).aggregate(**organization_fact_aggregates(self.now))
+        return self._column_facts()
+
+    def _column_facts(self) -> dict:
+        retention_cutoff = self.now - timedelta(days=RETENTION_DAYS)
+        recent_cutoff = self.now - timedelta(days=RECENT_ACTIVITY_DAYS)
+        retained = [self.requested_at[i] for i in self.approved if self.requested_at[i] < retention_cutoff]
+        return {
+            'approved_users': len({self.user_ids[i] for i in self.approved}),
+            'approved_consent_types': len({self.consent_ids[i] for i in self.approved}),
+            'retention_count': len(retained),
+            'oldest_retained_at': min(retained, default=None),
+            'revoked_count': sum(1 for s in self.statuses if s == 'REVOKED'),
+            'missing_purpose_count': sum(1 for p in self.purposes if p is None),
+            'recent_count': sum(1 for t in self.requested_at if t >= recent_cutoff),
+        }
+
+    @cached_property
+    def declarative_values(self) -> dict:
+        """Breaching values of the configured declarative rules (no query when none are configured)"""
+        rules = get_declarative_rules()
+        if not rules:
+            return {}
+        return rules.evaluate(AccessRequest.objects.filter(organization=self.organization), self.now)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import ComplianceAudit, ViolationReport
+from .models import ComplianceAudit, ViolationReport, ComplianceScanJob
 
 
 # For saved objects (DB model instances)
@@ -50,3 +50,15 @@ class ComplianceScanResultSerializer(serializers.Serializer):
         child=serializers.DictField(),
         read_only=True
     )
+
+    # Per-rule timing and query counts, present only for instrumented scans
+    rule_stats = serializers.DictField(required=False, read_only=True)
+
+
+class ComplianceScanJobSerializer(serializers.ModelSerializer):
+    """Queued scan status; `result` holds a ComplianceScanResultSerializer payload once SUCCEEDED"""
+
+    class Meta:
+        model = ComplianceScanJob
+        fields = ['id', 'status', 'created_at', 'started_at', 'finished_at', 'result', 'error']
+        read_only_fields = fields
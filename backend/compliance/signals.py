@@ -0,0 +1,67 @@
+"""
+Django signals for compliance change tracking
+Records which access requests changed since an organization's last scan
+and invalidates cached scan results for the organizations affected
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from organization.models import AccessRequest, Org
+from consents.models import UserConsent
+from .cache import bump_data_version
+from .summary import refresh_summaries
+from .models import ComplianceAudit, ComplianceChange, ComplianceDataVersion, ComplianceScanState, ViolationReport
+
+
+@receiver(post_save, sender=Org)
+def create_data_version(sender, instance, created, **kwargs):
+    """Start new organizations with a data version so cached reads never have to create one"""
+    if created:
+        ComplianceDataVersion.objects.get_or_create(organization=instance)
+
+
+@receiver(post_save, sender=AccessRequest)
+@receiver(post_delete, sender=AccessRequest)
+def track_access_request_change(sender, instance, **kwargs):
+    """New requests, status or purpose changes and deletions"""
+    bump_data_version(instance.organization_id)
+    if ComplianceScanState.objects.filter(organization_id=instance.organization_id).exists():
+        ComplianceChange.objects.create(
+            organization_id=instance.organization_id,
+            access_request_id=instance.pk,
+        )
+
+
+@receiver(post_save, sender=UserConsent)
+@receiver(post_delete, sender=UserConsent)
+def track_user_consent_change(sender, instance, **kwargs):
+    """Consent grants and revocations affect every approved request for that user and consent type"""
+    affected = list(AccessRequest.objects.filter(
+        user_id=instance.user_id,
+        consent_id=instance.consent_id,
+        status='APPROVED',
+    ).values_list('id', 'organization_id', 'organization__compliance_scan_state'))
+    record_access_request_changes(affected)
+
+
+def record_access_request_changes(affected):
+    """
+    Track access requests changed outside save(), e.g. by bulk updates.
+    `affected` holds (request id, organization id, scan state id or None) rows.
+    """
+    for org_id in {org_id for _, org_id, _ in affected}:
+        bump_data_version(org_id)
+    ComplianceChange.objects.bulk_create([
+        ComplianceChange(organization_id=org_id, access_request_id=request_id)
+        for request_id, org_id, scan_state in affected
+        if scan_state is not None
+    ])
+
+
+@receiver(post_save, sender=ComplianceAudit)
+@receiver(post_delete, sender=ComplianceAudit)
+@receiver(post_save, sender=ViolationReport)
+@receiver(post_delete, sender=ViolationReport)
+def track_audit_change(sender, instance, **kwargs):
+    """Audit status changes and violation reports feed dashboards and trust scores"""
+    bump_data_version(instance.organization_id)
+    refresh_summaries([instance.organization_id], create=False)
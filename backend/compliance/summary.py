@@ -0,0 +1,94 @@
+"""
+Per-organization compliance dashboard summary
+Counts come from one conditional-aggregation query per refresh and are
+stored in ComplianceSummary, so dashboards read a single row instead of
+counting audits and violation reports on every page load.
+"""
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from organization.models import Org
+from .models import ComplianceSummary, ViolationReport
+from .rules_engine import NDPRRulesEngine
+
+COUNT_FIELDS = (
+    'total_audits', 'pending_audits', 'resolved_audits',
+    'pending_critical', 'pending_high', 'pending_medium', 'pending_low',
+    'unresolved_violations',
+)
+
+
+def _unresolved_violations():
+    """Correlated count of an organization's unresolved violation reports"""
+    return Coalesce(Subquery(
+        ViolationReport.objects.filter(
+            organization=OuterRef('pk'),
+            resolved=False,
+        ).order_by().values('organization').annotate(count=Count('pk')).values('count'),
+        output_field=IntegerField(),
+    ), Value(0))
+
+
+def summary_counts(org_ids) -> dict:
+    """Dashboard counts keyed by organization id, in one query"""
+    pending = Q(compliance_audits__status='PENDING')
+    rows = Org.objects.filter(pk__in=org_ids).order_by().values('pk').annotate(
+        total_audits=Count('compliance_audits'),
+        pending_audits=Count('compliance_audits', filter=pending),
+        resolved_audits=Count('compliance_audits', filter=Q(compliance_audits__status='RESOLVED')),
+        pending_critical=Count('compliance_audits', filter=pending & Q(compliance_audits__severity='CRITICAL')),
+        pending_high=Count('compliance_audits', filter=pending & Q(compliance_audits__severity='HIGH')),
+        pending_medium=Count('compliance_audits', filter=pending & Q(compliance_audits__severity='MEDIUM')),
+        pending_low=Count('compliance_audits', filter=pending & Q(compliance_audits__severity='LOW')),
+        unresolved_violations=_unresolved_violations(),
+    )
+    return {row.pop('pk'): row for row in rows}
+
+
+def risk_score(counts: dict) -> int:
+    """NDPR risk score from pending audit severities (same points as calculate_risk_score)"""
+    points = NDPRRulesEngine.SEVERITY_POINTS
+    score = (
+        counts['pending_critical'] * points['CRITICAL']
+        + counts['pending_high'] * points['HIGH']
+        + counts['pending_medium'] * points['MEDIUM']
+        + counts['pending_low'] * points['LOW']
+    )
+    return min(score, 100)
+
+
+def refresh_summaries(org_ids, create: bool = True):
+    """
+    Recompute summaries for organizations. With create=False only existing
+    rows are updated (safe from delete signals while an organization is
+    being removed).
+    """
+    counts = summary_counts(org_ids)
+    summaries = [
+        ComplianceSummary(organization_id=org_id, risk_score=risk_score(values), **values)
+        for org_id, values in counts.items()
+    ]
+    if create:
+        ComplianceSummary.objects.bulk_create(
+            summaries,
+            batch_size=NDPRRulesEngine.WRITE_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['organization'],
+            update_fields=[*COUNT_FIELDS, 'risk_score', 'updated_at'],
+        )
+    else:
+        for summary in summaries:
+            ComplianceSummary.objects.filter(organization_id=summary.organization_id).update(
+                risk_score=summary.risk_score,
+                updated_at=timezone.now(),
+                **{field: getattr(summary, field) for field in COUNT_FIELDS},
+            )
+    return summaries
+
+
+def get_summary(organization: Org) -> ComplianceSummary:
+    """The organization's summary row, computed on first use"""
+    summary = ComplianceSummary.objects.filter(organization=organization).first()
+    if summary is None:
+        summary, = refresh_summaries([organization.id])
+    return summary
@@ -0,0 +1,148 @@
+"""
+Synthetic data for benchmarking the compliance engine
+Every generated row hangs off users or consent types named with a marker
+prefix, so a dataset can be removed without touching real data
+"""
+import random
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+from consents.models import Consent, ConsentHistory, UserConsent
+from organization.models import Org, AccessRequest
+from organization.purpose_quality import classify_purpose
+
+SYNTHETIC_DOMAIN = 'synthetic.invalid'
+
+PURPOSES = [
+    'Identity verification for account opening',
+    'Credit assessment for loan application',
+    'Fraud monitoring on card transactions',
+    'Delivery address confirmation',
+    'general',
+    'research',
+    'marketing',
+]
+
+
+def _zipf_weights(n: int, skew: float) -> list:
+    """Relative weights for n items; skew 0 is uniform, larger values concentrate on the first items"""
+    return [1 / (rank + 1) ** skew for rank in range(n)]
+
+
+def _backdate(model, field: str, ages: dict, now):
+    """Set `field` to now - age for {pk: age in days}; one UPDATE per distinct age bucket"""
+    by_age = {}
+    for pk, age in ages.items():
+        by_age.setdefault(age, []).append(pk)
+    for age, pks in by_age.items():
+        for start in range(0, len(pks), 1000):
+            model.objects.filter(pk__in=pks[start:start + 1000]).update(**{field: now - timedelta(days=age)})
+
+
+def generate_dataset(orgs: int, citizens: int, consent_types: int, requests_per_org: int,
+                     prefix: str = 'bench', seed: int = 0, skew: float = 0.0,
+                     history_days: int = 0, consent_history: bool = False) -> list:
+    """
+    Create a synthetic platform and return the new organization ids.
+
+    `requests_per_org` is the mean; with skew > 0 organization sizes and
+    citizen popularity follow a Zipf-like distribution (a few large orgs,
+    a few heavily requested citizens). With history_days, request and
+    consent timestamps are spread over that many past days, weighted
+    towards recent activity. consent_history adds grant, revoke and
+    re-grant ConsentHistory rows.
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+    password = make_password(None)
+    now = timezone.now()
+
+    consents = Consent.objects.bulk_create([
+        Consent(name=f'{prefix}-consent-{i}') for i in range(consent_types)
+    ])
+    citizen_users = User.objects.bulk_create([
+        User(email=f'{prefix}-citizen-{i}@{SYNTHETIC_DOMAIN}', password=password, user_role='CITIZEN')
+        for i in range(citizens)
+    ], batch_size=1000)
+    org_users = User.objects.bulk_create([
+        User(email=f'{prefix}-org-{i}@{SYNTHETIC_DOMAIN}', password=password, user_role='ORGANIZATION')
+        for i in range(orgs)
+    ], batch_size=1000)
+    organizations = Org.objects.bulk_create([
+        Org(user=user, name=f'{prefix}-org-{i}', email=user.email, address='Synthetic')
+        for i, user in enumerate(org_users)
+    ], batch_size=1000)
+
+    user_consents = UserConsent.objects.bulk_create([
+        UserConsent(user=citizen, consent=consent, access=access, granted_at=now, revoked_at=None if access else now)
+        for citizen in citizen_users
+        for consent in consents
+        for access in [rng.random() < 0.8]
+    ], batch_size=1000)
+    if history_days:
+        _backdate(UserConsent, 'granted_at', {uc.pk: rng.randrange(history_days) for uc in user_consents}, now)
+    if consent_history:
+        _generate_consent_history(rng, user_consents, history_days or 1, now)
+
+    pairs = len(citizen_users) * len(consents)
+    org_weights = _zipf_weights(len(organizations), skew)
+    scale = requests_per_org * len(organizations) / (sum(org_weights) or 1)
+    citizen_weights = _zipf_weights(len(citizen_users), skew)
+    requests = []
+    for org, weight in zip(organizations, org_weights):
+        size = min(pairs, max(1, round(weight * scale)))
+        if skew:
+            chosen = set()
+            for _ in range(size * 20):
+                if len(chosen) == size:
+                    break
+                citizen, = rng.choices(range(len(citizen_users)), weights=citizen_weights)
+                chosen.add(citizen * len(consents) + rng.randrange(len(consents)))
+        else:
+            chosen = rng.sample(range(pairs), size)
+        for pair in chosen:
+            citizen, consent = divmod(pair, len(consents))
+            purpose = rng.choice(PURPOSES)
+            requests.append(AccessRequest(
+                organization=org,
+                user=citizen_users[citizen],
+                consent=consents[consent],
+                status=rng.choices(['APPROVED', 'PENDING', 'REVOKED'], weights=[6, 3, 1])[0],
+                purpose=purpose,
+                purpose_quality=classify_purpose(purpose),
+            ))
+    AccessRequest.objects.bulk_create(requests, batch_size=1000)
+    if history_days:
+        # Recent activity dominates: ages are exponential with a 90-day mean
+        _backdate(AccessRequest, 'requested_at', {
+            request.pk: min(history_days - 1, int(rng.expovariate(1 / 90))) for request in requests
+        }, now)
+
+    return [org.id for org in organizations]
+
+
+def _generate_consent_history(rng, user_consents: list, history_days: int, now):
+    """Grant rows for every consent, plus revoke/re-grant churn ending in its current state"""
+    entries, ages = [], []
+    for user_consent in user_consents:
+        changes = int(rng.expovariate(1))
+        if (changes % 2 == 1) == user_consent.access:
+            changes += 1
+        state = True
+        actions = [('GRANTED', None, True)]
+        for _ in range(changes):
+            actions.append(('REVOKED' if state else 'GRANTED', state, not state))
+            state = not state
+        # Oldest first, so the history reads in order
+        for (action, previous, new), age in zip(actions, sorted((rng.randrange(history_days) for _ in actions), reverse=True)):
+            entries.append(ConsentHistory(user_consent=user_consent, action=action, previous_value=previous, new_value=new))
+            ages.append(age)
+    entries = ConsentHistory.objects.bulk_create(entries, batch_size=1000)
+    _backdate(ConsentHistory, 'changed_at', {entry.pk: age for entry, age in zip(entries, ages)}, now)
+
+
+def remove_dataset(prefix: str = 'bench'):
+    """Delete a synthetic dataset (cascades to organizations, consents and requests)"""
+    get_user_model().objects.filter(email__startswith=f'{prefix}-', email__endswith=f'@{SYNTHETIC_DOMAIN}').delete()
+    Consent.objects.filter(name__startswith=f'{prefix}-consent-').delete()
@@ -1,11 +1,32 @@
 """
 Tests for compliance module
 """
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.contrib.auth import get_user_model
-from organization.models import Org
-from compliance.models import ComplianceAudit, ViolationReport
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from organization.models import Org, AccessRequest
+from organization.purpose_quality import purpose_quality_expression
+from consents.models import Consent, ConsentHistory, UserConsent
+from compliance.models import ComplianceAudit, ViolationReport, ComplianceChange, ComplianceDataVersion, ComplianceScanJob, ComplianceScanState, ComplianceSummary, RiskScorePoint
+from compliance import risk_history
+from compliance.benchmark import compare, run_benchmarks
+from compliance.synthetic import generate_dataset
+from compliance.jobs import claim_next_job, enqueue_scan, heartbeat, prune_finished_jobs, requeue_stale_jobs, run_job
 from compliance.rules_engine import NDPRRulesEngine
+from compliance.parallel import run_parallel_scan, shard_organizations, shard_size
+from compliance.rule_dsl import RuleSet
+from compliance.instrumentation import reset_rule_metrics, rule_metrics
+from compliance.cache import data_version
 
 User = get_user_model()
 
@@ -112,3 +133,753 @@ class ComplianceModelsTestCase(TestCase):
         self.assertFalse(violation.resolved)
 
 
+class OrganizationDataMixin:
+    """Organization with one consented and one unconsented approved request"""
+
+    def setUp(self):
+        """Set up an organization with consented and unconsented approved requests"""
+        self.org_user = User.objects.create_user(
+            email='org@test.com',
+            password='testpass123',
+            user_role='ORGANIZATION'
+        )
+        self.org = Org.objects.create(
+            user=self.org_user,
+            name='Test Organization',
+            email='org@test.com',
+            address='123 Test St'
+        )
+        self.consent = Consent.objects.create(name='Email')
+        self.revoked_request = self._approved_request('revoked@test.com', access=False)
+        self.valid_request = self._approved_request('valid@test.com', access=True)
+
+    def _approved_request(self, email, access):
+        citizen = User.objects.create_user(email=email, password='testpass123')
+        UserConsent.objects.create(user=citizen, consent=self.consent, access=access)
+        return AccessRequest.objects.create(
+            organization=self.org,
+            user=citizen,
+            consent=self.consent,
+            status='APPROVED',
+            purpose='Account verification for loan application',
+        )
+
+
+class ConsentValidityRulesTestCase(OrganizationDataMixin, TestCase):
+    """Test consent validity and revocation rules"""
+
+    def test_only_unconsented_requests_are_flagged(self):
+        """Test that only requests without active consent are violations"""
+        for check in (NDPRRulesEngine.check_consent_validity, NDPRRulesEngine.check_revocation_handling):
+            violations = check(self.org)
+            self.assertEqual(
+                [v['details']['access_request_id'] for v in violations],
+                [self.revoked_request.id]
+            )
+            self.assertEqual(violations[0]['details']['consent_type'], 'Email')
+
+    def test_consent_checks_use_constant_queries(self):
+        """Test that consent checks do not issue a query per approved request"""
+        for i in range(5):
+            self._approved_request(f'extra{i}@test.com', access=i % 2 == 0)
+
+        with self.assertNumQueries(1):
+            NDPRRulesEngine.check_consent_validity(self.org)
+        with self.assertNumQueries(1):
+            NDPRRulesEngine.check_revocation_handling(self.org)
+
+    def test_full_scan_reads_access_requests_once(self):
+        """Test that run_all_checks evaluates every rule from one snapshot query"""
+        AccessRequest.objects.create(
+            organization=self.org,
+            user=self.org_user,
+            consent=self.consent,
+            purpose='general',
+        )
+
+        with self.assertNumQueries(1):
+            result = NDPRRulesEngine.run_all_checks(self.org)
+
+        rules = [v['rule'] for v in result['violations']]
+        self.assertEqual(rules, ['CONSENT_VALIDITY', 'PURPOSE_LIMITATION', 'REVOCATION_HANDLING'])
+        self.assertEqual(result['risk_score'], 50)
+
+
+class IncrementalScanTestCase(OrganizationDataMixin, TestCase):
+    """Test change-driven incremental rescans"""
+
+    def test_rescan_without_changes_matches_full_scan(self):
+        """Test that an unchanged rescan reproduces the baseline"""
+        baseline = NDPRRulesEngine.run_incremental_checks(self.org)
+        rescan = NDPRRulesEngine.run_incremental_checks(self.org)
+        self.assertEqual(rescan, baseline)
+        self.assertEqual(rescan, NDPRRulesEngine.run_all_checks(self.org))
+
+    def test_rescan_picks_up_consent_and_request_changes(self):
+        """Test that changed rows are re-evaluated and merged into the previous result"""
+        NDPRRulesEngine.run_incremental_checks(self.org)
+
+        user_consent = UserConsent.objects.get(user=self.valid_request.user)
+        user_consent.access = False
+        user_consent.save()
+        self.revoked_request.status = 'REVOKED'
+        self.revoked_request.save()
+
+        rescan = NDPRRulesEngine.run_incremental_checks(self.org)
+        self.assertEqual(rescan, NDPRRulesEngine.run_all_checks(self.org))
+        self.assertEqual(
+            [v['details']['access_request_id'] for v in rescan['violations']],
+            [self.valid_request.id, self.valid_request.id]
+        )
+        self.assertFalse(ComplianceChange.objects.filter(organization=self.org).exists())
+
+
+    def test_rescan_keeps_full_scan_order(self):
+        """Test that merged violations come out newest request first within each rule, as in a full scan"""
+        older = self._approved_request('older@test.com', access=False)
+        AccessRequest.objects.filter(pk=older.pk).update(requested_at=timezone.now() - timedelta(days=3))
+        NDPRRulesEngine.run_incremental_checks(self.org)
+
+        newer = self._approved_request('newer@test.com', access=False)
+        self.revoked_request.purpose = 'general'
+        self.revoked_request.save()
+
+        rescan = NDPRRulesEngine.run_incremental_checks(self.org)
+        self.assertEqual(rescan, NDPRRulesEngine.run_all_checks(self.org))
+        self.assertEqual(rescan['violations'][0]['details']['access_request_id'], newer.id)
+
+    def test_change_committed_behind_the_watermark_is_not_lost(self):
+        """Test that a change with an id below the last scanned one is still applied and consumed"""
+        NDPRRulesEngine.run_incremental_checks(self.org)
+        user_consent = UserConsent.objects.get(user=self.valid_request.user)
+        user_consent.access = False
+        user_consent.save()
+        change_ids = list(ComplianceChange.objects.filter(organization=self.org).values_list('id', flat=True))
+        ComplianceScanState.objects.filter(organization=self.org).update(last_change_id=max(change_ids) + 10)
+
+        rescan = NDPRRulesEngine.run_incremental_checks(self.org)
+        self.assertEqual(rescan, NDPRRulesEngine.run_all_checks(self.org))
+        self.assertFalse(ComplianceChange.objects.filter(pk__in=change_ids).exists())
+
+    def test_request_saved_during_first_full_scan_is_picked_up(self):
+        """Test that a change made while the fallback full scan runs is recorded and applied by the next rescan"""
+        run_all_checks = NDPRRulesEngine.run_all_checks
+
+        def save_during_scan(organization, **kwargs):
+            result = run_all_checks(organization, **kwargs)
+            self.revoked_request.status = 'REVOKED'
+            self.revoked_request.save()
+            return result
+
+        with patch.object(NDPRRulesEngine, 'run_all_checks', side_effect=save_during_scan):
+            NDPRRulesEngine.run_incremental_checks(self.org)
+        self.assertTrue(ComplianceChange.objects.filter(access_request_id=self.revoked_request.id).exists())
+
+        rescan = NDPRRulesEngine.run_incremental_checks(self.org)
+        self.assertEqual(rescan, NDPRRulesEngine.run_all_checks(self.org))
+
+    def test_state_without_result_falls_back_to_full_scan(self):
+        """Test that a state row left by an interrupted first scan is not used as an empty baseline"""
+        ComplianceScanState.objects.create(organization=self.org)
+        self.assertEqual(NDPRRulesEngine.run_incremental_checks(self.org), NDPRRulesEngine.run_all_checks(self.org))
+
+
+class BatchScanTestCase(OrganizationDataMixin, TestCase):
+    """Test platform-wide batch scanning"""
+
+    def test_batch_scan_matches_per_organization_scan(self):
+        """Test that grouped evaluation yields the same result as run_all_checks"""
+        other_user = User.objects.create_user(
+            email='other@test.com',
+            password='testpass123',
+            user_role='ORGANIZATION'
+        )
+        other_org = Org.objects.create(user=other_user, name='Other Org', email='other@test.com', address='1 Other St')
+        AccessRequest.objects.create(
+            organization=other_org,
+            user=self.valid_request.user,
+            consent=self.consent,
+            purpose='other',
+        )
+
+        results = NDPRRulesEngine.run_batch_checks(batch_size=1, persist=False)
+
+        self.assertEqual(results[self.org.id], NDPRRulesEngine.run_all_checks(self.org))
+        self.assertEqual(results[other_org.id], NDPRRulesEngine.run_all_checks(other_org))
+
+    def test_batch_scan_persists_incremental_baseline(self):
+        """Test that a persisted batch scan seeds incremental rescans"""
+        results = NDPRRulesEngine.run_batch_checks()
+        self.assertEqual(NDPRRulesEngine.run_incremental_checks(self.org), results[self.org.id])
+        self.assertTrue(ComplianceAudit.objects.filter(organization=self.org).exists())
+
+
+class ParallelScanShardingTestCase(SimpleTestCase):
+    """Test deterministic sharding for multi-process scans"""
+
+    def test_shards_are_ordered_and_complete(self):
+        """Test that shards cover every organization once, in id order"""
+        shards = shard_organizations([7, 3, 9, 1, 5], shard_size=2)
+        self.assertEqual(shards, [[1, 3], [5, 7], [9]])
+
+    def test_shards_spread_over_workers_up_to_a_batch(self):
+        """Test that shard size keeps every worker busy without exceeding the batch size"""
+        self.assertEqual(shard_size(10, workers=4, batch_size=500), 3)
+        self.assertEqual(shard_size(10_000, workers=4, batch_size=500), 500)
+        self.assertEqual(shard_size(0, workers=4, batch_size=500), 1)
+
+
+class InlineExecutor:
+    """ProcessPoolExecutor stand-in that maps in this process, so workers see the test database"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def map(self, fn, *iterables):
+        return map(fn, *iterables)
+
+
+class ParallelScanTestCase(OrganizationDataMixin, TestCase):
+    """Test that the sharded scan matches the single-process batch scan"""
+
+    def test_parallel_scan_matches_batch_scan(self):
+        """Test that run_parallel_scan returns the same results as run_batch_checks"""
+        for i in range(4):
+            user = User.objects.create_user(email=f'shard{i}@test.com', password='testpass123', user_role='ORGANIZATION')
+            org = Org.objects.create(user=user, name=f'Shard {i}', email=f'shard{i}@test.com', address='1 Shard St')
+            AccessRequest.objects.create(organization=org, user=self.valid_request.user, consent=self.consent, purpose='other')
+
+        expected = NDPRRulesEngine.run_batch_checks(persist=False)
+        progress = []
+        with patch('compliance.parallel.ProcessPoolExecutor', InlineExecutor):
+            results = run_parallel_scan(
+                list(Org.objects.values_list('id', flat=True)), workers=2, persist=False,
+                progress=lambda done, total: progress.append(done),
+            )
+        self.assertEqual(results, expected)
+        self.assertEqual(progress, [3, 5])
+
+
+class AuditPersistenceTestCase(OrganizationDataMixin, TestCase):
+    """Test bulk, idempotent persistence of scan results"""
+
+    def test_persisting_twice_is_idempotent(self):
+        """Test that re-persisting a scan keeps one audit per violation identity"""
+        scan_result = NDPRRulesEngine.run_all_checks(self.org)
+        first = NDPRRulesEngine.create_audit_records(self.org, scan_result)
+        second = NDPRRulesEngine.create_audit_records(self.org, scan_result)
+
+        self.assertEqual([a.pk for a in first], [a.pk for a in second])
+        self.assertEqual(ComplianceAudit.objects.filter(organization=self.org).count(), 2)
+        self.assertEqual(ViolationReport.objects.filter(organization=self.org).count(), 2)
+
+    def test_persistence_statement_count_is_independent_of_violations(self):
+        """Test that many violations are written in a fixed number of statements"""
+        violations = [
+            {'rule': 'PURPOSE_LIMITATION', 'details': {'access_request_id': i}, 'recommendation': ''}
+            for i in range(50)
+        ]
+        # Lookup, audit upsert and reports, then the summary aggregate and upsert
+        with self.assertNumQueries(5):
+            NDPRRulesEngine.persist_violations((self.org, v) for v in violations)
+        self.assertEqual(ComplianceAudit.objects.filter(organization=self.org).count(), 50)
+
+        # Unchanged violations are only looked up, never rewritten
+        with self.assertNumQueries(1):
+            NDPRRulesEngine.persist_violations((self.org, v) for v in violations)
+
+    def test_changed_violation_content_refreshes_audit(self):
+        """Test that a violation whose details change updates its audit in place"""
+        violation = {'rule': 'RETENTION_POLICY', 'details': {'old_requests_count': 1}, 'recommendation': 'Review'}
+        first, = NDPRRulesEngine.persist_violations([(self.org, violation)])
+        violation['details']['old_requests_count'] = 5
+        second, = NDPRRulesEngine.persist_violations([(self.org, violation)])
+
+        audit = ComplianceAudit.objects.get(pk=first)
+        self.assertEqual(first, second)
+        self.assertEqual(audit.details, {'old_requests_count': 5})
+        self.assertEqual(audit.fingerprint, NDPRRulesEngine.violation_fingerprint(violation))
+
+    def test_changed_violation_reopens_resolved_audit(self):
+        """Test that new content on a resolved audit resets it to PENDING, while unchanged content keeps it resolved"""
+        violation = {'rule': 'RETENTION_POLICY', 'details': {'old_requests_count': 1}, 'recommendation': 'Review'}
+        audit_id, = NDPRRulesEngine.persist_violations([(self.org, violation)])
+        ComplianceAudit.objects.filter(pk=audit_id).update(status='RESOLVED', resolved_at=timezone.now())
+
+        NDPRRulesEngine.persist_violations([(self.org, violation)])
+        self.assertEqual(ComplianceAudit.objects.get(pk=audit_id).status, 'RESOLVED')
+
+        violation['details']['old_requests_count'] = 5
+        NDPRRulesEngine.persist_violations([(self.org, violation)])
+        audit = ComplianceAudit.objects.get(pk=audit_id)
+        self.assertEqual((audit.status, audit.resolved_at), ('PENDING', None))
+
+
+DECLARATIVE_RULES = [
+    {
+        'code': 'APPROVED_BACKLOG',
+        'name': 'Approved Backlog',
+        'description': 'Too many approved requests',
+        'severity': 'LOW',
+        'filter': {'status': 'APPROVED'},
+        'metric': {'count': 'pk'},
+        'threshold': {'gte': 2},
+        'recommendation': 'Review {value} approved requests',
+    },
+    {
+        'code': 'CONSENT_TYPE_CONCENTRATION',
+        'name': 'Consent Type Concentration',
+        'severity': 'MEDIUM',
+        'filter': {'requested_at__gte': {'days_ago': 30}},
+        'metric': {'count_distinct': 'user'},
+        'group_by': 'consent__name',
+        'threshold': {'gt': 1},
+        'recommendation': '{value} citizens share consent type {group}',
+    },
+]
+
+
+@override_settings(COMPLIANCE_DECLARATIVE_RULES=DECLARATIVE_RULES)
+class DeclarativeRulesTestCase(OrganizationDataMixin, TestCase):
+    """Test declarative rules compiled to aggregate queries"""
+
+    def test_declarative_rules_are_evaluated_in_scans(self):
+        """Test that configured rules join the scan with one query per rule group"""
+        with self.assertNumQueries(3):
+            result = NDPRRulesEngine.run_all_checks(self.org)
+
+        declarative = [v for v in result['violations'] if v['rule'] in ('APPROVED_BACKLOG', 'CONSENT_TYPE_CONCENTRATION')]
+        self.assertEqual([v['details']['value'] for v in declarative], [2, 2])
+        self.assertEqual(declarative[1]['recommendation'], '2 citizens share consent type Email')
+        # HIGH (15) + CRITICAL (20) built-in, plus LOW (5) + MEDIUM (10) declarative
+        self.assertEqual(result['risk_score'], 50)
+
+    def test_batch_scan_matches_single_scan(self):
+        """Test that grouped batch evaluation agrees with the per-organization path"""
+        results = NDPRRulesEngine.run_batch_checks(persist=False)
+        self.assertEqual(results[self.org.id], NDPRRulesEngine.run_all_checks(self.org))
+
+    @override_settings(COMPLIANCE_DECLARATIVE_RULES=[dict(DECLARATIVE_RULES[0], code='TOO_FEW_APPROVED', threshold={'lt': 1})])
+    def test_batch_scan_flags_organizations_without_requests(self):
+        """Test that an organization with no access requests aggregates to 0 in the batch path too"""
+        user = User.objects.create_user(email='empty@test.com', password='testpass123', user_role='ORGANIZATION')
+        empty = Org.objects.create(user=user, name='Empty Organization', email='empty@test.com', address='1 Test St')
+
+        results = NDPRRulesEngine.run_batch_checks(persist=False)
+        single = NDPRRulesEngine.run_all_checks(empty)
+        self.assertIn('TOO_FEW_APPROVED', [v['rule'] for v in single['violations']])
+        self.assertEqual(results[empty.id], single)
+        self.assertEqual(results[self.org.id], NDPRRulesEngine.run_all_checks(self.org))
+
+    def test_each_breaching_group_gets_its_own_audit(self):
+        """Test that grouped rule violations persist as one audit per group"""
+        sms = Consent.objects.create(name='SMS')
+        for email in ('sms1@test.com', 'sms2@test.com'):
+            citizen = User.objects.create_user(email=email, password='testpass123')
+            UserConsent.objects.create(user=citizen, consent=sms, access=True)
+            AccessRequest.objects.create(
+                organization=self.org, user=citizen, consent=sms, status='PENDING',
+                purpose='Account verification for loan application',
+            )
+
+        result, audits = NDPRRulesEngine.scan_and_persist(self.org)
+        groups = [v['details']['group'] for v in result['violations'] if v['rule'] == 'CONSENT_TYPE_CONCENTRATION']
+        self.assertEqual(sorted(groups), ['Email', 'SMS'])
+        stored = ComplianceAudit.objects.filter(organization=self.org, violation_key__startswith='CONSENT_TYPE_CONCENTRATION')
+        self.assertEqual(sorted(a.details['group'] for a in stored), ['Email', 'SMS'])
+        self.assertEqual(len(audits), len(result['violations']))
+
+    def test_disallowed_fields_are_rejected(self):
+        """Test that specs cannot reach outside whitelisted access request fields"""
+        spec = dict(DECLARATIVE_RULES[0], filter={'user__password__startswith': 'x'})
+        with self.assertRaises(ImproperlyConfigured):
+            RuleSet([spec])
+
+    def test_clashing_codes_and_bad_templates_are_rejected(self):
+        """Test that duplicate codes, built-in codes and unknown template placeholders fail at compile time"""
+        rule = DECLARATIVE_RULES[0]
+        for specs in (
+            [rule, dict(rule, name='Duplicate')],
+            [dict(rule, code='CONSENT_VALIDITY')],
+            [dict(rule, recommendation='Review {count} approved requests')],
+        ):
+            with self.assertRaises(ImproperlyConfigured):
+                RuleSet(specs)
+        self.assertTrue(RuleSet([dict(rule, recommendation='{value} over {threshold} for {group}')]))
+
+
+class ScanInstrumentationTestCase(OrganizationDataMixin, TestCase):
+    """Test per-rule scan instrumentation"""
+
+    def setUp(self):
+        super().setUp()
+        reset_rule_metrics()
+
+    def test_uninstrumented_scan_has_no_stats(self):
+        """Test that stats are only produced on request"""
+        self.assertNotIn('rule_stats', NDPRRulesEngine.run_all_checks(self.org))
+        self.assertEqual(rule_metrics(), {})
+
+    @override_settings(COMPLIANCE_RULE_BUDGETS={'SNAPSHOT': {'queries': 0}})
+    def test_instrumented_scan_reports_each_rule(self):
+        """Test that every rule reports time, queries, rows and violations"""
+        result = NDPRRulesEngine.run_all_checks(self.org, instrument=True)
+        stats = result['rule_stats']
+
+        self.assertEqual(set(stats), {rule for rule, _ in NDPRRulesEngine.RULE_CHECKS} | {'SNAPSHOT', 'DECLARATIVE'})
+        self.assertEqual(stats['SNAPSHOT']['queries'], 1)
+        self.assertEqual(stats['SNAPSHOT']['rows_examined'], 2)
+        self.assertEqual(stats['SNAPSHOT']['over_budget'], ['queries'])
+        self.assertEqual(stats['CONSENT_VALIDITY']['queries'], 0)
+        self.assertEqual(stats['CONSENT_VALIDITY']['violations'], 1)
+        self.assertEqual(rule_metrics()['SNAPSHOT']['over_budget'], 1)
+
+
+class ScanResultCacheTestCase(OrganizationDataMixin, TestCase):
+    """Test the scan-result cache keyed by organization data version"""
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+    def test_cached_result_is_reused_until_data_changes(self):
+        """Test that repeated reads hit the cache and writes invalidate it"""
+        first = NDPRRulesEngine.get_scan_result(self.org)
+        with self.assertNumQueries(1):  # the data version
+            self.assertEqual(NDPRRulesEngine.get_scan_result(self.org), first)
+
+        self.valid_request.status = 'REVOKED'
+        self.valid_request.save()
+        self.assertEqual(NDPRRulesEngine.get_scan_result(self.org), NDPRRulesEngine.run_all_checks(self.org))
+
+    def test_scan_and_persist_reuses_result_and_audits(self):
+        """Test that an unchanged rescan neither re-evaluates rules nor rewrites audits"""
+        result, audits = NDPRRulesEngine.scan_and_persist(self.org)
+        with self.assertNumQueries(2):  # the data version and the stored audits
+            cached_result, cached_audits = NDPRRulesEngine.scan_and_persist(self.org)
+        self.assertEqual(cached_result, result)
+        self.assertEqual([a.pk for a in cached_audits], [a.pk for a in audits])
+
+    def test_version_bumped_elsewhere_invalidates_local_cache(self):
+        """Test that a bump made by another process (a DB row update) invalidates this process's entries"""
+        NDPRRulesEngine.get_scan_result(self.org)
+        AccessRequest.objects.filter(pk=self.valid_request.pk).update(status='REVOKED')
+        ComplianceDataVersion.objects.filter(organization=self.org).update(version=F('version') + 1)
+        self.assertEqual(NDPRRulesEngine.get_scan_result(self.org), NDPRRulesEngine.run_all_checks(self.org))
+
+    def test_consent_revocation_invalidates_cached_result(self):
+        """Test that a consent change bumps the version of organizations relying on it"""
+        version = data_version(self.org.id)
+        user_consent = UserConsent.objects.get(user=self.valid_request.user)
+        user_consent.access = False
+        user_consent.save()
+        self.assertGreater(data_version(self.org.id), version)
+
+
+class PurposeQualityTestCase(OrganizationDataMixin, TestCase):
+    """Test stored purpose classification used by purpose limitation"""
+
+    def test_purpose_is_classified_on_save(self):
+        """Test that saving a request stores its purpose quality"""
+        self.assertEqual(self.valid_request.purpose_quality, 'CLEAR')
+        self.valid_request.purpose = ' Research '
+        self.valid_request.save(update_fields=['purpose'])
+        self.valid_request.refresh_from_db()
+        self.assertEqual(self.valid_request.purpose_quality, 'VAGUE')
+
+        violations = NDPRRulesEngine.check_purpose_limitation(self.org)
+        self.assertEqual([v['details']['access_request_id'] for v in violations], [self.valid_request.id])
+
+    def test_stored_label_matches_sql_reclassification(self):
+        """Test that classify_purpose and the reclassification UPDATE agree, including on non-space whitespace"""
+        purposes = ['general', 'Payroll\t\t\t', '\n\nPayroll\n', '  Payroll  ', 'Payroll run', 'x' * 9 + ' ']
+        for purpose in purposes:
+            self.valid_request.purpose = purpose
+            self.valid_request.save(update_fields=['purpose'])
+            stored = AccessRequest.objects.filter(pk=self.valid_request.pk).annotate(
+                recomputed=purpose_quality_expression()
+            ).values_list('purpose_quality', 'recomputed').get()
+            self.assertEqual(stored[0], stored[1], repr(purpose))
+
+    def test_reclassify_command_applies_new_vague_terms(self):
+        """Test that reclassification updates stored labels and invalidates scans"""
+        NDPRRulesEngine.run_incremental_checks(self.org)
+        with override_settings(PURPOSE_VAGUE_TERMS=['account verification for loan application']):
+            call_command('reclassify_purposes', stdout=StringIO())
+
+        self.assertEqual(
+            set(AccessRequest.objects.values_list('purpose_quality', flat=True)), {'VAGUE'}
+        )
+        self.assertEqual(ComplianceChange.objects.filter(organization=self.org).count(), 2)
+        self.assertEqual(
+            NDPRRulesEngine.run_incremental_checks(self.org)['violations'],
+            NDPRRulesEngine.run_all_checks(self.org)['violations'],
+        )
+
+
+class StreamingScanTestCase(OrganizationDataMixin, TestCase):
+    """Test bounded-memory streaming scans"""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            request = self._approved_request(f'vague{i}@test.com', access=i % 2 == 0)
+            request.purpose = 'general'
+            request.save()
+
+    def test_stream_matches_full_scan(self):
+        """Test that streamed violations and totals match a snapshot scan"""
+        expected = NDPRRulesEngine.run_all_checks(self.org)
+        streamed = list(NDPRRulesEngine.iter_violations(self.org, chunk_size=1))
+        self.assertEqual(streamed, expected['violations'])
+
+        summary = NDPRRulesEngine.run_streaming_checks(self.org, chunk_size=1)
+        self.assertNotIn('violations', summary)
+        self.assertEqual(summary, {k: v for k, v in expected.items() if k != 'violations'})
+        self.assertEqual(ComplianceAudit.objects.filter(organization=self.org).count(), expected['total_violations'])
+
+    def test_large_organization_is_streamed_by_default_entry_points(self):
+        """Test that get_scan_result and scan_and_persist stream organizations over COMPLIANCE_STREAM_THRESHOLD"""
+        cache.clear()
+        expected = NDPRRulesEngine.run_all_checks(self.org)
+        totals = {k: v for k, v in expected.items() if k != 'violations'}
+
+        with override_settings(COMPLIANCE_STREAM_THRESHOLD=6):
+            self.assertFalse(NDPRRulesEngine.should_stream(self.org))
+        with override_settings(COMPLIANCE_STREAM_THRESHOLD=5), \
+                patch.object(NDPRRulesEngine, 'run_all_checks', side_effect=AssertionError('full snapshot loaded')):
+            self.assertEqual(NDPRRulesEngine.get_scan_result(self.org), totals)
+            scan_result, audit_records = NDPRRulesEngine.scan_and_persist(self.org)
+        self.assertEqual((scan_result, audit_records), (totals, []))
+        self.assertEqual(ComplianceAudit.objects.filter(organization=self.org).count(), expected['total_violations'])
+
+
+class ScanJobQueueTestCase(OrganizationDataMixin, TestCase):
+    """Test queued compliance scans and status polling"""
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.org_user)
+
+    def test_scan_is_queued_and_polled(self):
+        """Test that POST returns a job immediately and the worker fills in its result"""
+        response = self.client.post(reverse('compliance-scan'))
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['data']['id']
+        self.assertEqual(response.data['data']['status'], 'QUEUED')
+        self.assertFalse(ComplianceAudit.objects.exists())
+
+        # A second request while queued reuses the job
+        self.assertEqual(self.client.post(reverse('compliance-scan')).data['data']['id'], job_id)
+
+        call_command('run_compliance_worker', '--once', stdout=StringIO())
+        poll = self.client.get(reverse('compliance-scan-job', args=[job_id]))
+        self.assertEqual(poll.status_code, 200)
+        self.assertEqual(poll.data['data']['status'], 'SUCCEEDED')
+        self.assertEqual(
+            poll.data['data']['result']['total_violations'],
+            NDPRRulesEngine.run_all_checks(self.org)['total_violations'],
+        )
+
+    @override_settings(COMPLIANCE_SCAN_ASYNC=False)
+    def test_scan_runs_inline_without_worker(self):
+        """Test that synchronous mode completes the job within the request"""
+        response = self.client.post(reverse('compliance-scan'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['status'], 'SUCCEEDED')
+        self.assertIsNone(claim_next_job())
+
+    def test_stale_running_job_is_requeued(self):
+        """Test that a job whose worker died goes back to the queue"""
+        job = enqueue_scan(self.org)
+        claim_next_job('dead-worker')
+        ComplianceScanJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertEqual(claim_next_job('live-worker').pk, job.pk)
+
+    def test_long_scan_with_heartbeat_is_not_requeued_or_overwritten(self):
+        """Test that staleness follows the heartbeat and a requeued job's first worker cannot finish it"""
+        job = enqueue_scan(self.org)
+        first = claim_next_job('worker-a')
+        long_ago = timezone.now() - timedelta(hours=1)
+        ComplianceScanJob.objects.filter(pk=job.pk).update(started_at=long_ago)
+        self.assertEqual(requeue_stale_jobs(timeout=timedelta(minutes=15)), 0)
+
+        # worker-a stops beating; its job is requeued and worker-b takes it
+        ComplianceScanJob.objects.filter(pk=job.pk).update(heartbeat_at=long_ago)
+        self.assertEqual(requeue_stale_jobs(timeout=timedelta(minutes=15)), 1)
+        second = claim_next_job('worker-b')
+        self.assertEqual(second.pk, job.pk)
+
+        self.assertFalse(heartbeat(first))
+        stale_finish = run_job(first)
+        self.assertEqual((stale_finish.status, stale_finish.worker, stale_finish.result), ('RUNNING', 'worker-b', None))
+        self.assertEqual(requeue_stale_jobs(timeout=timedelta(minutes=15)), 0)
+
+        self.assertEqual(run_job(second).status, 'SUCCEEDED')
+        self.assertEqual(ComplianceScanJob.objects.get(pk=job.pk).status, 'SUCCEEDED')
+
+    def test_enqueue_retries_when_the_conflicting_job_is_gone(self):
+        """Test that losing the insert race to a job that already finished queues a new job"""
+        create = ComplianceScanJob.objects.create
+        calls = []
+
+        def racing_create(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                raise IntegrityError('duplicate active job')
+            return create(**kwargs)
+
+        with patch.object(ComplianceScanJob.objects, 'create', side_effect=racing_create):
+            job = enqueue_scan(self.org)
+        self.assertEqual((len(calls), job.status), (2, 'QUEUED'))
+
+    def test_worker_prunes_finished_jobs_past_retention(self):
+        """Test that finished jobs older than COMPLIANCE_SCAN_JOB_RETENTION are deleted and others kept"""
+        old, recent = (
+            ComplianceScanJob.objects.create(organization=self.org, status=status, finished_at=timezone.now() - age)
+            for status, age in (('SUCCEEDED', timedelta(days=30)), ('FAILED', timedelta(hours=1)))
+        )
+        active = enqueue_scan(self.org)
+        with override_settings(COMPLIANCE_SCAN_JOB_RETENTION=timedelta(days=7)):
+            self.assertEqual(prune_finished_jobs(), 1)
+        self.assertEqual(set(ComplianceScanJob.objects.values_list('pk', flat=True)), {recent.pk, active.pk})
+
+    def test_other_organizations_jobs_are_hidden(self):
+        """Test that polling another organization's job returns 404"""
+        other_user = User.objects.create_user(email='other@test.com', password='testpass123', user_role='ORGANIZATION')
+        other = Org.objects.create(user=other_user, name='Other', email='other@test.com', address='1 Other St')
+        job = enqueue_scan(other)
+        self.assertEqual(self.client.get(reverse('compliance-scan-job', args=[job.pk])).status_code, 404)
+
+
+class ComplianceSummaryTestCase(OrganizationDataMixin, TestCase):
+    """Test the stored per-organization dashboard summary"""
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        NDPRRulesEngine.scan_and_persist(self.org)
+
+    def test_summary_matches_audits(self):
+        """Test that persisted scans refresh counts and severity-based risk"""
+        summary = ComplianceSummary.objects.get(organization=self.org)
+        pending = ComplianceAudit.objects.filter(organization=self.org, status='PENDING')
+        self.assertEqual(summary.pending_audits, pending.count())
+        self.assertEqual(summary.pending_high, pending.filter(severity='HIGH').count())
+        self.assertEqual(summary.unresolved_violations, ViolationReport.objects.filter(organization=self.org).count())
+        self.assertEqual(summary.risk_score, NDPRRulesEngine.run_all_checks(self.org)['risk_score'])
+
+    def test_status_change_updates_summary(self):
+        """Test that resolving an audit is reflected without a rescan"""
+        client = APIClient()
+        client.force_authenticate(self.org_user)
+        audit = ComplianceAudit.objects.filter(organization=self.org, status='PENDING').first()
+        before = ComplianceSummary.objects.get(organization=self.org)
+
+        client.patch(reverse('compliance-audit-detail', args=[audit.pk]), {'status': 'RESOLVED'})
+        after = ComplianceSummary.objects.get(organization=self.org)
+        self.assertEqual(after.pending_audits, before.pending_audits - 1)
+        self.assertEqual(after.resolved_audits, 1)
+
+        response = client.get(reverse('compliance-scan'))
+        self.assertEqual(response.data['total_violations'], after.pending_audits)
+        self.assertEqual(response.data['risk_score'], after.risk_score)
+
+
+class RiskHistoryTestCase(OrganizationDataMixin, TestCase):
+    """Test the downsampled risk score time series"""
+
+    def _result(self, risk):
+        return {'risk_score': risk, 'total_violations': 1, 'critical_count': 0, 'high_count': 1, 'medium_count': 0}
+
+    def test_scans_roll_up_into_buckets(self):
+        """Test that points fold into hourly, daily and monthly buckets"""
+        start = datetime(2026, 3, 1, 10, 5, tzinfo=dt_timezone.utc)
+        risk_history.record_scans({self.org.id: self._result(20)}, at=start)
+        risk_history.record_scans({self.org.id: self._result(40)}, at=start + timedelta(minutes=30))
+        risk_history.record_scans({self.org.id: self._result(60)}, at=start + timedelta(days=1))
+
+        hourly = RiskScorePoint.objects.filter(organization=self.org, resolution='HOUR')
+        self.assertEqual(hourly.count(), 2)
+        first_hour = hourly.get(bucket_start=start.replace(minute=0))
+        self.assertEqual((first_hour.samples, first_hour.risk_min, first_hour.risk_max, first_hour.risk_last), (2, 20, 40, 40))
+
+        resolution, points = risk_history.series(self.org.id, start - timedelta(days=1), start + timedelta(days=30), 'MONTH')
+        self.assertEqual(len(points), 1)
+        self.assertEqual(points[0]['risk_avg'], 40)
+        self.assertEqual(points[0]['samples'], 3)
+
+    def test_resolution_and_pruning_follow_retention(self):
+        """Test that long ranges use coarse buckets and old raw points are pruned"""
+        now = timezone.now()
+        self.assertEqual(risk_history.pick_resolution(now - timedelta(hours=6), now, now), 'RAW')
+        self.assertEqual(risk_history.pick_resolution(now - timedelta(days=10), now, now), 'HOUR')
+        self.assertEqual(risk_history.pick_resolution(now - timedelta(days=365), now, now), 'DAY')
+        self.assertEqual(risk_history.pick_resolution(now - timedelta(days=5 * 365), now, now), 'MONTH')
+
+        risk_history.record_scans({self.org.id: self._result(10)}, at=now - timedelta(days=30))
+        deleted = risk_history.prune(now)
+        self.assertEqual((deleted['RAW'], deleted['HOUR'], deleted['DAY']), (1, 0, 0))
+
+    def test_persisted_scan_is_exposed_by_api(self):
+        """Test that a persisted scan appears in the range API"""
+        cache.clear()
+        result, _ = NDPRRulesEngine.scan_and_persist(self.org)
+        client = APIClient()
+        client.force_authenticate(self.org_user)
+        response = client.get(reverse('compliance-risk-history'), {'resolution': 'raw'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['risk_last'] for p in response.data['points']], [result['risk_score']])
+        self.assertEqual(client.get(reverse('compliance-risk-history'), {'start': 'yesterday'}).status_code, 400)
+
+
+class SyntheticBenchmarkTestCase(TestCase):
+    """Test synthetic data generation and the benchmark harness"""
+
+    def test_skewed_dataset_with_consent_history(self):
+        """Test that skew concentrates requests and consent history ends in the current state"""
+        org_ids = generate_dataset(
+            orgs=4, citizens=30, consent_types=2, requests_per_org=10,
+            skew=1.5, history_days=60, consent_history=True,
+        )
+        sizes = [AccessRequest.objects.filter(organization_id=org_id).count() for org_id in sorted(org_ids)]
+        self.assertGreater(sizes[0], sizes[-1])
+        self.assertTrue(AccessRequest.objects.filter(requested_at__lt=timezone.now() - timedelta(days=1)).exists())
+
+        for user_consent in UserConsent.objects.filter(consent__name__startswith='bench-'):
+            latest = ConsentHistory.objects.filter(user_consent=user_consent).order_by('-changed_at', '-id').first()
+            self.assertEqual(latest.new_value, user_consent.access)
+
+    def test_benchmark_counts_queries_and_flags_regressions(self):
+        """Test that the harness measures entry points and compares against a baseline"""
+        org_ids = generate_dataset(orgs=3, citizens=10, consent_types=2, requests_per_org=5)
+        organizations = list(Org.objects.filter(pk__in=org_ids))
+        results = run_benchmarks(organizations, sample_size=2, repeat=1, names=['rules.run_all_checks'])
+        self.assertEqual(list(results), ['rules.run_all_checks'])
+        self.assertGreater(results['rules.run_all_checks']['queries'], 0)
+
+        baseline = {'rules.run_all_checks': dict(results['rules.run_all_checks'], queries=1)}
+        (_, _, _, regressed), = compare(baseline, results)
+        self.assertTrue(regressed)
+
+    def test_writing_entry_points_repeat_the_same_work(self):
+        """Test that writing entry points leave no trace, so every repetition does the same work"""
+        org_ids = generate_dataset(orgs=3, citizens=10, consent_types=2, requests_per_org=5)
+        organizations = list(Org.objects.filter(pk__in=org_ids).order_by('id'))
+        names = ['rules.scan_and_persist', 'rules.run_incremental_checks']
+        first = run_benchmarks(organizations, sample_size=2, repeat=1, names=names)
+        second = run_benchmarks(organizations, sample_size=2, repeat=1, names=names)
+
+        for name in names:
+            self.assertEqual(first[name]['queries'], second[name]['queries'])
+        self.assertFalse(ComplianceAudit.objects.filter(organization_id__in=org_ids).exists())
+        self.assertFalse(ComplianceScanState.objects.filter(organization_id__in=org_ids).exists())
@@ -1,11 +1,22 @@
 from django.urls import path
-from .views import ComplianceScanView, ComplianceReportsView, ComplianceAuditDetailView
+from .views import (
+    ComplianceScanView,
+    ComplianceScanJobView,
+    ComplianceReportsView,
+    ComplianceAuditDetailView,
+    ComplianceMetricsView,
+    ComplianceRiskHistoryView,
+)
 
 urlpatterns = [
     path('scan/', ComplianceScanView.as_view(), name='compliance-scan'),
+    path('scan/jobs/<int:job_id>/', ComplianceScanJobView.as_view(), name='compliance-scan-job'),
     path('reports/', ComplianceReportsView.as_view(), name='compliance-reports'),
     path('reports/<int:org_id>/', ComplianceReportsView.as_view(), name='compliance-reports-org'),
     path('audit/<int:audit_id>/', ComplianceAuditDetailView.as_view(), name='compliance-audit-detail'),
+    path('risk-history/', ComplianceRiskHistoryView.as_view(), name='compliance-risk-history'),
+    path('risk-history/<int:org_id>/', ComplianceRiskHistoryView.as_view(), name='compliance-risk-history-org'),
+    path('metrics/', ComplianceMetricsView.as_view(), name='compliance-metrics'),
 ]
 
 
@@ -1,19 +1,26 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from datetime import timedelta
 
 from organization.models import Org
 from organization.permissions import IsOrganization
-from .rules_engine import NDPRRulesEngine
-from .models import ComplianceAudit, ViolationReport
+from .instrumentation import rule_metrics
+from .cache import DASHBOARD, data_version, get_cached, set_cached
+from . import risk_history
+from .jobs import claim_job, enqueue_scan, run_job
+from .summary import get_summary
+from .models import ComplianceAudit, ViolationReport, ComplianceScanJob, RiskScorePoint
 from .serializers import (
     ComplianceAuditSerializer,
     ViolationReportSerializer,
-    ComplianceScanResultSerializer
+    ComplianceScanJobSerializer,
 )
 
 class ComplianceScanView(APIView):
@@ -23,49 +30,53 @@ class ComplianceScanView(APIView):
     def post(self, request):
         try:
             organization = get_object_or_404(Org, user=request.user)
-            scan_result = NDPRRulesEngine.run_all_checks(organization)
-            audit_records = NDPRRulesEngine.create_audit_records(organization, scan_result)
-
-            audit_serializer = ComplianceAuditSerializer(audit_records, many=True)
-            violation_records = []
-            for audit in audit_records:
-                violation_records.extend(audit.violationreport_set.all())
-            violation_serializer = ViolationReportSerializer(violation_records, many=True)
-
-            result_data = {
-                'risk_score': scan_result.get('risk_score', 0),
-                'total_violations': scan_result.get('total_violations', len(violation_records)),
-                'critical_count': scan_result.get('critical_count', 0),
-                'high_count': scan_result.get('high_count', 0),
-                'medium_count': scan_result.get('medium_count', 0),
-                'audits': audit_serializer.data,
-                'violations': violation_serializer.data,
-            }
-
-            serializer = ComplianceScanResultSerializer(result_data)
-            return Response({'message': 'Compliance scan completed', 'data': serializer.data}, status=status.HTTP_200_OK)
+            instrument = (
+                request.query_params.get('instrument') in ('1', 'true')
+                or getattr(settings, 'COMPLIANCE_INSTRUMENT_SCANS', False)
+            )
+            job = enqueue_scan(organization, instrument=instrument)
+
+            if not getattr(settings, 'COMPLIANCE_SCAN_ASYNC', True):
+                # No worker process: run the job inside the request as before
+                claimed = claim_job(job.pk)
+                if claimed is not None:
+                    job = run_job(claimed)
+
+            serializer = ComplianceScanJobSerializer(job)
+            if job.status == 'SUCCEEDED':
+                return Response({'message': 'Compliance scan completed', 'data': serializer.data}, status=status.HTTP_200_OK)
+            return Response({'message': 'Compliance scan queued', 'data': serializer.data}, status=status.HTTP_202_ACCEPTED)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def get(self, request):
         try:
             organization = get_object_or_404(Org, user=request.user)
-            window_start = timezone.now() - timedelta(days=self.DUPLICATE_WINDOW_DAYS)
-            audits = ComplianceAudit.objects.filter(organization=organization, detected_at__gte=window_start).order_by('-detected_at')
-            violations = ViolationReport.objects.filter(organization=organization, detected_at__gte=window_start).order_by('-detected_at')
+            version = data_version(organization.id)
+            payload = get_cached(DASHBOARD, organization.id, version)
+            if payload is not None:
+                return Response(payload, status=status.HTTP_200_OK)
 
-            pending_audits = audits.filter(status='PENDING')
-            risk_score = NDPRRulesEngine.calculate_risk_score([{'rule': a.rule_name, 'details': a.details} for a in pending_audits])
-
-            return Response({
-                'risk_score': risk_score,
-                'total_violations': pending_audits.count(),
-                'critical_count': pending_audits.filter(severity='CRITICAL').count(),
-                'high_count': pending_audits.filter(severity='HIGH').count(),
-                'medium_count': pending_audits.filter(severity='MEDIUM').count(),
+            window_start = timezone.now() - timedelta(days=self.DUPLICATE_WINDOW_DAYS)
+            audits = ComplianceAudit.objects.filter(
+                organization=organization, detected_at__gte=window_start
+            ).select_related('organization').order_by('-detected_at')
+            violations = ViolationReport.objects.filter(
+                organization=organization, detected_at__gte=window_start
+            ).select_related('organization', 'related_audit').order_by('-detected_at')
+
+            summary = get_summary(organization)
+            payload = {
+                'risk_score': summary.risk_score,
+                'total_violations': summary.pending_audits,
+                'critical_count': summary.pending_critical,
+                'high_count': summary.pending_high,
+                'medium_count': summary.pending_medium,
                 'audits': ComplianceAuditSerializer(audits[:10], many=True).data,
                 'violations': ViolationReportSerializer(violations[:10], many=True).data,
-            }, status=status.HTTP_200_OK)
+            }
+            set_cached(DASHBOARD, organization.id, version, payload)
+            return Response(payload, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -90,25 +101,22 @@ class ComplianceReportsView(APIView):
             audits = ComplianceAudit.objects.filter(
                 organization=organization,
                 detected_at__gte=window_start
-            ).order_by('-detected_at')
+            ).select_related('organization').order_by('-detected_at')
 
             violations = ViolationReport.objects.filter(
                 organization=organization,
                 detected_at__gte=window_start
-            ).order_by('-detected_at')
+            ).select_related('organization', 'related_audit').order_by('-detected_at')
 
-            total_audits = audits.count()
-            pending_audits = audits.filter(status='PENDING').count()
-            resolved_audits = audits.filter(status='RESOLVED').count()
-            unresolved_violations = violations.filter(resolved=False).count()
+            summary = get_summary(organization)
 
             return Response({
                 'organization': {'id': organization.id, 'name': organization.name},
                 'statistics': {
-                    'total_audits': total_audits,
-                    'pending_audits': pending_audits,
-                    'resolved_audits': resolved_audits,
-                    'unresolved_violations': unresolved_violations,
+                    'total_audits': summary.total_audits,
+                    'pending_audits': summary.pending_audits,
+                    'resolved_audits': summary.resolved_audits,
+                    'unresolved_violations': summary.unresolved_violations,
                 },
                 'audits': ComplianceAuditSerializer(audits, many=True).data,
                 'violations': ViolationReportSerializer(violations, many=True).data,
@@ -158,3 +166,78 @@ class ComplianceAuditDetailView(APIView):
             return Response({
                 'error': f'Failed to update audit: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ComplianceMetricsView(APIView):
+    """Per-rule scan metrics accumulated by this server process (staff only)"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'rules': rule_metrics(),
+            'budgets': getattr(settings, 'COMPLIANCE_RULE_BUDGETS', {}),
+        }, status=status.HTTP_200_OK)
+
+
+class ComplianceScanJobView(APIView):
+    """Poll a queued compliance scan; the result is included once it has succeeded"""
+    permission_classes = [IsAuthenticated, IsOrganization]
+
+    def get(self, request, job_id):
+        try:
+            organization = get_object_or_404(Org, user=request.user)
+            job = get_object_or_404(ComplianceScanJob, pk=job_id, organization=organization)
+            return Response({'data': ComplianceScanJobSerializer(job).data}, status=status.HTTP_200_OK)
+        except Http404:
+            return Response({'error': 'Scan job not found'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ComplianceRiskHistoryView(APIView):
+    """
+    Risk score series for charts.
+    Query params: start, end (ISO 8601, default: the last 30 days) and an
+    optional resolution (RAW, HOUR, DAY, MONTH; picked from the range by default).
+    """
+    permission_classes = [IsAuthenticated, IsOrganization]
+    DEFAULT_RANGE_DAYS = 30
+
+    def get(self, request, org_id=None):
+        try:
+            if org_id:
+                organization = get_object_or_404(Org, pk=org_id)
+                if organization.user != request.user and not request.user.is_staff:
+                    return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+            else:
+                organization = get_object_or_404(Org, user=request.user)
+
+            end = self._parse_time(request.query_params.get('end')) or timezone.now()
+            start = self._parse_time(request.query_params.get('start')) or end - timedelta(days=self.DEFAULT_RANGE_DAYS)
+            resolution = request.query_params.get('resolution', '').upper() or None
+            if start >= end:
+                return Response({'error': 'start must be before end'}, status=status.HTTP_400_BAD_REQUEST)
+            if resolution and resolution not in dict(RiskScorePoint.RESOLUTION_CHOICES):
+                return Response({'error': f'Unknown resolution {resolution}'}, status=status.HTTP_400_BAD_REQUEST)
+
+            resolution, points = risk_history.series(organization.id, start, end, resolution)
+            return Response({
+                'organization': {'id': organization.id, 'name': organization.name},
+                'start': start,
+                'end': end,
+                'resolution': resolution,
+                'points': points,
+            }, status=status.HTTP_200_OK)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({'error': f'Failed to retrieve risk history: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @staticmethod
+    def _parse_time(value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f'Invalid timestamp {value!r}, expected ISO 8601')
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
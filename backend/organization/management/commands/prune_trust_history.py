@@ -0,0 +1,16 @@
+"""
+Drop trust score history past its retention
+Run daily: python manage.py prune_trust_history
+"""
+from django.core.management.base import BaseCommand
+from organization.trust_history import prune
+
+
+class Command(BaseCommand):
+    help = 'Delete trust score history and level snapshots older than TRUST_SCORE_HISTORY_RETENTION'
+
+    def handle(self, *args, **options):
+        deleted = prune()
+        self.stdout.write(self.style.SUCCESS(
+            f'Pruned trust history: {deleted["history"]} scores, {deleted["snapshots"]} level snapshots'
+        ))
@@ -0,0 +1,45 @@
+"""
+Reclassify access request purposes
+Run after changing PURPOSE_VAGUE_TERMS or PURPOSE_MIN_LENGTH:
+python manage.py reclassify_purposes [--batch-size 5000] [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from organization.models import AccessRequest
+from organization.purpose_quality import purpose_quality_expression
+from organization.trust_counters import reconcile
+from compliance.signals import record_access_request_changes
+
+
+class Command(BaseCommand):
+    help = 'Recompute stored purpose quality with one set-based UPDATE per id range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Access request ids covered per UPDATE')
+        parser.add_argument('--dry-run', action='store_true', help='Count rows that would change without writing')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = AccessRequest.objects.aggregate(last=Max('id'))['last'] or 0
+        changed = 0
+
+        for start in range(0, last_id, batch_size):
+            with transaction.atomic():
+                stale = AccessRequest.objects.filter(
+                    id__gt=start,
+                    id__lte=start + batch_size,
+                ).exclude(purpose_quality=purpose_quality_expression())
+                affected = list(stale.values_list('id', 'organization_id', 'organization__compliance_scan_state'))
+                if not affected or options['dry_run']:
+                    changed += len(affected)
+                    continue
+                changed += AccessRequest.objects.filter(
+                    id__in=[request_id for request_id, _, _ in affected]
+                ).update(purpose_quality=purpose_quality_expression())
+                record_access_request_changes(affected)
+                # The UPDATE bypasses the signals that maintain clear-purpose counts
+                reconcile({org_id for _, org_id, _ in affected})
+
+        verb = 'would change' if options['dry_run'] else 'reclassified'
+        self.stdout.write(self.style.SUCCESS(f'{changed} access requests {verb}'))
@@ -0,0 +1,41 @@
+"""
+Background refresher for stored trust scores
+The public registry reads Org.trust_score; this keeps it current. Public
+reads never compute scores, so this process refreshes every stale one.
+Run once (cron): python manage.py refresh_trust_scores [--stale-minutes 60] [--org-id 1]
+Run as a process: python manage.py refresh_trust_scores --interval 900
+"""
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from organization.models import Org
+from organization.trust_engine import TrustScoreEngine
+
+
+class Command(BaseCommand):
+    help = 'Recompute stored organization trust scores used by the trust registry'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-minutes', type=int, default=None, help='Only refresh scores older than this')
+        parser.add_argument('--org-id', type=int, action='append', dest='org_ids', help='Limit to these organizations')
+        parser.add_argument('--interval', type=int, default=None, help='Repeat every N seconds instead of exiting')
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(minutes=options['stale_minutes']) if options['stale_minutes'] is not None else None
+
+        while True:
+            close_old_connections()
+            organizations = Org.objects.all()
+            if options['org_ids']:
+                organizations = organizations.filter(pk__in=options['org_ids'])
+
+            started = time.monotonic()
+            refreshed = TrustScoreEngine.refresh_trust_scores(organizations, stale_after=stale_after)
+            self.stdout.write(self.style.SUCCESS(
+                f'Refreshed {refreshed} trust scores in {time.monotonic() - started:.2f}s'
+            ))
+
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+from django.db.models.functions import Length, Lower, Trim
+from django.db.models.lookups import In, LessThan
+
+# Classification rules as of this migration; later changes go through `reclassify_purposes`
+VAGUE_PURPOSES = ['general', 'testing', 'research', 'other', '']
+MIN_PURPOSE_LENGTH = 10
+
+
+def classify_existing_purposes(apps, schema_editor):
+    AccessRequest = apps.get_model('organization', 'AccessRequest')
+    AccessRequest.objects.update(purpose_quality=Case(
+        When(In(Lower('purpose'), VAGUE_PURPOSES), then=Value('VAGUE')),
+        When(LessThan(Length(Trim('purpose')), MIN_PURPOSE_LENGTH), then=Value('VAGUE')),
+        default=Value('CLEAR'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0007_alter_org_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accessrequest',
+            name='purpose_quality',
+            field=models.CharField(choices=[('CLEAR', 'Clear'), ('VAGUE', 'Vague')], default='VAGUE', editable=False, max_length=5),
+        ),
+        migrations.RunPython(classify_existing_purposes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='accessrequest',
+            index=models.Index(fields=['organization', 'purpose_quality'], name='organizatio_organiz_049633_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Q
+
+
+def backfill_counters(apps, schema_editor):
+    """Counters for existing organizations, so signal deltas always have a row to adjust"""
+    Org = apps.get_model('organization', 'Org')
+    AccessRequest = apps.get_model('organization', 'AccessRequest')
+    UserConsent = apps.get_model('consents', 'UserConsent')
+    TrustComponentCounters = apps.get_model('organization', 'TrustComponentCounters')
+
+    counts = {
+        row.pop('organization_id'): row
+        for row in AccessRequest.objects.annotate(
+            has_consent=Exists(UserConsent.objects.filter(user=OuterRef('user'), consent=OuterRef('consent'), access=True)),
+        ).order_by().values('organization_id').annotate(
+            total_requests=Count('pk'),
+            approved_with_consent=Count('pk', filter=Q(status='APPROVED', has_consent=True)),
+            revoked_requests=Count('pk', filter=Q(status='REVOKED')),
+            clear_purposes=Count('pk', filter=Q(purpose_quality='CLEAR')),
+        )
+    }
+    TrustComponentCounters.objects.bulk_create(
+        [TrustComponentCounters(organization_id=org_id, **counts.get(org_id, {})) for org_id in Org.objects.values_list('id', flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consents', '0009_alter_userconsent_granted_at'),
+        ('organization', '0008_accessrequest_purpose_quality'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrustComponentCounters',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_requests', models.IntegerField(default=0)),
+                ('approved_with_consent', models.IntegerField(default=0)),
+                ('revoked_requests', models.IntegerField(default=0)),
+                ('clear_purposes', models.IntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='accessrequest',
+            index=models.Index(fields=['organization', 'requested_at'], name='organizatio_organiz_644faa_idx'),
+        ),
+        migrations.AddField(
+            model_name='trustcomponentcounters',
+            name='organization',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trust_counters', to='organization.org'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
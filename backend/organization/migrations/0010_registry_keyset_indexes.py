@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0009_trustcomponentcounters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='org',
+            name='organizatio_trust_s_15dc8d_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='org',
+            name='organizatio_trust_l_f1b90c_idx',
+        ),
+        migrations.AddIndex(
+            model_name='org',
+            index=models.Index(fields=['-trust_score', 'name', 'id'], name='organizatio_trust_s_8b3ac9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='org',
+            index=models.Index(fields=['trust_level', '-trust_score', 'name', 'id'], name='organizatio_trust_l_56800b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='org',
+            index=models.Index(fields=['trust_certificate_issued', '-trust_score', 'name', 'id'], name='organizatio_trust_c_d1c89c_idx'),
+        ),
+    ]
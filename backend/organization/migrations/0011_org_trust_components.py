@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0010_registry_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='org',
+            name='trust_components',
+            field=models.JSONField(blank=True, default=dict, help_text='Component scores behind trust_score'),
+        ),
+    ]
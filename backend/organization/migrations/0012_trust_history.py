@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0011_org_trust_components'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrustScoreBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.PositiveSmallIntegerField(unique=True)),
+                ('organizations', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrustLevelSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('trust_level', models.CharField(choices=[('EXCELLENT', 'Excellent'), ('VERIFIED', 'Verified'), ('GOOD', 'Good'), ('BASIC', 'Basic'), ('LOW', 'Low')], max_length=20)),
+                ('organizations', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['day', 'trust_level'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'trust_level'), name='unique_trust_level_snapshot')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrustScoreHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trust_score', models.FloatField()),
+                ('trust_level', models.CharField(choices=[('EXCELLENT', 'Excellent'), ('VERIFIED', 'Verified'), ('GOOD', 'Good'), ('BASIC', 'Basic'), ('LOW', 'Low')], max_length=20)),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trust_history', to='organization.org')),
+            ],
+            options={
+                'ordering': ['-recorded_at'],
+                'indexes': [models.Index(fields=['organization', '-recorded_at'], name='organizatio_organiz_f2ac59_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0012_trust_history'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trustscorehistory',
+            index=models.Index(fields=['recorded_at'], name='organizatio_recorde_a14c02_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0013_trust_history_recorded_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='org',
+            index=models.Index(fields=['trust_score_last_calculated', 'id'], name='organizatio_trust_s_c354f3_idx'),
+        ),
+    ]
@@ -1,10 +1,17 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 from accounts.models import CustomUser, Profile
 from consents.models import Consent, UserConsent
 from django.contrib.auth import get_user_model
 from django.conf import settings 
+from .purpose_quality import classify_purpose
+
+# Org fields written by a trust score refresh
+TRUST_FIELDS = [
+    'trust_score', 'trust_level', 'trust_score_last_calculated',
+    'trust_certificate_issued', 'trust_certificate_issued_at', 'trust_components',
+]
 
 class Org(models.Model):
     TRUST_LEVEL_CHOICES = [
@@ -29,35 +36,58 @@ class Org(models.Model):
     trust_score_last_calculated = models.DateTimeField(null=True, blank=True)
     trust_certificate_issued = models.BooleanField(default=False)
     trust_certificate_issued_at = models.DateTimeField(null=True, blank=True)
+    trust_components = models.JSONField(default=dict, blank=True, help_text="Component scores behind trust_score")
     
     class Meta:
         ordering = ['-trust_score', 'name']
         indexes = [
-            models.Index(fields=['-trust_score']),
-            models.Index(fields=['trust_level']),
+            models.Index(fields=['-trust_score', 'name', 'id']),  # Registry keyset order
+            models.Index(fields=['trust_level', '-trust_score', 'name', 'id']),  # Registry by level
+            models.Index(fields=['trust_certificate_issued', '-trust_score', 'name', 'id']),  # Registry by certificate
+            models.Index(fields=['trust_score_last_calculated', 'id']),  # Refresher: due scores, oldest first
         ]
     
     def __str__(self):
         return self.name
     
-    def update_trust_score(self):
-        """Update trust score for this organization"""
-        from .trust_engine import TrustScoreEngine
-        trust_data = TrustScoreEngine.calculate_trust_score(self)
+    def update_trust_score(self, trust_data=None):
+        """Compute (unless trust_data is given) and store the trust score; returns the trust data"""
+        from .trust_history import record_recalculations
+        if trust_data is None:
+            from .trust_engine import TrustScoreEngine
+            trust_data = TrustScoreEngine.calculate_trust_score(self)
+        with transaction.atomic():
+            # The previous score comes from the locked row, not this instance, so
+            # concurrent refreshes move the organization between buckets once each
+            stored = Org.objects.select_for_update().only(
+                'trust_score', 'trust_score_last_calculated', 'trust_certificate_issued', 'trust_certificate_issued_at',
+            ).get(pk=self.pk)
+            self.trust_certificate_issued = stored.trust_certificate_issued
+            self.trust_certificate_issued_at = stored.trust_certificate_issued_at
+            self.update_trust_fields(trust_data)
+            self.save(update_fields=TRUST_FIELDS)
+            record_recalculations([(self.id, stored.stored_trust_score(), trust_data)], self.trust_score_last_calculated)
+        return trust_data
+
+    def stored_trust_score(self):
+        """The stored score, or None if it was never calculated"""
+        return self.trust_score if self.trust_score_last_calculated is not None else None
+
+    def update_trust_fields(self, trust_data, now=None):
+        """Set the stored trust fields from trust data without saving"""
+        now = now or timezone.now()
         self.trust_score = trust_data['overall_score']
         self.trust_level = trust_data['trust_level']
-        self.trust_score_last_calculated = timezone.now()
+        self.trust_components = trust_data['components']
+        self.trust_score_last_calculated = now
         
         # Auto-issue certificate if score >= 75 (VERIFIED or EXCELLENT)
         if trust_data['overall_score'] >= 75 and not self.trust_certificate_issued:
             self.trust_certificate_issued = True
-            self.trust_certificate_issued_at = timezone.now()
+            self.trust_certificate_issued_at = now
         elif trust_data['overall_score'] < 75:
             self.trust_certificate_issued = False
             self.trust_certificate_issued_at = None
-        
-        self.save()
-        return trust_data
 
 
 class AccessRequest(models.Model):
@@ -67,19 +97,102 @@ class AccessRequest(models.Model):
         ('REVOKED', 'Revoked'),
     ]
 
+    PURPOSE_QUALITY_CHOICES = [
+        ('CLEAR', 'Clear'),
+        ('VAGUE', 'Vague'),
+    ]
+
     organization = models.ForeignKey(Org, on_delete=models.CASCADE, related_name='access_requests')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='access_requests')
     consent = models.ForeignKey(Consent, on_delete=models.CASCADE, related_name='access_requests')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
     requested_at = models.DateTimeField(auto_now_add=True)
     purpose = models.CharField(max_length=40, blank=False, null=False)
+    purpose_quality = models.CharField(max_length=5, choices=PURPOSE_QUALITY_CHOICES, default='VAGUE', editable=False)
     class Meta:
         unique_together = ('organization', 'user', 'consent')
         ordering = ['-requested_at']
+        indexes = [
+            models.Index(fields=['organization', 'purpose_quality']),
+            models.Index(fields=['organization', 'requested_at']),
+        ]
 
     def __str__(self):
         return f"{self.organization.name} → {self.user.email} ({self.status})"
 
+    def save(self, *args, **kwargs):
+        self.purpose_quality = classify_purpose(self.purpose)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'purpose' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'purpose_quality'}
+        # Signals adjust trust counters; commit them with the row or not at all
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class TrustComponentCounters(models.Model):
+    """
+    Running per-organization counts behind the trust components, adjusted
+    by signals on AccessRequest and UserConsent writes and corrected by
+    `reconcile_trust_counters`.
+    """
+    organization = models.OneToOneField(Org, on_delete=models.CASCADE, related_name='trust_counters')
+    total_requests = models.IntegerField(default=0)
+    approved_with_consent = models.IntegerField(default=0)
+    revoked_requests = models.IntegerField(default=0)
+    clear_purposes = models.IntegerField(default=0)
+    reconciled_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.organization.name} trust counters"
+
+
+class TrustScoreHistory(models.Model):
+    """One stored trust score, appended on every recalculation"""
+    organization = models.ForeignKey(Org, on_delete=models.CASCADE, related_name='trust_history')
+    trust_score = models.FloatField()
+    trust_level = models.CharField(max_length=20, choices=Org.TRUST_LEVEL_CHOICES)
+    recorded_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-recorded_at']
+        indexes = [
+            models.Index(fields=['organization', '-recorded_at']),
+            models.Index(fields=['recorded_at']),  # retention pruning
+        ]
+
+    def __str__(self):
+        return f"{self.organization.name} {self.trust_score} at {self.recorded_at}"
+
+
+class TrustScoreBucket(models.Model):
+    """
+    Histogram of stored trust scores: how many scored organizations have a
+    score in [bucket, bucket + 1) (bucket 100 holds exactly 100). Kept in
+    step with Org.trust_score so ranks are read without sorting organizations.
+    """
+    bucket = models.PositiveSmallIntegerField(unique=True)
+    organizations = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"[{self.bucket}, {self.bucket + 1}): {self.organizations}"
+
+
+class TrustLevelSnapshot(models.Model):
+    """Organizations per trust level at the end of each day (the latest recalculation that day)"""
+    day = models.DateField()
+    trust_level = models.CharField(max_length=20, choices=Org.TRUST_LEVEL_CHOICES)
+    organizations = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['day', 'trust_level']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'trust_level'], name='unique_trust_level_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.trust_level}: {self.organizations}"
+
 
 class IntegrityRecord(models.Model):
     """Store integrity records for audit trail"""
@@ -0,0 +1,45 @@
+"""
+Access request purpose classification
+A purpose is VAGUE when it is a generic term or too short to say what the
+data is for; CLEAR otherwise. The label is stored on AccessRequest at write
+time so compliance and trust checks count an indexed column instead of
+re-deriving it from free text.
+"""
+from django.conf import settings
+from django.db.models import Case, Value, When
+from django.db.models.functions import Length, Lower, Trim
+from django.db.models.lookups import In, LessThan
+
+CLEAR = 'CLEAR'
+VAGUE = 'VAGUE'
+
+# Defaults, overridable with PURPOSE_VAGUE_TERMS / PURPOSE_MIN_LENGTH
+VAGUE_PURPOSES = ['general', 'testing', 'research', 'other', '']
+MIN_PURPOSE_LENGTH = 10
+
+
+def vague_terms() -> list:
+    return list(getattr(settings, 'PURPOSE_VAGUE_TERMS', VAGUE_PURPOSES))
+
+
+def min_purpose_length() -> int:
+    return getattr(settings, 'PURPOSE_MIN_LENGTH', MIN_PURPOSE_LENGTH)
+
+
+def classify_purpose(purpose) -> str:
+    """Classify one purpose string; only spaces are trimmed, as SQL TRIM does"""
+    if purpose is None:
+        return VAGUE
+    if purpose.lower() in vague_terms() or len(purpose.strip(' ')) < min_purpose_length():
+        return VAGUE
+    return CLEAR
+
+
+def purpose_quality_expression():
+    """SQL equivalent of classify_purpose(), for reclassifying rows in one UPDATE"""
+    return Case(
+        When(purpose__isnull=True, then=Value(VAGUE)),
+        When(In(Lower('purpose'), vague_terms()), then=Value(VAGUE)),
+        When(LessThan(Length(Trim('purpose')), min_purpose_length()), then=Value(VAGUE)),
+        default=Value(CLEAR),
+    )
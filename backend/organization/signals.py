@@ -0,0 +1,103 @@
+"""
+Django signals keeping trust component counters and the score histogram current
+Each handler works out how the write changed an organization's counts and
+applies the difference with F() updates (see trust_counters, trust_history).
+"""
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from consents.models import UserConsent
+from .models import AccessRequest, Org, TrustComponentCounters
+from .trust_counters import apply_deltas, has_active_consent, request_contribution
+from .trust_history import apply_bucket_deltas, bucket_of
+from .trust_refresh import schedule_refresh
+
+
+def _contribution(organization_id, status, purpose_quality, user_id, consent_id) -> tuple:
+    has_consent = status == 'APPROVED' and has_active_consent(user_id, consent_id)
+    return organization_id, request_contribution(status, purpose_quality, has_consent)
+
+
+@receiver(post_save, sender=Org)
+def create_trust_counters(sender, instance, created, **kwargs):
+    """
+    New organizations start with (empty) counters so no delta is ever
+    dropped. Never-scored organizations are the trust refresher's first
+    pick (or scored inline on commit without it) so the registry lists them.
+    """
+    if created:
+        TrustComponentCounters.objects.get_or_create(organization=instance)
+        transaction.on_commit(lambda: schedule_refresh(instance))
+
+
+@receiver(pre_save, sender=AccessRequest)
+def remember_access_request(sender, instance, **kwargs):
+    """Stash the stored row's contribution so post_save can apply the difference"""
+    instance._trust_previous = None
+    if instance._state.adding:
+        return
+    previous = AccessRequest.objects.filter(pk=instance.pk).values_list(
+        'organization_id', 'status', 'purpose_quality', 'user_id', 'consent_id'
+    ).first()
+    if previous is not None:
+        instance._trust_previous = _contribution(*previous)
+
+
+@receiver(post_save, sender=AccessRequest)
+def count_access_request_save(sender, instance, **kwargs):
+    org_id, current = _contribution(
+        instance.organization_id, instance.status, instance.purpose_quality, instance.user_id, instance.consent_id
+    )
+    previous = getattr(instance, '_trust_previous', None)
+    instance._trust_previous = None
+    if previous is None:
+        apply_deltas(org_id, current)
+    elif previous[0] != org_id:
+        apply_deltas(previous[0], {field: -value for field, value in previous[1].items()})
+        apply_deltas(org_id, current)
+    else:
+        apply_deltas(org_id, {field: current[field] - previous[1][field] for field in current})
+
+
+@receiver(post_delete, sender=AccessRequest)
+def count_access_request_delete(sender, instance, **kwargs):
+    org_id, contribution = _contribution(
+        instance.organization_id, instance.status, instance.purpose_quality, instance.user_id, instance.consent_id
+    )
+    apply_deltas(org_id, {field: -value for field, value in contribution.items()})
+
+
+@receiver(pre_save, sender=UserConsent)
+@receiver(pre_delete, sender=UserConsent)
+def remember_user_consent(sender, instance, **kwargs):
+    """Whether the user granted this consent type before the write"""
+    instance._trust_had_consent = has_active_consent(instance.user_id, instance.consent_id)
+
+
+@receiver(post_save, sender=UserConsent)
+@receiver(post_delete, sender=UserConsent)
+def count_user_consent_change(sender, instance, **kwargs):
+    """A grant or revocation moves that user's approved requests for the consent type in or out of the count"""
+    had_consent = getattr(instance, '_trust_had_consent', None)
+    has_consent = has_active_consent(instance.user_id, instance.consent_id)
+    if had_consent is None or had_consent == has_consent:
+        return
+    step = 1 if has_consent else -1
+    approved = AccessRequest.objects.filter(
+        user_id=instance.user_id,
+        consent_id=instance.consent_id,
+        status='APPROVED',
+    ).order_by().values('organization_id').annotate(count=Count('pk')).values_list('organization_id', 'count')
+    for org_id, count in approved:
+        apply_deltas(org_id, {'approved_with_consent': step * count})
+
+
+@receiver(pre_delete, sender=Org)
+def uncount_deleted_organization(sender, instance, **kwargs):
+    """A deleted organization leaves the rank histogram (inside the delete's transaction)"""
+    score = Org.objects.filter(
+        pk=instance.pk, trust_score_last_calculated__isnull=False,
+    ).values_list('trust_score', flat=True).first()
+    if score is not None:
+        apply_bucket_deltas({bucket_of(score): -1})
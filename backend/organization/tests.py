@@ -1,3 +1,506 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from consents.models import Consent, UserConsent
+from . import trust_history, trust_refresh
+from .models import Org, AccessRequest, TrustComponentCounters, TrustLevelSnapshot, TrustScoreHistory
+from .trust_counters import COUNTER_FIELDS, counted, reconcile
+from .trust_engine import TrustInputs, TrustScoreEngine
+from .trust_simulation import simulate
 
-# Create your tests here.
+User = get_user_model()
+
+
+class TrustDataMixin:
+    """Organizations with a mix of consented and revoked approved requests"""
+
+    def setUp(self):
+        cache.clear()
+        self.consent = Consent.objects.create(name='Email')
+        self.orgs = [self._org(i) for i in range(3)]
+        for i, org in enumerate(self.orgs):
+            for j in range(i + 1):
+                self._request(org, f'citizen{i}-{j}@test.com', access=j % 2 == 0)
+
+    def _org(self, i):
+        user = User.objects.create_user(email=f'org{i}@test.com', password='testpass123', user_role='ORGANIZATION')
+        return Org.objects.create(user=user, name=f'Org {i}', email=f'org{i}@test.com', address='1 Test St')
+
+    def _request(self, org, email, access, status='APPROVED', purpose='Identity verification for account'):
+        citizen = User.objects.get_or_create(email=email, defaults={'user_role': 'CITIZEN'})[0]
+        UserConsent.objects.create(user=citizen, consent=self.consent, access=access)
+        return AccessRequest.objects.create(
+            organization=org, user=citizen, consent=self.consent, status=status, purpose=purpose,
+        )
+
+
+class TrustRegistryTestCase(TrustDataMixin, TestCase):
+    """Test the registry served from stored trust scores"""
+
+    def test_registry_reads_stored_scores_in_one_query(self):
+        """Test that the public registry issues one query and never recomputes"""
+        call_command('refresh_trust_scores', stdout=StringIO())
+        client = APIClient()
+        with self.assertNumQueries(1):
+            response = client.get(reverse('trust-registry'), {'limit': 2})
+
+        expected = sorted(
+            (TrustScoreEngine.calculate_trust_score(org)['overall_score'] for org in self.orgs), reverse=True
+        )[:2]
+        self.assertEqual([r['trust_score'] for r in response.data['results']], expected)
+
+    @override_settings(TRUST_REFRESH_ASYNC=False)
+    def test_new_organization_is_scored_and_listed(self):
+        """Test that creating an organization scores it on commit so the registry shows it"""
+        with self.captureOnCommitCallbacks(execute=True):
+            org = self._org(9)
+        org.refresh_from_db()
+        self.assertIsNotNone(org.trust_score_last_calculated)
+        page = TrustScoreEngine.get_registry_page(limit=100)
+        self.assertIn(org.id, [row['organization']['id'] for row in page['results']])
+
+    def test_refresher_only_updates_stale_scores(self):
+        """Test that fresh scores are skipped when a staleness window is given"""
+        self.assertEqual(TrustScoreEngine.refresh_trust_scores(), 3)
+        self.assertEqual(TrustScoreEngine.get_organization_ranking(limit=10)[0]['organization']['id'], self.orgs[0].id)
+        self.assertEqual(TrustScoreEngine.refresh_trust_scores(stale_after=timedelta(hours=1)), 0)
+
+
+class TrustPipelineTestCase(TrustDataMixin, TestCase):
+    """Test the single-pass trust computation"""
+
+    def test_components_share_one_set_of_inputs(self):
+        """Test that a full computation costs two queries once the compliance scan is cached"""
+        org = self.orgs[1]  # one consented and one revoked-consent approved request
+        TrustScoreEngine.calculate_trust_score(org)
+        with self.assertNumQueries(2):  # trust counters and the compliance data version
+            trust_data = TrustScoreEngine.calculate_trust_score(org)
+
+        self.assertEqual(trust_data['components']['consent_respect'], 50)
+        self.assertEqual(trust_data['components']['transparency'], 100)
+        self.assertEqual(
+            trust_data['components']['consent_respect'],
+            TrustScoreEngine.calculate_consent_respect_score(org),
+        )
+
+    def test_score_endpoint_serves_stored_score_without_writing(self):
+        """Test that a fresh stored score is served from the organization row alone"""
+        org = self.orgs[2]
+        org.update_trust_score()
+        client = APIClient()
+        with self.assertNumQueries(1):
+            response = client.get(reverse('organization-trust-score-detail', args=[org.id]))
+
+        self.assertFalse(response.data['stale'])
+        self.assertEqual(response.data['trust_score'], org.trust_score)
+        self.assertEqual(response.data['components'], org.trust_components)
+
+    def test_never_scored_organization_is_read_without_writing(self):
+        """Test that an unscored organization returns no score and is left to the trust process"""
+        org = self.orgs[1]
+        TrustComponentCounters.objects.all().delete()
+        client = APIClient()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('organization-trust-score-detail', args=[org.id]))
+
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(response.data['stale'])
+        self.assertIsNone(response.data['trust_score'])
+
+    @override_settings(TRUST_SCORE_TTL=60)
+    def test_stale_score_is_refreshed_by_the_trust_process(self):
+        """Test that stale reads only read, and the refresher process brings the score current"""
+        org = self.orgs[2]
+        org.update_trust_score()
+        Org.objects.filter(pk=org.id).update(trust_score=1.0, trust_score_last_calculated=timezone.now() - timedelta(hours=1))
+        client = APIClient()
+        url = reverse('organization-trust-score-detail', args=[org.id])
+
+        with self.assertNumQueries(2):
+            first = client.get(url)
+            second = client.get(url)
+        self.assertTrue(first.data['stale'] and second.data['stale'])
+        self.assertEqual(first.data['trust_score'], 1.0)
+
+        call_command('refresh_trust_scores', '--stale-minutes', '1', stdout=StringIO())
+        response = client.get(url)
+        self.assertFalse(response.data['stale'])
+        self.assertEqual(response.data['trust_score'], TrustScoreEngine.calculate_trust_score(org)['overall_score'])
+
+    @override_settings(TRUST_SCORE_TTL=60, TRUST_REFRESH_ASYNC=False)
+    def test_inline_refresh_without_trust_process_runs_once_per_lock(self):
+        """Test that without a trust process a stale read refreshes inline, deduplicated by the cache lock"""
+        org = self.orgs[2]
+        cache.add(trust_refresh._lock_key(org.id), True)
+        self.assertFalse(trust_refresh.schedule_refresh(org))
+        cache.delete(trust_refresh._lock_key(org.id))
+
+        response = APIClient().get(reverse('organization-trust-score-detail', args=[org.id]))
+        self.assertTrue(response.data['stale'])
+        org.refresh_from_db()
+        self.assertIsNotNone(org.trust_score_last_calculated)
+        self.assertFalse(trust_refresh.is_stale(org))
+
+
+class BulkTrustScoreTestCase(TrustDataMixin, TestCase):
+    """Test the batch trust recomputation"""
+
+    def test_bulk_scores_match_per_organization_scores(self):
+        """Test that the vectorized bulk path agrees with calculate_trust_score"""
+        self._request(self.orgs[0], 'vague@test.com', access=True, status='REVOKED', purpose='general')
+        results = TrustScoreEngine.bulk_calculate_trust_scores(Org.objects.all())
+
+        for org in self.orgs:
+            expected = TrustScoreEngine.calculate_trust_score(org)
+            self.assertEqual(results[org.id]['overall_score'], expected['overall_score'])
+            self.assertEqual(results[org.id]['trust_level'], expected['trust_level'])
+            self.assertEqual(results[org.id]['components'], expected['components'])
+
+    def test_bulk_update_query_count_is_independent_of_organization_count(self):
+        """Test that a bulk refresh issues a fixed number of queries however many organizations it covers"""
+        def refresh_queries():
+            context = CaptureQueriesContext(connection)
+            with context:
+                TrustScoreEngine.bulk_update_trust_scores(Org.objects.all())
+            return len(context.captured_queries)
+
+        def add_organizations(numbers):
+            for i in numbers:
+                self._request(self._org(i), f'extra{i}@test.com', access=True)
+
+        refresh_queries()  # first refresh also builds the rank histogram
+        add_organizations([3])
+        baseline = refresh_queries()
+        add_organizations(range(4, 8))
+        self.assertEqual(refresh_queries(), baseline)
+
+        stored = Org.objects.get(pk=self.orgs[2].id)
+        self.assertEqual(stored.trust_score, TrustScoreEngine.calculate_trust_score(stored)['overall_score'])
+        self.assertIsNotNone(stored.trust_score_last_calculated)
+
+    def test_trust_level_has_no_gaps_between_ranges(self):
+        """Test that fractional scores between the level ranges get the lower level"""
+        self.assertEqual(TrustScoreEngine.get_trust_level(89.5), 'VERIFIED')
+        self.assertEqual(TrustScoreEngine.get_trust_level(74.99), 'GOOD')
+        self.assertEqual(TrustScoreEngine.get_trust_level(39.5), 'LOW')
+
+
+class TrustCounterTestCase(TrustDataMixin, TestCase):
+    """Test the incrementally maintained trust component counters"""
+
+    def assertCountersMatch(self, org):
+        counters = TrustComponentCounters.objects.get(organization=org)
+        self.assertEqual(
+            {field: getattr(counters, field) for field in COUNTER_FIELDS},
+            counted([org.id])[org.id],
+        )
+
+    def test_counters_follow_request_and_consent_writes(self):
+        """Test that saves, status changes, consent revocations and deletes keep counters exact"""
+        org = self.orgs[2]
+        reconcile([org.id])
+
+        request = self._request(org, 'new@test.com', access=True, purpose='general')
+        self.assertCountersMatch(org)
+        request.status = 'REVOKED'
+        request.purpose = 'Fraud screening for payments'
+        request.save()
+        self.assertCountersMatch(org)
+
+        approved = AccessRequest.objects.filter(organization=org, status='APPROVED').first()
+        UserConsent.objects.create(user=approved.user, consent=self.consent, access=False)
+        UserConsent.objects.filter(user=approved.user, access=True).first().delete()
+        self.assertCountersMatch(org)
+        UserConsent.objects.create(user=approved.user, consent=self.consent, access=True)
+        self.assertCountersMatch(org)
+
+        request.delete()
+        self.assertCountersMatch(org)
+
+    def test_counters_exist_from_creation_and_commit_with_the_write(self):
+        """Test that new organizations have counters and a failed counter update rolls back the request"""
+        org = self._org(9)
+        self._request(org, 'first@test.com', access=True)
+        self.assertCountersMatch(org)
+
+        with patch('organization.signals.apply_deltas', side_effect=RuntimeError('counter update failed')):
+            with self.assertRaises(RuntimeError):
+                self._request(org, 'second@test.com', access=True)
+        self.assertEqual(AccessRequest.objects.filter(organization=org).count(), 1)
+        self.assertCountersMatch(org)
+
+    def test_trust_inputs_read_counters_in_one_query(self):
+        """Test that trust inputs come from the counters row however many requests an organization has"""
+        org = self.orgs[2]
+        for i in range(5):
+            self._request(org, f'bulk{i}@test.com', access=True)
+        TrustScoreEngine.calculate_trust_score(org)
+        with self.assertNumQueries(1):
+            TrustInputs(org)
+
+    def test_reconcile_corrects_drift(self):
+        """Test that writes bypassing signals are corrected by the reconcile command"""
+        org = self.orgs[1]
+        reconcile([org.id])
+        AccessRequest.objects.filter(organization=org).update(status='REVOKED')
+
+        out = StringIO()
+        call_command('reconcile_trust_counters', '--org-id', str(org.id), stdout=out)
+        self.assertIn('1 had drifted', out.getvalue())
+        self.assertCountersMatch(org)
+
+
+class ConsentRespectQueryTestCase(TrustDataMixin, TestCase):
+    """Test that consent-respect scoring does not query per approved request"""
+
+    def _per_request_score(self, org):
+        """The score as computed before, with one consent lookup per approved request"""
+        requests = AccessRequest.objects.filter(organization=org)
+        total = requests.count()
+        valid = sum(
+            UserConsent.objects.filter(user=r.user, consent=r.consent, access=True).exists()
+            for r in requests.filter(status='APPROVED')
+        )
+        score = valid / total * 100
+        revoked = requests.filter(status='REVOKED').count()
+        if revoked:
+            score = max(0, score - min(20, revoked / total * 100))
+        return score
+
+    def test_query_count_is_fixed_for_any_organization_size(self):
+        """Test that one query serves the score and the reconcile aggregate for small and large organizations"""
+        small, large = self.orgs[0], self.orgs[2]
+        for i in range(20):
+            self._request(large, f'large{i}@test.com', access=i % 3 != 0, status='REVOKED' if i % 7 == 0 else 'APPROVED')
+        reconcile([small.id, large.id])
+
+        for org in (small, large):
+            with self.assertNumQueries(1):
+                score = TrustScoreEngine.calculate_consent_respect_score(org)
+            self.assertAlmostEqual(score, self._per_request_score(org))
+            with self.assertNumQueries(1):
+                counted([org.id])
+
+
+class TrustSimulationTestCase(TrustDataMixin, TestCase):
+    """Test the staff-only trust weight simulation API"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.staff = User.objects.create_user(email='staff@test.com', password='testpass123', is_staff=True)
+
+    def test_scenarios_rank_from_one_component_matrix(self):
+        """Test that the baseline matches the engine and scenarios re-rank without recomputing"""
+        self.client.force_authenticate(self.staff)
+        scenarios = [
+            {'name': 'consent-only', 'weights': {name: 0 for name in TrustScoreEngine.COMPONENT_WEIGHTS} | {'consent_respect': 1}},
+            {'name': 'strict', 'levels': {'EXCELLENT': 99, 'VERIFIED': 95, 'GOOD': 90, 'BASIC': 80}},
+        ]
+        self.client.post(reverse('trust-simulation'), {'scenarios': scenarios}, format='json')
+        with self.assertNumQueries(1):  # cached matrix; only the names of ranked organizations
+            response = self.client.post(reverse('trust-simulation'), {'scenarios': scenarios}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        for row in response.data['baseline']['ranking']:
+            expected = TrustScoreEngine.calculate_trust_score(Org.objects.get(pk=row['organization']['id']))
+            self.assertEqual(row['trust_score'], expected['overall_score'])
+            self.assertEqual(row['trust_level'], expected['trust_level'])
+
+        consent_only, strict = response.data['scenarios']
+        consent_scores = {
+            org.id: TrustScoreEngine.calculate_consent_respect_score(org) for org in self.orgs
+        }
+        self.assertEqual(
+            [row['organization']['id'] for row in consent_only['ranking']],
+            sorted(consent_scores, key=lambda org_id: (-consent_scores[org_id], org_id)),
+        )
+        self.assertEqual(strict['rank_changes']['moved'], 0)
+        self.assertEqual(sum(strict['level_counts'].values()), len(self.orgs))
+        self.assertGreater(strict['level_changes']['downgraded'], 0)
+
+    def test_rejects_non_staff_and_invalid_scenarios(self):
+        """Test staff-only access and validation of weights and thresholds"""
+        self.client.force_authenticate(self.orgs[0].user)
+        self.assertEqual(self.client.post(reverse('trust-simulation'), {'scenarios': [{}]}, format='json').status_code, 403)
+
+        self.client.force_authenticate(self.staff)
+        for scenario in (
+            {'weights': {'speed': 1}},
+            {'weights': {'compliance': -1}},
+            {'weights': {'compliance': 'heavy'}},
+            {'weights': {'compliance': 'nan'}},
+            {'levels': {'GOOD': 95}},
+            {'levels': {'GOOD': 'high'}},
+            {'levels': {'GOOD': None}},
+        ):
+            response = self.client.post(reverse('trust-simulation'), {'scenarios': [scenario]}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_baseline_levels_match_stored_levels_at_boundaries(self):
+        """Test that a score rounding up to a level minimum gets the level the engine stores for it"""
+        org_ids = [org.id for org in self.orgs]
+        # Every component at 59.996: the weighted score rounds to 60.0, which is GOOD
+        matrix = np.full((len(org_ids), len(TrustScoreEngine.COMPONENT_WEIGHTS)), 59.996)
+        with patch('organization.trust_simulation.component_matrix', return_value=(org_ids, matrix)):
+            result = simulate([{}], limit=len(org_ids))
+
+        self.assertEqual(result['baseline']['level_counts']['GOOD'], len(org_ids))
+        for row in result['baseline']['ranking']:
+            self.assertEqual(row['trust_score'], 60.0)
+            self.assertEqual(row['trust_level'], TrustScoreEngine.get_trust_level(row['trust_score']))
+
+    def test_limit_is_clamped_to_at_least_one(self):
+        """Test that a zero or negative limit returns the top organization instead of slicing from the end"""
+        self.client.force_authenticate(self.staff)
+        for limit in (0, -2):
+            response = self.client.post(reverse('trust-simulation'), {'scenarios': [{}], 'limit': limit}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['baseline']['ranking']), 1)
+            self.assertEqual(response.data['baseline']['ranking'][0]['rank'], 1)
+
+
+class TrustRegistryPaginationTestCase(TrustDataMixin, TestCase):
+    """Test keyset pagination and filters on the trust registry"""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(3, 8):
+            self._org(i)
+        TrustScoreEngine.refresh_trust_scores()
+        # Equal scores exercise the name and id tie-breakers
+        Org.objects.filter(name__in=['Org 5', 'Org 6', 'Org 7']).update(trust_score=50.0, trust_level='BASIC')
+        self.client = APIClient()
+
+    def _pages(self, **params):
+        ids, cursor = [], None
+        while True:
+            query = {**params, 'limit': 2, **({'cursor': cursor} if cursor else {})}
+            with self.assertNumQueries(1):
+                response = self.client.get(reverse('trust-registry'), query)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['organization']['id'] for row in response.data['results'])
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_pages_cover_the_ranking_once_in_order(self):
+        """Test that following cursors walks every scored organization exactly once"""
+        expected = list(Org.objects.order_by('-trust_score', 'name', 'id').values_list('id', flat=True))
+        self.assertEqual(self._pages(), expected)
+
+    def test_filters_apply_across_pages(self):
+        """Test level, certificate, score band and name filters"""
+        basic = Org.objects.filter(trust_level='BASIC').order_by('-trust_score', 'name', 'id')
+        self.assertEqual(self._pages(trust_level='BASIC'), list(basic.values_list('id', flat=True)))
+        certified = Org.objects.filter(trust_certificate_issued=True).order_by('-trust_score', 'name', 'id')
+        self.assertEqual(self._pages(certified='true'), list(certified.values_list('id', flat=True)))
+        self.assertEqual(len(self._pages(min_score=40, max_score=60)), 3)
+        self.assertEqual(self._pages(search='org 6'), [Org.objects.get(name='Org 6').id])
+
+    def test_rejects_invalid_cursor_and_level(self):
+        """Test that malformed cursors and unknown levels are client errors"""
+        self.assertEqual(self.client.get(reverse('trust-registry'), {'cursor': 'not-a-cursor'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('trust-registry'), {'trust_level': 'GOLD'}).status_code, 400)
+
+
+class TrustHistoryTestCase(TrustDataMixin, TestCase):
+    """Test trust score history, histogram ranks and level snapshots"""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(3, 7):
+            self._org(i)
+        TrustScoreEngine.refresh_trust_scores()
+
+    def _expected_rank(self, org):
+        scores = list(trust_history.scored_organizations().values_list('trust_score', flat=True))
+        above = sum(1 for score in scores if score > org.trust_score)
+        return above + 1, round((len(scores) - above) / len(scores) * 100, 2)
+
+    def test_recalculations_append_history_and_move_ranks(self):
+        """Test that each recalculation is recorded and ranks follow score changes"""
+        org = Org.objects.get(pk=self.orgs[0].id)
+        self._request(org, 'extra@test.com', access=True, status='REVOKED', purpose='general')
+        org.update_trust_score()
+
+        history = TrustScoreHistory.objects.filter(organization=org).order_by('recorded_at')
+        self.assertEqual(history.count(), 2)
+        self.assertEqual(history.last().trust_score, org.trust_score)
+
+        for other in Org.objects.all():
+            with self.assertNumQueries(2):  # bucket counts, in-bucket count
+                ranking = trust_history.rank(other)
+            self.assertEqual((ranking['rank'], ranking['percentile']), self._expected_rank(other))
+            self.assertEqual(ranking['total'], Org.objects.count())
+
+    def test_level_distribution_tracks_current_levels(self):
+        """Test that today's snapshot and the histogram agree with stored levels"""
+        response = APIClient().get(reverse('trust-level-distribution'))
+        expected = {level: Org.objects.filter(trust_level=level).count() for level in TrustScoreEngine.TRUST_LEVELS}
+        self.assertEqual(response.data['current'], expected)
+        self.assertEqual(response.data['history'][-1]['levels'], expected)
+        self.assertEqual(TrustLevelSnapshot.objects.values('day').distinct().count(), 1)
+
+    def test_deletes_and_bypassed_writes_are_corrected(self):
+        """Test the delete signal and the histogram rebuild after a direct UPDATE"""
+        self.orgs[1].delete()
+        self.assertEqual(sum(trust_history.bucket_counts()), Org.objects.count())
+
+        Org.objects.filter(pk=self.orgs[2].id).update(trust_score=12.5)
+        call_command('reconcile_trust_counters', stdout=StringIO())
+        org = Org.objects.get(pk=self.orgs[2].id)
+        self.assertEqual(trust_history.rank(org)['rank'], self._expected_rank(org)[0])
+
+    def test_stale_instance_moves_its_bucket_once(self):
+        """Test that the previous bucket is read from the stored row, not an outdated instance"""
+        stale = Org.objects.get(pk=self.orgs[0].id)
+        Org.objects.get(pk=self.orgs[0].id).update_trust_score({
+            'overall_score': 10.0, 'trust_level': 'LOW', 'components': {}, 'last_calculated': None,
+        })
+        stale.update_trust_score()
+        self.assertEqual(trust_history.bucket_counts(), trust_history.rebuild_buckets())
+
+    def test_owner_dashboard_records_only_stale_scores(self):
+        """Test that the authenticated score view reuses a fresh score instead of recording every GET"""
+        org = self.orgs[0]
+        client = APIClient()
+        client.force_authenticate(org.user)
+        for _ in range(3):
+            self.assertEqual(client.get(reverse('organization-trust-score')).status_code, 200)
+        self.assertEqual(TrustScoreHistory.objects.filter(organization=org).count(), 1)
+
+        Org.objects.filter(pk=org.id).update(trust_score_last_calculated=timezone.now() - timedelta(days=1))
+        client.get(reverse('organization-trust-score'))
+        self.assertEqual(TrustScoreHistory.objects.filter(organization=org).count(), 2)
+
+    def test_prune_drops_history_past_retention(self):
+        """Test that prune_trust_history keeps only history within TRUST_SCORE_HISTORY_RETENTION"""
+        old = timezone.now() - timedelta(days=400)
+        TrustScoreHistory.objects.filter(organization=self.orgs[0]).update(recorded_at=old)
+        TrustLevelSnapshot.objects.create(day=timezone.localdate(old), trust_level='LOW', organizations=1)
+
+        with override_settings(TRUST_SCORE_HISTORY_RETENTION=timedelta(days=365)):
+            call_command('prune_trust_history', stdout=StringIO())
+        self.assertFalse(TrustScoreHistory.objects.filter(organization=self.orgs[0]).exists())
+        self.assertEqual(TrustScoreHistory.objects.count(), Org.objects.count() - 1)
+        self.assertFalse(TrustLevelSnapshot.objects.filter(day__lt=timezone.localdate()).exists())
+
+    def test_history_endpoint(self):
+        """Test the public history endpoint returns points with rank and percentile"""
+        org = self.orgs[2]
+        response = APIClient().get(reverse('organization-trust-history', args=[org.id]), {'days': 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['history']), 1)
+        self.assertEqual(response.data['ranking']['rank'], self._expected_rank(Org.objects.get(pk=org.id))[0])
+        self.assertEqual(APIClient().get(reverse('organization-trust-history', args=[9999])).status_code, 404)
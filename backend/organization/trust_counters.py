@@ -0,0 +1,101 @@
+"""
+Incrementally maintained trust component counters
+Every AccessRequest or UserConsent write adjusts the affected organizations'
+TrustComponentCounters row with F() increments, so trust scoring reads one
+row instead of aggregating all of an organization's requests. Writes that
+bypass signals (bulk updates, raw SQL) are corrected by `reconcile`.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from compliance.scan_context import active_consent_exists
+from consents.models import UserConsent
+from .models import AccessRequest, Org, TrustComponentCounters
+from .purpose_quality import CLEAR
+
+COUNTER_FIELDS = ('total_requests', 'approved_with_consent', 'revoked_requests', 'clear_purposes')
+
+
+def counter_aggregates() -> dict:
+    """Aggregates over access requests annotated with has_consent; the counters' source of truth"""
+    return {
+        'total_requests': Count('pk'),
+        'approved_with_consent': Count('pk', filter=Q(status='APPROVED', has_consent=True)),
+        'revoked_requests': Count('pk', filter=Q(status='REVOKED')),
+        'clear_purposes': Count('pk', filter=Q(purpose_quality=CLEAR)),
+    }
+
+
+def has_active_consent(user_id, consent_id) -> bool:
+    return UserConsent.objects.filter(user_id=user_id, consent_id=consent_id, access=True).exists()
+
+
+def request_contribution(status, purpose_quality, has_consent) -> dict:
+    """What one access request adds to its organization's counters"""
+    return {
+        'total_requests': 1,
+        'approved_with_consent': int(status == 'APPROVED' and has_consent),
+        'revoked_requests': int(status == 'REVOKED'),
+        'clear_purposes': int(purpose_quality == CLEAR),
+    }
+
+
+def apply_deltas(org_id, deltas: dict):
+    """
+    Add deltas to an organization's counters in one UPDATE, inside the
+    transaction of the write that caused them. Organizations get their row
+    on creation; a row that is still missing is built from the access
+    requests on first read, which already includes this write.
+    """
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if changes:
+        TrustComponentCounters.objects.filter(organization_id=org_id).update(**changes)
+
+
+def counted(org_ids) -> dict:
+    """Counter values recomputed from access requests, keyed by organization id"""
+    counts = {org_id: dict.fromkeys(COUNTER_FIELDS, 0) for org_id in org_ids}
+    rows = AccessRequest.objects.filter(
+        organization_id__in=org_ids
+    ).annotate(
+        has_consent=active_consent_exists(),
+    ).order_by().values('organization_id').annotate(**counter_aggregates())
+    for row in rows:
+        counts[row.pop('organization_id')] = row
+    return counts
+
+
+def reconcile(org_ids=None, batch_size: int = 2000) -> tuple:
+    """
+    Recompute counters from access requests and upsert them.
+    Returns (organizations checked, organizations whose counters had drifted).
+    """
+    if org_ids is None:
+        org_ids = Org.objects.order_by('id').values_list('id', flat=True)
+    org_ids = list(org_ids)
+    checked = drifted = 0
+
+    for start in range(0, len(org_ids), batch_size):
+        batch = org_ids[start:start + batch_size]
+        with transaction.atomic():
+            # Lock the rows first: a concurrent write either committed before the
+            # lock (and is counted) or applies its delta after this upsert
+            stored = {
+                row[0]: dict(zip(COUNTER_FIELDS, row[1:]))
+                for row in TrustComponentCounters.objects.select_for_update().filter(
+                    organization_id__in=batch
+                ).order_by('organization_id').values_list('organization_id', *COUNTER_FIELDS)
+            }
+            counts = counted(batch)
+            drifted += sum(1 for org_id, values in stored.items() if values != counts[org_id])
+            checked += len(batch)
+
+            now = timezone.now()
+            TrustComponentCounters.objects.bulk_create(
+                [TrustComponentCounters(organization_id=org_id, reconciled_at=now, **values) for org_id, values in counts.items()],
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['organization'],
+                update_fields=[*COUNTER_FIELDS, 'reconciled_at'],
+            )
+    return checked, drifted
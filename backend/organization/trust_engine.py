@@ -2,11 +2,25 @@
 Trust Score Calculation Engine for Organizations
 Calculates trust scores based on compliance, data handling, and user feedback
 """
+import base64
+import binascii
+import json
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.functional import cached_property
 from datetime import timedelta
-from .models import Org, AccessRequest
+from .models import Org, AccessRequest, TrustComponentCounters, TRUST_FIELDS
+from .trust_counters import COUNTER_FIELDS, counter_aggregates, reconcile
+from .trust_history import record_recalculations
 from compliance.models import ComplianceAudit, ViolationReport
 from consents.models import UserConsent
+from compliance.scan_context import active_consent_exists
+
+# Unresolved violation reports of these types lower the data integrity component
+INTEGRITY_VIOLATION_TYPES = ['PRIVACY_BREACH', 'AUDIT_FAILURE']
 
 
 class TrustScoreEngine:
@@ -30,147 +44,108 @@ class TrustScoreEngine:
         'LOW': (0, 39),           # 0-39
     }
     
+    # Recent activity window for the transparency component
+    RECENT_ACTIVITY_DAYS = 30
+
+    @staticmethod
+    def gather_inputs(organization: Org, inputs: 'TrustInputs' = None) -> 'TrustInputs':
+        """Reuse the computation's shared inputs, or gather them for a standalone component call"""
+        return inputs if inputs is not None else TrustInputs(organization)
+
     @classmethod
-    def calculate_compliance_score(cls, organization: Org) -> float:
+    def calculate_compliance_score(cls, organization: Org, inputs: 'TrustInputs' = None) -> float:
         """Calculate compliance component (0-100)"""
-        from compliance.rules_engine import NDPRRulesEngine
-        
-        # Run compliance checks
-        scan_result = NDPRRulesEngine.run_all_checks(organization)
-        risk_score = scan_result.get('risk_score', 100)
-        
+        risk_score = cls.gather_inputs(organization, inputs).risk_score
+
         # Convert risk score (0-100, higher = worse) to trust score (0-100, higher = better)
         compliance_score = max(0, 100 - risk_score)
         
         return compliance_score
     
     @classmethod
-    def calculate_data_integrity_score(cls, organization: Org) -> float:
+    def calculate_data_integrity_score(cls, organization: Org, inputs: 'TrustInputs' = None) -> float:
         """Calculate data integrity component (0-100)"""
         # Check for data integrity violations
         # This will be enhanced with checksum verification
-        access_requests = AccessRequest.objects.filter(organization=organization)
+        data = cls.gather_inputs(organization, inputs)
         
-        if not access_requests.exists():
+        if data.total_requests == 0:
             return 100  # No data access = perfect integrity
         
-        # Check for missing integrity checks
-        total_requests = access_requests.count()
         # For now, assume all have integrity (will be enhanced with checksums)
         integrity_score = 100
         
-        # Deduct points for violations
-        violations = ViolationReport.objects.filter(
-            organization=organization,
-            violation_type__in=['PRIVACY_BREACH', 'AUDIT_FAILURE'],
-            resolved=False
-        ).count()
-        
-        if violations > 0:
-            integrity_score = max(0, 100 - (violations * 10))
+        # Deduct points for unresolved privacy breach and audit failure reports
+        if data.integrity_violations > 0:
+            integrity_score = max(0, 100 - (data.integrity_violations * 10))
         
         return integrity_score
     
     @classmethod
-    def calculate_consent_respect_score(cls, organization: Org) -> float:
+    def calculate_consent_respect_score(cls, organization: Org, inputs: 'TrustInputs' = None) -> float:
         """Calculate how well organization respects user consent (0-100)"""
-        access_requests = AccessRequest.objects.filter(organization=organization)
-        
-        if not access_requests.exists():
-            return 100
-        
-        total_requests = access_requests.count()
-        approved_requests = access_requests.filter(status='APPROVED')
-        
-        # Check how many approved requests have valid consent
-        valid_consent_count = 0
-        for request in approved_requests:
-            user_consent = UserConsent.objects.filter(
-                user=request.user,
-                consent=request.consent,
-                access=True
-            ).first()
-            if user_consent:
-                valid_consent_count += 1
+        data = cls.gather_inputs(organization, inputs)
+        total_requests = data.total_requests
         
         if total_requests == 0:
             return 100
         
-        # Calculate percentage of requests with valid consent
-        consent_respect_score = (valid_consent_count / total_requests) * 100
+        # Calculate percentage of requests that are approved with valid consent
+        consent_respect_score = (data.approved_with_consent / total_requests) * 100
         
         # Penalize revoked access that was previously approved
-        revoked_after_approval = access_requests.filter(status='REVOKED').count()
-        if revoked_after_approval > 0:
-            penalty = min(20, (revoked_after_approval / total_requests) * 100)
+        if data.revoked_requests > 0:
+            penalty = min(20, (data.revoked_requests / total_requests) * 100)
             consent_respect_score = max(0, consent_respect_score - penalty)
         
         return consent_respect_score
     
     @classmethod
-    def calculate_transparency_score(cls, organization: Org) -> float:
+    def calculate_transparency_score(cls, organization: Org, inputs: 'TrustInputs' = None) -> float:
         """Calculate transparency component (0-100)"""
-        access_requests = AccessRequest.objects.filter(organization=organization)
+        data = cls.gather_inputs(organization, inputs)
+        total = data.total_requests
         
-        if not access_requests.exists():
+        if total == 0:
             return 100
         
-        total = access_requests.count()
-        
-        # Check for requests with clear purposes
-        clear_purposes = access_requests.exclude(
-            purpose__isnull=True
-        ).exclude(
-            purpose=''
-        ).exclude(
-            purpose__in=['general', 'testing', 'other']
-        ).filter(
-            purpose__length__gte=10
-        ).count()
-        
-        # Check for recent activity (shows active transparency)
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        recent_activity = access_requests.filter(
-            requested_at__gte=thirty_days_ago
-        ).count()
-        
-        # Calculate transparency score
-        purpose_score = (clear_purposes / total) * 70 if total > 0 else 0
-        activity_score = min(30, (recent_activity / max(1, total)) * 30)
+        # Requests with clear purposes (classified on save, same definition as PURPOSE_LIMITATION)
+        # and recent activity (shows active transparency)
+        purpose_score = (data.clear_purposes / total) * 70
+        activity_score = min(30, (data.recent_requests / max(1, total)) * 30)
         
         transparency_score = purpose_score + activity_score
         
         return min(100, transparency_score)
     
     @classmethod
-    def calculate_user_satisfaction_score(cls, organization: Org) -> float:
+    def calculate_user_satisfaction_score(cls, organization: Org, inputs: 'TrustInputs' = None) -> float:
         """Calculate user satisfaction component (0-100) - placeholder for future"""
         # This will be implemented with user feedback/ratings
         # For now, return a default score
         return 85.0
     
+    # Component names and their calculators, in COMPONENT_WEIGHTS order
+    COMPONENTS = (
+        ('compliance', 'calculate_compliance_score'),
+        ('data_integrity', 'calculate_data_integrity_score'),
+        ('consent_respect', 'calculate_consent_respect_score'),
+        ('transparency', 'calculate_transparency_score'),
+        ('user_satisfaction', 'calculate_user_satisfaction_score'),
+    )
+
     @classmethod
-    def calculate_trust_score(cls, organization: Org) -> dict:
-        """Calculate overall trust score for an organization"""
-        # Calculate each component
-        compliance_score = cls.calculate_compliance_score(organization)
-        integrity_score = cls.calculate_data_integrity_score(organization)
-        consent_score = cls.calculate_consent_respect_score(organization)
-        transparency_score = cls.calculate_transparency_score(organization)
-        satisfaction_score = cls.calculate_user_satisfaction_score(organization)
-        
-        # Calculate weighted average
-        weights = cls.COMPONENT_WEIGHTS
-        overall_score = (
-            compliance_score * weights['compliance'] +
-            integrity_score * weights['data_integrity'] +
-            consent_score * weights['consent_respect'] +
-            transparency_score * weights['transparency'] +
-            satisfaction_score * weights['user_satisfaction']
-        )
+    def calculate_trust_score(cls, organization: Org, inputs: 'TrustInputs' = None) -> dict:
+        """Calculate overall trust score for an organization from one set of inputs"""
+        inputs = cls.gather_inputs(organization, inputs)
+        components = {
+            name: getattr(cls, method)(organization, inputs)
+            for name, method in cls.COMPONENTS
+        }
         
-        # Round to 2 decimal places
-        overall_score = round(overall_score, 2)
+        # Calculate weighted average, rounded to 2 decimal places
+        weights = cls.COMPONENT_WEIGHTS
+        overall_score = round(sum(components[name] * weights[name] for name in weights), 2)
         
         # Determine trust level
         trust_level = cls.get_trust_level(overall_score)
@@ -178,44 +153,291 @@ class TrustScoreEngine:
         return {
             'overall_score': overall_score,
             'trust_level': trust_level,
-            'components': {
-                'compliance': round(compliance_score, 2),
-                'data_integrity': round(integrity_score, 2),
-                'consent_respect': round(consent_score, 2),
-                'transparency': round(transparency_score, 2),
-                'user_satisfaction': round(satisfaction_score, 2),
-            },
+            'components': {name: round(score, 2) for name, score in components.items()},
             'last_calculated': timezone.now().isoformat(),
         }
     
     @classmethod
     def get_trust_level(cls, score: float) -> str:
-        """Get trust level based on score"""
+        """Get trust level based on score (the highest level whose minimum the score reaches)"""
         for level, (min_score, max_score) in cls.TRUST_LEVELS.items():
-            if min_score <= score <= max_score:
+            if score >= min_score:
                 return level
         return 'LOW'
     
     @classmethod
     def get_organization_ranking(cls, limit: int = 10) -> list:
-        """Get ranked list of organizations by trust score"""
-        organizations = Org.objects.all()
-        rankings = []
-        
-        for org in organizations:
-            trust_data = cls.calculate_trust_score(org)
-            rankings.append({
-                'organization': {
-                    'id': org.id,
-                    'name': org.name,
-                    'email': org.email,
-                },
-                'trust_score': trust_data['overall_score'],
-                'trust_level': trust_data['trust_level'],
-            })
-        
-        # Sort by trust score (descending)
-        rankings.sort(key=lambda x: x['trust_score'], reverse=True)
-        
-        return rankings[:limit]
+        """
+        Ranked organizations from stored scores (one query on the registry index).
+        Scores are kept current by refresh_trust_scores, not computed here.
+        """
+        return cls.get_registry_page(limit=limit)['results']
+
+    # Registry order; also the keyset the cursor encodes
+    REGISTRY_ORDER = ('-trust_score', 'name', 'id')
+
+    @classmethod
+    def get_registry_page(cls, limit: int = 10, cursor: str = None, trust_level: str = None,
+                          certified: bool = None, min_score: float = None, max_score: float = None,
+                          search: str = None) -> dict:
+        """
+        One page of the registry in (-trust_score, name, id) order. The next
+        page starts strictly after the cursor's row (keyset pagination), so
+        every page is an index range scan of `limit` rows however deep it is.
+        """
+        organizations = Org.objects.filter(
+            trust_score__isnull=False,
+            trust_score_last_calculated__isnull=False,
+        )
+        if trust_level:
+            organizations = organizations.filter(trust_level=trust_level)
+        if certified is not None:
+            organizations = organizations.filter(trust_certificate_issued=certified)
+        if min_score is not None:
+            organizations = organizations.filter(trust_score__gte=min_score)
+        if max_score is not None:
+            organizations = organizations.filter(trust_score__lte=max_score)
+        if search:
+            organizations = organizations.filter(name__icontains=search)
+        if cursor:
+            score, name, org_id = decode_registry_cursor(cursor)
+            # The leading range keeps this a single ordered index scan; the OR
+            # only drops ties already shown on earlier pages
+            organizations = organizations.filter(trust_score__lte=score).filter(
+                Q(trust_score__lt=score)
+                | Q(name__gt=name)
+                | Q(name=name, id__gt=org_id)
+            )
+
+        rows = list(organizations.order_by(*cls.REGISTRY_ORDER).values(
+            'id', 'name', 'email', 'trust_score', 'trust_level',
+            'trust_certificate_issued', 'trust_score_last_calculated',
+        )[:limit + 1])
+        page = rows[:limit]
+        last = page[-1] if page else None
+
+        return {
+            'results': [
+                {
+                    'organization': {
+                        'id': org['id'],
+                        'name': org['name'],
+                        'email': org['email'],
+                    },
+                    'trust_score': org['trust_score'],
+                    'trust_level': org['trust_level'],
+                    'certificate_issued': org['trust_certificate_issued'],
+                    'last_calculated': org['trust_score_last_calculated'].isoformat(),
+                }
+                for org in page
+            ],
+            'next_cursor': encode_registry_cursor(last) if len(rows) > limit else None,
+        }
+
+    @classmethod
+    def refresh_trust_scores(cls, organizations=None, stale_after: timedelta = None) -> int:
+        """
+        Recompute and store trust scores, never-scored and oldest first.
+        With stale_after, only scores older than that are refreshed.
+        Returns the number of organizations refreshed.
+        """
+        if organizations is None:
+            organizations = Org.objects.all()
+        if stale_after is not None:
+            organizations = organizations.filter(
+                Q(trust_score_last_calculated__isnull=True)
+                | Q(trust_score_last_calculated__lt=timezone.now() - stale_after)
+            )
+        org_ids = list(organizations.order_by(
+            F('trust_score_last_calculated').asc(nulls_first=True), 'id'
+        ).values_list('id', flat=True))
+        for start in range(0, len(org_ids), cls.BULK_BATCH_SIZE):
+            cls.bulk_update_trust_scores(Org.objects.filter(pk__in=org_ids[start:start + cls.BULK_BATCH_SIZE]))
+        return len(org_ids)
+
+    # -------------------- Bulk Mode --------------------
+
+    # Organizations per grouped query / bulk update
+    BULK_BATCH_SIZE = 2000
+
+    @classmethod
+    def bulk_components(cls, organizations, now=None) -> tuple:
+        """
+        (organization ids, {component name: numpy array}) for many organizations.
+
+        Inputs come from grouped aggregates (plus grouped compliance scans);
+        components are computed as numpy array operations with the same
+        formulas as the calculate_*_score methods.
+        """
+        from compliance.rules_engine import NDPRRulesEngine
+
+        org_ids = list(organizations.order_by('id').values_list('id', flat=True))
+        if not org_ids:
+            return [], {name: np.zeros(0) for name in cls.COMPONENT_WEIGHTS}
+        now = now or timezone.now()
+
+        counts = {
+            row.pop('organization_id'): row
+            for row in AccessRequest.objects.filter(
+                organization_id__in=org_ids
+            ).annotate(
+                has_consent=active_consent_exists(),
+            ).order_by().values('organization_id').annotate(**trust_input_aggregates(now))
+        }
+        integrity = dict(ViolationReport.objects.filter(
+            organization_id__in=org_ids,
+            violation_type__in=INTEGRITY_VIOLATION_TYPES,
+            resolved=False,
+        ).order_by().values('organization_id').annotate(count=Count('pk')).values_list('organization_id', 'count'))
+        scans = NDPRRulesEngine.run_batch_checks(Org.objects.filter(pk__in=org_ids), persist=False)
+
+        def column(field):
+            return np.array([counts.get(org_id, {}).get(field, 0) for org_id in org_ids], dtype=float)
+
+        total = column('total_requests')
+        approved_with_consent = column('approved_with_consent')
+        revoked = column('revoked_requests')
+        clear = column('clear_purposes')
+        recent = column('recent_requests')
+        violations = np.array([integrity.get(org_id, 0) for org_id in org_ids], dtype=float)
+        risk = np.array([scans[org_id].get('risk_score', 100) for org_id in org_ids], dtype=float)
+
+        has_requests = total > 0
+        safe_total = np.where(has_requests, total, 1)
+
+        compliance = np.maximum(0, 100 - risk)
+        data_integrity = np.where(has_requests & (violations > 0), np.maximum(0, 100 - violations * 10), 100)
+        consent_ratio = approved_with_consent / safe_total * 100
+        penalty = np.where(revoked > 0, np.minimum(20, revoked / safe_total * 100), 0)
+        consent_respect = np.where(has_requests, np.maximum(0, consent_ratio - penalty), 100)
+        transparency = np.where(
+            has_requests,
+            np.minimum(100, clear / safe_total * 70 + np.minimum(30, recent / np.maximum(1, total) * 30)),
+            100,
+        )
+        satisfaction = np.full(len(org_ids), cls.calculate_user_satisfaction_score(None))
+
+        return org_ids, {
+            'compliance': compliance,
+            'data_integrity': data_integrity,
+            'consent_respect': consent_respect,
+            'transparency': transparency,
+            'user_satisfaction': satisfaction,
+        }
+
+    @classmethod
+    def bulk_calculate_trust_scores(cls, organizations) -> dict:
+        """Trust data for many organizations at once (same values as calculate_trust_score), keyed by organization id"""
+        now = timezone.now()
+        org_ids, components = cls.bulk_components(organizations, now)
+        weighted = np.zeros(len(org_ids))
+        for name, weight in cls.COMPONENT_WEIGHTS.items():
+            weighted = weighted + components[name] * weight
+
+        calculated = now.isoformat()
+        rows = {name: values.tolist() for name, values in components.items()}
+        results = {}
+        for i, (org_id, score) in enumerate(zip(org_ids, weighted.tolist())):
+            overall_score = round(score, 2)
+            results[org_id] = {
+                'overall_score': overall_score,
+                'trust_level': cls.get_trust_level(overall_score),
+                'components': {name: round(values[i], 2) for name, values in rows.items()},
+                'last_calculated': calculated,
+            }
+        return results
+
+    @classmethod
+    def bulk_update_trust_scores(cls, organizations) -> dict:
+        """Compute trust data for many organizations and store it with one bulk UPDATE"""
+        results = cls.bulk_calculate_trust_scores(organizations)
+        now = timezone.now()
+        with transaction.atomic():
+            # Previous scores are read under the lock held until the histogram is updated
+            orgs = list(Org.objects.select_for_update().filter(pk__in=list(results)).order_by('pk').only(
+                'id', 'trust_score', 'trust_score_last_calculated', 'trust_certificate_issued', 'trust_certificate_issued_at',
+            ))
+            recalculations = []
+            for org in orgs:
+                recalculations.append((org.id, org.stored_trust_score(), results[org.id]))
+                org.update_trust_fields(results[org.id], now)
+            Org.objects.bulk_update(orgs, TRUST_FIELDS, batch_size=cls.BULK_BATCH_SIZE)
+            record_recalculations(recalculations, now)
+        return results
+
+
+def encode_registry_cursor(org: dict) -> str:
+    """Opaque cursor for the registry row after which the next page starts"""
+    key = json.dumps([org['trust_score'], org['name'], org['id']])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_registry_cursor(cursor: str) -> tuple:
+    """(trust score, name, id) from a cursor; ValueError if it was not issued by the registry"""
+    try:
+        score, name, org_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), str(name), int(org_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError('Invalid registry cursor') from e
+
+
+def trust_input_aggregates(now) -> dict:
+    """Aggregates over access requests annotated with has_consent, per organization"""
+    recent_cutoff = now - timedelta(days=TrustScoreEngine.RECENT_ACTIVITY_DAYS)
+    return {
+        **counter_aggregates(),
+        'recent_requests': Count('pk', filter=Q(requested_at__gte=recent_cutoff)),
+    }
+
+
+def _count_subquery(queryset):
+    """Correlated per-organization count of `queryset` (filtered on organization=OuterRef('organization'))"""
+    return Coalesce(Subquery(
+        queryset.order_by().values('organization').annotate(count=Count('pk')).values('count'),
+        output_field=IntegerField(),
+    ), Value(0))
+
+
+class TrustInputs:
+    """
+    Every input the trust components need for one organization: its
+    maintained counters row, read in one query together with the recent
+    request and open integrity violation counts, and the (cached)
+    compliance risk score, loaded only when the compliance component asks.
+    """
+
+    def __init__(self, organization: Org, now=None):
+        self.organization = organization
+        now = now or timezone.now()
+
+        counters = self.read_counters(organization, now)
+        if counters is None:
+            reconcile([organization.id])
+            counters = self.read_counters(organization, now)
+        self.total_requests = counters['total_requests']
+        self.approved_with_consent = counters['approved_with_consent']
+        self.revoked_requests = counters['revoked_requests']
+        self.clear_purposes = counters['clear_purposes']
+        self.recent_requests = counters['recent_requests']
+        self.integrity_violations = counters['integrity_violations'] if self.total_requests else 0
+
+    @cached_property
+    def risk_score(self):
+        from compliance.rules_engine import NDPRRulesEngine
+        return NDPRRulesEngine.get_scan_result(self.organization).get('risk_score', 100)
 
+    @staticmethod
+    def read_counters(organization: Org, now):
+        """The organization's counters plus its windowed counts, or None before the first reconcile"""
+        recent_cutoff = now - timedelta(days=TrustScoreEngine.RECENT_ACTIVITY_DAYS)
+        return TrustComponentCounters.objects.filter(organization=organization).annotate(
+            recent_requests=_count_subquery(AccessRequest.objects.filter(
+                organization=OuterRef('organization'),
+                requested_at__gte=recent_cutoff,
+            )),
+            integrity_violations=_count_subquery(ViolationReport.objects.filter(
+                organization=OuterRef('organization'),
+                violation_type__in=INTEGRITY_VIOLATION_TYPES,
+                resolved=False,
+            )),
+        ).values(*COUNTER_FIELDS, 'recent_requests', 'integrity_violations').first()
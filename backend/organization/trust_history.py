@@ -0,0 +1,177 @@
+"""
+Trust score history, rank histogram and level distribution over time
+Every recalculation appends TrustScoreHistory rows, moves each organization
+between TrustScoreBucket rows (one per score point) and rewrites the day's
+TrustLevelSnapshot. Rank and percentile then come from summing at most 101
+bucket counts plus an index count inside one bucket, instead of sorting
+every organization. Writes that bypass update_trust_score are corrected by
+`rebuild_buckets`; history past TRUST_SCORE_HISTORY_RETENTION is dropped by
+`prune_trust_history`.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from django.db.models.functions import Floor, Least
+from django.utils import timezone
+from .models import Org, TrustLevelSnapshot, TrustScoreBucket, TrustScoreHistory
+
+# Bucket b holds scores in [b, b + 1); bucket 100 holds exactly 100
+BUCKETS = 101
+
+DEFAULT_RETENTION = timedelta(days=365)
+
+
+def bucket_of(score: float) -> int:
+    return min(max(int(score // 1), 0), BUCKETS - 1)
+
+
+def scored_organizations():
+    return Org.objects.filter(trust_score__isnull=False, trust_score_last_calculated__isnull=False)
+
+
+def record_recalculations(recalculations: list, at=None):
+    """
+    Record stored scores. `recalculations` holds (organization id, previous
+    stored score or None, trust data) for organizations just saved.
+    """
+    if not recalculations:
+        return
+    at = at or timezone.now()
+    TrustScoreHistory.objects.bulk_create([
+        TrustScoreHistory(
+            organization_id=org_id,
+            trust_score=trust_data['overall_score'],
+            trust_level=trust_data['trust_level'],
+            recorded_at=at,
+        )
+        for org_id, _, trust_data in recalculations
+    ], batch_size=2000)
+
+    deltas = {}
+    for _, previous_score, trust_data in recalculations:
+        if previous_score is not None:
+            deltas[bucket_of(previous_score)] = deltas.get(bucket_of(previous_score), 0) - 1
+        new_bucket = bucket_of(trust_data['overall_score'])
+        deltas[new_bucket] = deltas.get(new_bucket, 0) + 1
+    apply_bucket_deltas(deltas)
+    snapshot_levels(timezone.localdate(at))
+
+
+def apply_bucket_deltas(deltas: dict):
+    """Adjust bucket counts in one UPDATE; rebuilds the histogram if its rows are missing"""
+    deltas = {bucket: delta for bucket, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updated = TrustScoreBucket.objects.filter(bucket__in=list(deltas)).update(organizations=F('organizations') + Case(
+        *[When(bucket=bucket, then=Value(delta)) for bucket, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+    if updated < len(deltas):
+        rebuild_buckets()
+
+
+def rebuild_buckets() -> list:
+    """Recount the histogram from stored scores (one grouped query); returns the counts"""
+    counts = [0] * BUCKETS
+    rows = scored_organizations().annotate(
+        bucket=Least(Floor('trust_score'), Value(BUCKETS - 1), output_field=IntegerField()),
+    ).order_by().values('bucket').annotate(organizations=Count('pk')).values_list('bucket', 'organizations')
+    for bucket, organizations in rows:
+        counts[bucket_of(bucket)] += organizations
+    with transaction.atomic():
+        TrustScoreBucket.objects.bulk_create(
+            [TrustScoreBucket(bucket=bucket, organizations=organizations) for bucket, organizations in enumerate(counts)],
+            update_conflicts=True,
+            unique_fields=['bucket'],
+            update_fields=['organizations'],
+        )
+    return counts
+
+
+def bucket_counts() -> list:
+    """Organizations per score bucket, indexed by bucket"""
+    counts = dict(TrustScoreBucket.objects.values_list('bucket', 'organizations'))
+    if len(counts) < BUCKETS:
+        return rebuild_buckets()
+    return [counts[bucket] for bucket in range(BUCKETS)]
+
+
+def level_counts(counts: list) -> dict:
+    """Organizations per trust level; level minimums are whole points, so every bucket maps to one level"""
+    from .trust_engine import TrustScoreEngine
+
+    levels = dict.fromkeys(TrustScoreEngine.TRUST_LEVELS, 0)
+    for bucket, organizations in enumerate(counts):
+        levels[TrustScoreEngine.get_trust_level(bucket)] += organizations
+    return levels
+
+
+def snapshot_levels(day, counts: list = None):
+    """Store the current level distribution as the given day's snapshot"""
+    levels = level_counts(counts if counts is not None else bucket_counts())
+    TrustLevelSnapshot.objects.bulk_create(
+        [TrustLevelSnapshot(day=day, trust_level=level, organizations=organizations) for level, organizations in levels.items()],
+        update_conflicts=True,
+        unique_fields=['day', 'trust_level'],
+        update_fields=['organizations'],
+    )
+
+
+def rank(organization: Org):
+    """
+    {'rank', 'percentile', 'total'} for a scored organization, or None.
+    Rank counts organizations with a strictly higher score (ties share a
+    rank); percentile is the share of organizations scoring at or below it.
+    """
+    score = organization.stored_trust_score()
+    if score is None:
+        return None
+    counts = bucket_counts()
+    bucket = bucket_of(score)
+    above = sum(counts[bucket + 1:])
+    if bucket < BUCKETS - 1:
+        above += scored_organizations().filter(trust_score__gt=score, trust_score__lt=bucket + 1).count()
+    total = sum(counts)
+    return {
+        'rank': above + 1,
+        'percentile': round((total - above) / total * 100, 2) if total else 100.0,
+        'total': total,
+    }
+
+
+def score_history(organization: Org, since) -> list:
+    """The organization's stored scores since a time, oldest first"""
+    return [
+        {'trust_score': score, 'trust_level': level, 'recorded_at': recorded_at.isoformat()}
+        for score, level, recorded_at in TrustScoreHistory.objects.filter(
+            organization=organization, recorded_at__gte=since,
+        ).order_by('recorded_at').values_list('trust_score', 'trust_level', 'recorded_at')
+    ]
+
+
+def level_distribution(since_day) -> list:
+    """Daily organizations per level since a day, oldest first"""
+    days = {}
+    for day, level, organizations in TrustLevelSnapshot.objects.filter(day__gte=since_day).values_list(
+        'day', 'trust_level', 'organizations'
+    ):
+        days.setdefault(day, {})[level] = organizations
+    return [{'day': day.isoformat(), 'levels': levels} for day, levels in sorted(days.items())]
+
+
+def retention():
+    """How long score history and level snapshots are kept; None keeps them forever"""
+    return getattr(settings, 'TRUST_SCORE_HISTORY_RETENTION', DEFAULT_RETENTION)
+
+
+def prune(now=None) -> dict:
+    """Delete history rows and level snapshots older than the retention; returns rows deleted per model"""
+    keep = retention()
+    if keep is None:
+        return {'history': 0, 'snapshots': 0}
+    cutoff = (now or timezone.now()) - keep
+    history, _ = TrustScoreHistory.objects.filter(recorded_at__lt=cutoff).delete()
+    snapshots, _ = TrustLevelSnapshot.objects.filter(day__lt=timezone.localdate(cutoff)).delete()
+    return {'history': history, 'snapshots': snapshots}
@@ -0,0 +1,54 @@
+"""
+Stale-while-revalidate refresh of stored trust scores
+Public reads are served from the score stored on Org. A score older than
+TRUST_SCORE_TTL (or never calculated) is due: the `trust` process
+(`refresh_trust_scores --interval`) refreshes due organizations, never-scored
+first, so web requests never compute a score. Without that process
+(TRUST_REFRESH_ASYNC=False) the reader refreshes inline, once per
+organization per lock window thanks to a cache.add lock.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import Org
+
+# Longest an inline refresh may hold its lock; a crashed refresh is retried after this
+REFRESH_LOCK_TIMEOUT = 300
+
+
+def _lock_key(org_id) -> str:
+    return f'trust:refresh:{org_id}'
+
+
+def is_stale(organization: Org, now=None) -> bool:
+    """Whether the stored score is missing or older than TRUST_SCORE_TTL"""
+    if organization.trust_score_last_calculated is None:
+        return True
+    ttl = timedelta(seconds=getattr(settings, 'TRUST_SCORE_TTL', 3600))
+    return organization.trust_score_last_calculated < (now or timezone.now()) - ttl
+
+
+def refresh(org_id):
+    """Recompute and store one organization's score, then release its lock"""
+    try:
+        organization = Org.objects.filter(pk=org_id).first()
+        if organization is not None:
+            organization.update_trust_score()
+    finally:
+        cache.delete(_lock_key(org_id))
+
+
+def schedule_refresh(organization: Org) -> bool:
+    """
+    Make sure a due score gets refreshed; returns whether this call refreshed
+    it. With TRUST_REFRESH_ASYNC (the default) the trust process already
+    picks up every due organization, so this costs nothing. Otherwise the
+    refresh runs inline unless one is already running for the organization.
+    """
+    if getattr(settings, 'TRUST_REFRESH_ASYNC', True):
+        return False
+    if not cache.add(_lock_key(organization.id), True, timeout=REFRESH_LOCK_TIMEOUT):
+        return False
+    refresh(organization.id)
+    return True
@@ -0,0 +1,156 @@
+"""
+What-if simulation of trust weights and level thresholds
+The component matrix (organizations x components) is loaded once with the
+bulk trust path and cached; every scenario is then one column of a matrix
+product, so hundreds of weightings are ranked and levelled together
+without recomputing any organization.
+"""
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from .models import Org
+from .trust_engine import TrustScoreEngine
+
+MATRIX_CACHE_KEY = 'trust:simulation-matrix'
+MAX_SCENARIOS = 500
+
+# Components in matrix column order
+COMPONENTS = tuple(TrustScoreEngine.COMPONENT_WEIGHTS)
+# Levels from lowest to highest minimum score
+LEVELS = tuple(sorted(TrustScoreEngine.TRUST_LEVELS, key=lambda level: TrustScoreEngine.TRUST_LEVELS[level][0]))
+
+
+def component_matrix(refresh: bool = False) -> tuple:
+    """(organization ids, matrix) for all organizations, cached for TRUST_SIMULATION_CACHE_TTL seconds"""
+    cached = None if refresh else cache.get(MATRIX_CACHE_KEY)
+    if cached is not None:
+        return cached
+
+    all_ids = list(Org.objects.order_by('id').values_list('id', flat=True))
+    org_ids, blocks = [], []
+    for start in range(0, len(all_ids), TrustScoreEngine.BULK_BATCH_SIZE):
+        batch_ids, components = TrustScoreEngine.bulk_components(
+            Org.objects.filter(pk__in=all_ids[start:start + TrustScoreEngine.BULK_BATCH_SIZE])
+        )
+        org_ids.extend(batch_ids)
+        blocks.append(np.column_stack([components[name] for name in COMPONENTS]))
+    matrix = np.vstack(blocks) if blocks else np.zeros((0, len(COMPONENTS)))
+
+    cache.set(MATRIX_CACHE_KEY, (org_ids, matrix), timeout=getattr(settings, 'TRUST_SIMULATION_CACHE_TTL', 300))
+    return org_ids, matrix
+
+
+def scenario_arrays(scenarios: list) -> tuple:
+    """
+    Validate scenarios and stack them into a weight matrix (components x
+    scenarios) and a threshold matrix (levels x scenarios). Unspecified
+    weights and level minimums keep their current values.
+    """
+    if not scenarios:
+        raise ValueError('At least one scenario is required')
+    if len(scenarios) > MAX_SCENARIOS:
+        raise ValueError(f'At most {MAX_SCENARIOS} scenarios are allowed')
+
+    weights = np.empty((len(COMPONENTS), len(scenarios)))
+    thresholds = np.empty((len(LEVELS), len(scenarios)))
+    for column, scenario in enumerate(scenarios):
+        scenario_weights = {**TrustScoreEngine.COMPONENT_WEIGHTS, **scenario.get('weights', {})}
+        scenario_levels = {
+            **{level: minimum for level, (minimum, _) in TrustScoreEngine.TRUST_LEVELS.items()},
+            **scenario.get('levels', {}),
+        }
+        unknown = (set(scenario_weights) - set(COMPONENTS)) | (set(scenario_levels) - set(LEVELS))
+        if unknown:
+            raise ValueError(f'Unknown components or levels: {", ".join(sorted(unknown))}')
+        try:
+            weights[:, column] = [float(scenario_weights[name]) for name in COMPONENTS]
+            thresholds[:, column] = [float(scenario_levels[level]) for level in LEVELS]
+        except (TypeError, ValueError):
+            raise ValueError('Weights and level minimums must be numbers')
+        if not (np.isfinite(weights[:, column]).all() and np.isfinite(thresholds[:, column]).all()):
+            raise ValueError('Weights and level minimums must be finite numbers')
+        if (weights[:, column] < 0).any():
+            raise ValueError('Weights must not be negative')
+        if (np.diff(thresholds[:, column]) < 0).any():
+            raise ValueError('Level minimums must increase from LOW to EXCELLENT')
+    return weights, thresholds
+
+
+def _levels(scores: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+    """Level index per score (organizations x scenarios): the highest level whose minimum the score reaches"""
+    reached = scores[None, :, :] >= thresholds[:, None, :]
+    return np.maximum(reached.sum(axis=0) - 1, 0)
+
+
+def _ranks(scores: np.ndarray) -> np.ndarray:
+    """1-based rank per score, highest first; ties keep organization id order"""
+    order = np.argsort(-scores, axis=0, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(1, scores.shape[0] + 1)[:, None], axis=0)
+    return ranks
+
+
+def simulate(scenarios: list, limit: int = 10) -> dict:
+    """Rankings and trust-level shifts of each scenario against the current weights and thresholds"""
+    weights, thresholds = scenario_arrays(scenarios)
+    org_ids, matrix = component_matrix()
+
+    baseline_weights, baseline_thresholds = scenario_arrays([{}])
+    all_weights = np.hstack([baseline_weights, weights])
+    all_thresholds = np.hstack([baseline_thresholds, thresholds])
+
+    # Stored scores are rounded to 2 dp before levelling; do the same so the baseline matches them
+    scores = np.round(matrix @ all_weights, 2)
+    levels = _levels(scores, all_thresholds)
+    ranks = _ranks(scores)
+    level_shift = levels[:, 1:] - levels[:, :1]
+    rank_shift = ranks[:, :1] - ranks[:, 1:]  # positive = moved up
+
+    top = np.argsort(-scores, axis=0, kind='stable')[:limit]
+    names = dict(Org.objects.filter(pk__in=[org_ids[i] for i in np.unique(top)]).values_list('id', 'name'))
+
+    def level_counts(column):
+        counts = np.bincount(levels[:, column], minlength=len(LEVELS))
+        return {LEVELS[index]: int(count) for index, count in enumerate(counts)}
+
+    def ranking(column):
+        return [
+            {
+                'organization': {'id': org_ids[i], 'name': names.get(org_ids[i])},
+                'trust_score': round(float(scores[i, column]), 2),
+                'trust_level': LEVELS[levels[i, column]],
+                'rank': int(ranks[i, column]),
+                'baseline_rank': int(ranks[i, 0]),
+            }
+            for i in top[:, column]
+        ]
+
+    results = []
+    for index, scenario in enumerate(scenarios):
+        column = index + 1
+        results.append({
+            'name': scenario.get('name', f'scenario-{column}'),
+            'weights': dict(zip(COMPONENTS, weights[:, index].tolist())),
+            'levels': dict(zip(LEVELS, thresholds[:, index].tolist())),
+            'level_counts': level_counts(column),
+            'level_changes': {
+                'upgraded': int((level_shift[:, index] > 0).sum()),
+                'downgraded': int((level_shift[:, index] < 0).sum()),
+            },
+            'rank_changes': {
+                'moved': int((rank_shift[:, index] != 0).sum()),
+                'mean_absolute_shift': round(float(np.abs(rank_shift[:, index]).mean()), 2) if org_ids else 0,
+                'max_absolute_shift': int(np.abs(rank_shift[:, index]).max()) if org_ids else 0,
+            },
+            'ranking': ranking(column),
+        })
+
+    return {
+        'organizations': len(org_ids),
+        'baseline': {
+            'weights': dict(TrustScoreEngine.COMPONENT_WEIGHTS),
+            'level_counts': level_counts(0),
+            'ranking': ranking(0),
+        },
+        'scenarios': results,
+    }
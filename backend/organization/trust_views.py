@@ -5,10 +5,16 @@ Public and authenticated endpoints for accessing organization trust scores
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from datetime import timedelta
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from .models import Org
 from .trust_engine import TrustScoreEngine
+from .trust_simulation import component_matrix, simulate
+from .trust_refresh import is_stale, schedule_refresh
+from . import trust_history
 from .integrity import DataIntegrityChecker
 from .serializers import OrganizationSerializer
 from django.db.models import Q
@@ -19,19 +25,43 @@ class TrustRegistryView(APIView):
     permission_classes = [AllowAny]  # Public access
     
     def get(self, request):
-        """Get ranked list of organizations by trust score"""
+        """
+        Get ranked organizations by trust score, one page at a time.
+        Filters: trust_level, certified (true/false), min_score, max_score, search;
+        pass the response's next_cursor as `cursor` for the following page.
+        """
         try:
-            limit = int(request.query_params.get('limit', 10))
-            limit = min(limit, 100)  # Cap at 100
+            params = request.query_params
+            limit = int(params.get('limit', 10))
+            limit = max(1, min(limit, 100))  # Cap at 100 per page
             
-            # Get rankings
-            rankings = TrustScoreEngine.get_organization_ranking(limit=limit)
+            trust_level = params.get('trust_level')
+            if trust_level and trust_level not in TrustScoreEngine.TRUST_LEVELS:
+                raise ValueError(f'Unknown trust level: {trust_level}')
+            certified = params.get('certified')
+            if certified is not None:
+                certified = certified.lower() in ('1', 'true', 'yes')
+            
+            page = TrustScoreEngine.get_registry_page(
+                limit=limit,
+                cursor=params.get('cursor'),
+                trust_level=trust_level,
+                certified=certified,
+                min_score=float(params['min_score']) if params.get('min_score') else None,
+                max_score=float(params['max_score']) if params.get('max_score') else None,
+                search=params.get('search', '').strip() or None,
+            )
             
             return Response({
-                'count': len(rankings),
-                'results': rankings,
+                'count': len(page['results']),
+                'results': page['results'],
+                'next_cursor': page['next_cursor'],
             }, status=status.HTTP_200_OK)
             
+        except ValueError as e:
+            return Response({
+                'error': f'Invalid registry query: {str(e)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({
                 'error': f'Failed to retrieve trust registry: {str(e)}'
@@ -57,11 +87,18 @@ class OrganizationTrustScoreView(APIView):
                         'error': 'Organization ID or name required'
                     }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Calculate trust score
-            trust_data = TrustScoreEngine.calculate_trust_score(organization)
-            
-            # Update stored score
-            organization.update_trust_score()
+            # Serve the stored score (None until first calculated); stale scores are
+            # refreshed by the trust process, so anonymous traffic never computes or writes
+            stale = is_stale(organization)
+            if stale:
+                schedule_refresh(organization)
+            calculated = organization.trust_score_last_calculated
+            trust_data = {
+                'overall_score': organization.trust_score if calculated else None,
+                'trust_level': organization.trust_level if calculated else None,
+                'components': organization.trust_components if calculated else None,
+                'last_calculated': calculated.isoformat() if calculated else None,
+            }
             
             return Response({
                 'organization': {
@@ -70,6 +107,7 @@ class OrganizationTrustScoreView(APIView):
                     'email': organization.email,
                     'website': organization.website,
                 },
+                'stale': stale,
                 'trust_score': trust_data['overall_score'],
                 'trust_level': trust_data['trust_level'],
                 'components': trust_data['components'],
@@ -100,15 +138,21 @@ class OrganizationTrustScoreDetailView(APIView):
             
             organization = get_object_or_404(Org, user=request.user)
             
-            # Calculate trust score
-            trust_data = TrustScoreEngine.calculate_trust_score(organization)
+            # Recalculate only once the stored score is older than TRUST_SCORE_TTL, so
+            # reloading the dashboard doesn't append a history row every time
+            if is_stale(organization):
+                trust_data = organization.update_trust_score()
+            else:
+                trust_data = {
+                    'overall_score': organization.trust_score,
+                    'trust_level': organization.trust_level,
+                    'components': organization.trust_components,
+                    'last_calculated': organization.trust_score_last_calculated.isoformat(),
+                }
             
             # Get integrity check
             integrity_data = DataIntegrityChecker.verify_organization_data_integrity(organization)
             
-            # Update stored score
-            organization.update_trust_score()
-            
             return Response({
                 'organization': {
                     'id': organization.id,
@@ -155,3 +199,89 @@ class DataIntegrityView(APIView):
                 'error': f'Failed to verify data integrity: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+
+class TrustSimulationView(APIView):
+    """Staff-only what-if simulation of trust weights and level thresholds"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    
+    def post(self, request):
+        """
+        Rank all organizations under each scenario, e.g.
+        {"scenarios": [{"name": "consent-heavy", "weights": {"consent_respect": 0.4, "compliance": 0.2}}], "limit": 10}
+        """
+        try:
+            scenarios = request.data.get('scenarios', [])
+            limit = max(1, min(int(request.data.get('limit', 10)), 100))
+            if request.data.get('refresh'):
+                component_matrix(refresh=True)
+            return Response(simulate(scenarios, limit=limit), status=status.HTTP_200_OK)
+            
+        except (ValueError, TypeError, AttributeError) as e:
+            return Response({
+                'error': f'Invalid scenarios: {str(e)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                'error': f'Failed to run trust simulation: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class OrganizationTrustHistoryView(APIView):
+    """Trust score history, rank and percentile of an organization (public)"""
+    permission_classes = [AllowAny]
+    
+    def get(self, request, org_id):
+        """Get stored scores over the last `days` days (default 90) with the current rank"""
+        try:
+            organization = get_object_or_404(Org, pk=org_id)
+            days = max(1, min(int(request.query_params.get('days', 90)), 3650))
+            since = timezone.now() - timedelta(days=days)
+            
+            return Response({
+                'organization': {
+                    'id': organization.id,
+                    'name': organization.name,
+                },
+                'trust_score': organization.stored_trust_score(),
+                'ranking': trust_history.rank(organization),
+                'history': trust_history.score_history(organization, since),
+            }, status=status.HTTP_200_OK)
+            
+        except Http404:
+            return Response({
+                'error': 'Organization not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'error': f'Invalid history query: {str(e)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                'error': f'Failed to retrieve trust history: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class TrustLevelDistributionView(APIView):
+    """Organizations per trust level, now and per day over time (public)"""
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        """Get the current level counts and daily snapshots over the last `days` days (default 90)"""
+        try:
+            days = max(1, min(int(request.query_params.get('days', 90)), 3650))
+            since_day = timezone.localdate() - timedelta(days=days)
+            
+            return Response({
+                'current': trust_history.level_counts(trust_history.bucket_counts()),
+                'history': trust_history.level_distribution(since_day),
+            }, status=status.HTTP_200_OK)
+            
+        except ValueError as e:
+            return Response({
+                'error': f'Invalid distribution query: {str(e)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                'error': f'Failed to retrieve trust level distribution: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,6 +1,9 @@
 from django.urls import path 
 from .views import ConsentRequestView, RequestedConsentView, ConsentRevocationView, OrganizationAccessLog, OrganizationDetailView
-from .trust_views import TrustRegistryView, OrganizationTrustScoreView, OrganizationTrustScoreDetailView, DataIntegrityView
+from .trust_views import (
+    TrustRegistryView, OrganizationTrustScoreView, OrganizationTrustScoreDetailView, DataIntegrityView, TrustSimulationView,
+    OrganizationTrustHistoryView, TrustLevelDistributionView,
+)
 from .report_views import PublicTransparencyReportView
 #
 urlpatterns = [
@@ -13,7 +16,10 @@ urlpatterns = [
     path('trust/registry/', TrustRegistryView.as_view(), name='trust-registry'),
     path('trust/score/', OrganizationTrustScoreDetailView.as_view(), name='organization-trust-score'),
     path('trust/score/<int:org_id>/', OrganizationTrustScoreView.as_view(), name='organization-trust-score-detail'),
+    path('trust/score/<int:org_id>/history/', OrganizationTrustHistoryView.as_view(), name='organization-trust-history'),
+    path('trust/levels/', TrustLevelDistributionView.as_view(), name='trust-level-distribution'),
     path('trust/integrity/', DataIntegrityView.as_view(), name='data-integrity'),
+    path('trust/simulate/', TrustSimulationView.as_view(), name='trust-simulation'),
     # Transparency Reports
     path('reports/transparency/', PublicTransparencyReportView.as_view(), name='transparency-report'),
 ]
@@ -87,6 +87,19 @@ DATABASES = {
     )
 }
 
+# --------------------------------------------------
+# CACHE (Redis when REDIS_URL is set, per-process memory otherwise)
+# --------------------------------------------------
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+        }
+    }
+
 # --------------------------------------------------
 # AUTHENTICATION / USERS
 # --------------------------------------------------
@@ -180,3 +193,53 @@ SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+
+
+# --------------------------------------------------
+# COMPLIANCE ENGINE
+# --------------------------------------------------
+# Extra NDPR rules as declarative specs (see compliance/rule_dsl.py)
+COMPLIANCE_DECLARATIVE_RULES = []
+
+# Record per-rule timing and query counts on every scan (always available via ?instrument=1)
+COMPLIANCE_INSTRUMENT_SCANS = config('COMPLIANCE_INSTRUMENT_SCANS', cast=bool, default=False)
+
+# Per-rule limits flagged in rule_stats and logged when exceeded, e.g.
+# {'CONSENT_VALIDITY': {'queries': 1, 'wall_ms': 250}}
+COMPLIANCE_RULE_BUDGETS = {}
+
+# POST /api/compliance/scan/ queues a job for `manage.py run_compliance_worker`;
+# set False to run scans inside the request when no worker process is deployed
+COMPLIANCE_SCAN_ASYNC = config('COMPLIANCE_SCAN_ASYNC', cast=bool, default=True)
+
+# Organizations with at least this many access requests are scanned in streamed chunks
+# (bounded memory, no per-violation list in the result); None always loads the full snapshot
+COMPLIANCE_STREAM_THRESHOLD = config('COMPLIANCE_STREAM_THRESHOLD', cast=int, default=50000)
+
+# Succeeded and failed scan jobs older than this are deleted by the worker (None keeps them)
+COMPLIANCE_SCAN_JOB_RETENTION = timedelta(days=config('COMPLIANCE_SCAN_JOB_RETENTION_DAYS', cast=int, default=7))
+
+# Overrides for how long risk history is kept per resolution (see compliance/risk_history.py),
+# e.g. {'RAW': timedelta(days=14)}; prune with `manage.py prune_risk_history`
+COMPLIANCE_RISK_HISTORY_RETENTION = {}
+
+# Purposes stored as VAGUE on AccessRequest; run `manage.py reclassify_purposes` after changing these
+PURPOSE_VAGUE_TERMS = ['general', 'testing', 'research', 'other', '']
+PURPOSE_MIN_LENGTH = 10
+
+# Cached scan results and dashboards are keyed by each organization's data version;
+# the TTL bounds staleness of time-window rules (retention, excessive requests)
+COMPLIANCE_SCAN_CACHE_TTL = config('COMPLIANCE_SCAN_CACHE_TTL', cast=int, default=3600)
+
+# Seconds the trust what-if simulation reuses its organizations x components matrix
+TRUST_SIMULATION_CACHE_TTL = config('TRUST_SIMULATION_CACHE_TTL', cast=int, default=300)
+
+# Public trust score reads serve the stored score; once it is older than TRUST_SCORE_TTL
+# seconds the `trust` process (refresh_trust_scores, see Procfile) refreshes it.
+# Set TRUST_REFRESH_ASYNC=False when no trust process runs to refresh inline instead
+TRUST_SCORE_TTL = config('TRUST_SCORE_TTL', cast=int, default=3600)
+TRUST_REFRESH_ASYNC = config('TRUST_REFRESH_ASYNC', cast=bool, default=True)
+
+# How long trust score history and daily level snapshots are kept (None keeps them);
+# prune with `manage.py prune_trust_history`
+TRUST_SCORE_HISTORY_RETENTION = timedelta(days=config('TRUST_SCORE_HISTORY_RETENTION_DAYS', cast=int, default=365))
@@ -33,6 +33,19 @@ export interface ComplianceScanResult {
   audit_records?: ComplianceAudit[]
 }
 
+export interface ComplianceScanJob {
+  id: number
+  status: "QUEUED" | "RUNNING" | "SUCCEEDED" | "FAILED"
+  created_at: string
+  started_at?: string | null
+  finished_at?: string | null
+  result: ComplianceScanResult | null
+  error: string
+}
+
+const SCAN_POLL_INTERVAL_MS = 2000
+const SCAN_POLL_TIMEOUT_MS = 10 * 60 * 1000
+
 export interface ComplianceReport {
   organization: {
     id: number
@@ -56,10 +69,33 @@ export interface ComplianceReport {
 
 export class ComplianceAPI {
   /**
-   * Run compliance scan for organization
-   * POST /api/compliance/scan/
+   * Run compliance scan for organization: queue it, then poll until it finishes
+   * POST /api/compliance/scan/ + GET /api/compliance/scan/jobs/<job_id>/
    */
   static async runScan(): Promise<{ message: string; data: ComplianceScanResult }> {
+    const queued = await ComplianceAPI.queueScan()
+    let job = queued.data
+    const deadline = Date.now() + SCAN_POLL_TIMEOUT_MS
+
+    while (job.status === "QUEUED" || job.status === "RUNNING") {
+      if (Date.now() > deadline) {
+        throw new Error("Compliance scan is taking longer than expected. Please check back later.")
+      }
+      await new Promise((resolve) => setTimeout(resolve, SCAN_POLL_INTERVAL_MS))
+      job = await ComplianceAPI.getScanJob(job.id)
+    }
+
+    if (job.status === "FAILED" || !job.result) {
+      throw new Error(job.error || "Compliance scan failed")
+    }
+    return { message: "Compliance scan completed", data: job.result }
+  }
+
+  /**
+   * Queue a compliance scan (returns immediately with the job)
+   * POST /api/compliance/scan/
+   */
+  static async queueScan(): Promise<{ message: string; data: ComplianceScanJob }> {
     try {
       const response = await fetch(`${API_BASE_URL}/compliance/scan/`, {
         method: "POST",
@@ -102,6 +138,48 @@ export class ComplianceAPI {
     }
   }
 
+  /**
+   * Get the status (and, once finished, the result) of a queued scan
+   * GET /api/compliance/scan/jobs/<job_id>/
+   */
+  static async getScanJob(jobId: number): Promise<ComplianceScanJob> {
+    try {
+      const response = await fetch(`${API_BASE_URL}/compliance/scan/jobs/${jobId}/`, {
+        method: "GET",
+        headers: getApiHeaders(),
+        credentials: "include",
+      })
+
+      if (!response.ok) {
+        if (response.status === 401) {
+          await ApiInterceptor.handleSessionExpired()
+          throw new Error("Your session has expired. Please log in again.")
+        }
+        if (response.status === 502) {
+          throw new Error("Backend service is currently unavailable. Please try again later.")
+        }
+
+        let errorData
+        try {
+          errorData = await response.json()
+        } catch {
+          throw new Error(`Failed to get compliance scan status: ${response.status}`)
+        }
+
+        const errorMessage = errorData.error || errorData.detail || errorData.message || "Failed to get compliance scan status"
+        throw new Error(errorMessage)
+      }
+
+      const data = await response.json()
+      return data.data
+    } catch (error) {
+      if (error instanceof TypeError && error.message.includes("fetch")) {
+        throw new Error("Failed to connect to server. Please check your internet connection.")
+      }
+      throw error
+    }
+  }
+
   /**
    * Get latest compliance scan results
    * GET /api/compliance/scan/
@@ -45,6 +45,14 @@ export interface OrganizationTrustData {
   }
 }
 
+export interface PublicTrustScoreData extends Omit<OrganizationTrustData, "trust_score" | "trust_level" | "components" | "last_calculated"> {
+  trust_score: number | null
+  trust_level: string | null
+  components: TrustScore["components"] | null
+  last_calculated: string | null
+  stale: boolean
+}
+
 export interface TrustRegistryEntry {
   organization: {
     id: number
@@ -53,21 +61,40 @@ export interface TrustRegistryEntry {
   }
   trust_score: number
   trust_level: string
+  certificate_issued: boolean
+  last_calculated: string
 }
 
 export interface TrustRegistryResponse {
   count: number
   results: TrustRegistryEntry[]
+  next_cursor: string | null
+}
+
+export interface TrustRegistryFilters {
+  cursor?: string
+  trust_level?: TrustScore["trust_level"]
+  certified?: boolean
+  min_score?: number
+  max_score?: number
+  search?: string
 }
 
 export class TrustAPI {
   /**
-   * Get public trust registry (ranked organizations)
+   * Get public trust registry (ranked organizations), one page at a time
    * GET /api/organization/trust/registry/
+   * Pass the previous response's next_cursor as filters.cursor for the next page
    */
-  static async getTrustRegistry(limit: number = 10): Promise<TrustRegistryResponse> {
+  static async getTrustRegistry(limit: number = 10, filters: TrustRegistryFilters = {}): Promise<TrustRegistryResponse> {
     try {
-      const response = await fetch(`${API_BASE_URL}/organization/trust/registry/?limit=${limit}`, {
+      const params = new URLSearchParams({ limit: String(limit) })
+      Object.entries(filters).forEach(([key, value]) => {
+        if (value !== undefined && value !== "") {
+          params.set(key, String(value))
+        }
+      })
+      const response = await fetch(`${API_BASE_URL}/organization/trust/registry/?${params}`, {
         method: "GET",
         headers: {
           "Content-Type": "application/json",
@@ -108,8 +135,10 @@ export class TrustAPI {
   /**
    * Get trust score for a specific organization (public)
    * GET /api/organization/trust/score/<org_id>/
+   * Serves the stored score; score fields are null until the first calculation
+   * and `stale` means a background refresh has been scheduled
    */
-  static async getOrganizationTrustScore(orgId: number): Promise<OrganizationTrustData> {
+  static async getOrganizationTrustScore(orgId: number): Promise<PublicTrustScoreData> {
     try {
       const response = await fetch(`${API_BASE_URL}/organization/trust/score/${orgId}/`, {
         method: "GET",